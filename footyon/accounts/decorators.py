@@ -7,9 +7,8 @@ def active_user_required(view_func):
     def wrapper(request, *args, **kwargs):
         user = request.user
 
-        # This will reset suspension if it's over
-        if user.is_authenticated:
-            user.can_participate()
+        # Expired suspensions are already lifted in memory when the user is loaded
+        # (User.from_db), so nothing is written here
 
         if not user.is_authenticated:
             return view_func(request, *args, **kwargs)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import PointsLedger, User
+
+
+class Command(BaseCommand):
+    help = "Store the lift of every expired suspension with one UPDATE (they already read as lifted)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only count expired suspensions")
+
+    def handle(self, *args, **options):
+        expired = User.objects.filter(is_suspended=True, suspension_until__lte=timezone.now())
+        if options['dry_run']:
+            count = expired.count()
+        else:
+            with transaction.atomic():
+                stored = list(expired.select_for_update().values_list('id', 'points'))
+                PointsLedger.objects.bulk_create(
+                    PointsLedger(user_id=user_id, delta=15 - points, reason='suspension_lifted')
+                    for user_id, points in stored if points != 15
+                )
+                # Same change as User.lift_expired_suspension. No signals: the users
+                # already read as lifted, so the cached stats don't change
+                count = User.objects.filter(id__in=[user_id for user_id, _points in stored]).update(
+                    is_suspended=False, suspension_until=None, points=15,
+                )
+
+        verb = "Found" if options['dry_run'] else "Lifted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {count} expired suspensions."))
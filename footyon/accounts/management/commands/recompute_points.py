@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from accounts.models import PointsLedger, User
+
+
+def ledger_points_subquery():
+    """15 plus the sum of the user's ledger deltas, for annotate() / update()"""
+    total = (
+        PointsLedger.objects.filter(user=OuterRef('pk'))
+        .order_by().values('user').annotate(total=Sum('delta')).values('total')
+    )
+    return Value(15) + Coalesce(Subquery(total, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute User.points from the points ledger and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, do not fix it")
+
+    def handle(self, *args, **options):
+        drifted = list(
+            User.objects.annotate(ledger_points=ledger_points_subquery())
+            .exclude(points=F('ledger_points'))
+            .values_list('id', 'points', 'ledger_points')
+        )
+
+        for user_id, stored, actual in drifted:
+            self.stdout.write(f"User {user_id}: stored {stored}, ledger {actual} ({actual - stored:+d})")
+
+        if drifted and not options['dry_run']:
+            # Recomputed in SQL row by row, so a concurrent F() update is not overwritten by a stale value
+            User.objects.filter(id__in=[row[0] for row in drifted]).update(points=ledger_points_subquery())
+
+        verb = "Found" if options['dry_run'] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drifted)} users with drifted points."))
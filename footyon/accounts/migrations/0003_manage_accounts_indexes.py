@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+def create_username_trigram_index(apps, schema_editor):
+    # username__icontains compiles to UPPER("username"::text) LIKE UPPER('%...%') on PostgreSQL,
+    # a trigram index on that expression serves it (prefix and substring searches alike)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS user_username_trgm_idx "
+        "ON accounts_user USING gin (UPPER(username::text) gin_trgm_ops)"
+    )
+
+
+def drop_username_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS user_username_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_is_suspended_user_points_user_suspension_count_and_more'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['points', 'id'], name='user_points_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['suspension_count', 'id'], name='user_suspension_count_idx'),
+        ),
+        migrations.RunPython(create_username_trigram_index, drop_username_trigram_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_manage_accounts_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_suspended', True)), fields=['suspension_until'], name='user_suspension_until_idx'),
+        ),
+    ]
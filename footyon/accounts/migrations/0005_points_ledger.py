@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_points_ledger(apps, schema_editor):
+    # Points earned before the ledger existed, so 15 + sum(delta) matches every user
+    User = apps.get_model('accounts', 'User')
+    PointsLedger = apps.get_model('accounts', 'PointsLedger')
+    PointsLedger.objects.bulk_create(
+        (
+            PointsLedger(user_id=user_id, delta=points - 15, reason='adjustment')
+            for user_id, points in User.objects.exclude(points=15).values_list('id', 'points').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_suspension_until_index'),
+        ('participation', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('no_show', 'No-show'), ('no_show_removed', 'No-show removed'), ('suspension_lifted', 'Suspension lifted'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('participation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='participation.participation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(open_points_ledger, migrations.RunPython.noop),
+    ]
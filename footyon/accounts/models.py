@@ -1,8 +1,21 @@
 from datetime import timezone
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
 from django.utils import timezone
 
+def effective_points():
+    """
+    Points as read after User.lift_expired_suspension, as an SQL expression: sorting and
+    keyset cursors on it agree with the points shown, even before lift_expired_suspensions stores them
+    """
+    return models.Case(
+        models.When(is_suspended=True, suspension_until__lte=timezone.now(), then=models.Value(15)),
+        default=F('points'),
+        output_field=models.IntegerField(),
+    )
+
+
 class User(AbstractUser):
 
     # Optional flags
@@ -16,9 +29,30 @@ class User(AbstractUser):
     suspension_until = models.DateTimeField(null=True, blank=True)
     suspension_count = models.IntegerField(default=0)  # how many suspensions so far
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Sortable columns of manage_accounts, keyset paginated on (column, id)
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+            models.Index(fields=['points', 'id'], name='user_points_idx'),
+            models.Index(fields=['suspension_count', 'id'], name='user_suspension_count_idx'),
+            # Running suspensions, for lift_expired_suspensions
+            models.Index(
+                fields=['suspension_until'], name='user_suspension_until_idx',
+                condition=models.Q(is_suspended=True),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # Expired suspensions read as lifted, without writing (see lift_expired_suspensions command)
+        if not user.get_deferred_fields() & {'is_suspended', 'suspension_until', 'points'}:
+            user.lift_expired_suspension()
+        return user
+
     def can_participate(self):
         """ Determine if user can join matches """
-        self.check_suspension_over() # auto check if suspension is over
+        self.lift_expired_suspension() # auto check if suspension is over
         if not self.is_active or self.is_recruiter:
             return [False, "inactive_or_recruiter"]
         if self.is_disabled:  # permanent
@@ -33,56 +67,148 @@ class User(AbstractUser):
     
 
 
-    def update_suspension_status(self, no_show_reason, reverse=False):
-        if not self.can_participate():
-            return False
-        
+    def save(self, *args, **kwargs):
+        """
+        Save and write any change of points to the PointsLedger in the same transaction.
+        The previous points are read from the locked row, like Participation.save.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'points' not in update_fields:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous = 15  # new users start with full points
+            if not self._state.adding:
+                previous = User.objects.select_for_update().filter(pk=self.pk).values_list('points', flat=True).first()
+            super().save(*args, **kwargs)
+            if previous is not None and self.points != previous:
+                reason = 'suspension_lifted' if self.__dict__.pop('_suspension_lifted', False) else 'adjustment'
+                PointsLedger.objects.create(user=self, delta=self.points - previous, reason=reason)
+
+    def update_suspension_status(self, no_show_reason, reverse=False, participation=None):
+        """
+        Apply the points penalty of a no-show (reverse=True gives it back) and suspend
+        the user when the points run out. The user row is locked and updated with F()
+        expressions, and every change is recorded in the PointsLedger, so concurrent
+        penalties are never lost. Call it in the transaction updating the participation.
+        New penalties of users who can't participate (suspended, disabled, inactive,
+        recruiters) are skipped, with a 0 entry in the ledger. A reversal always runs and
+        gives back what the ledger charged for the participation, the full deduction for
+        no-shows recorded before the ledger existed (no entry).
+        Returns False when nothing was applied.
+        """
         if no_show_reason == "excused":
-            point_deduction = 0
-            return
+            return False
         elif no_show_reason == "not_excused":
             point_deduction = 4
         elif no_show_reason == "last_minute":
             point_deduction = 2
+        else:
+            return False
 
-        if(reverse == False):
-            self.points -= point_deduction
-        elif(reverse == True):
-            self.points += point_deduction
-
-        # Check for suspension
-        if self.points <= 0 and not reverse:
-            self.is_suspended = True
-            self.suspension_count += 1
-            self.points = 0
-
-            # Set suspension duration (e.g., 15 days)
-            self.suspension_until = timezone.now() + timezone.timedelta(days=15)
-
-            # check if player abused the system, 5 suspensions = permanent disable
-            if self.suspension_count >= 5:
-                self.is_disabled = True
-                self.is_suspended = False
-                self.suspension_until = None
-
-
-        if(reverse):
-            if self.is_suspended and self.points > 0:
-                self.is_suspended = False
-                self.suspension_until = None
-
-        if self.points > 15:
-                self.points = 15  # max points is 15
-
-        self.save()
-
-
-    # check if suppension is over
-    def check_suspension_over(self):
+        with transaction.atomic():
+            # Fresh locked row, an expired suspension comes back lifted in memory
+            user = User.objects.select_for_update().get(pk=self.pk)
+            if not reverse and not user.can_participate()[0]:
+                # Recorded, so removing this no-show later doesn't give back points never charged
+                PointsLedger.objects.create(user=user, participation=participation, delta=0, reason='no_show')
+                return False
+            if reverse and participation is not None:
+                # A penalty skipped or clamped at 0 points is not given back in full
+                charged = PointsLedger.objects.filter(participation=participation).aggregate(total=Sum('delta'))['total']
+                if charged is not None:
+                    point_deduction = min(point_deduction, -charged)
+                if point_deduction <= 0:
+                    return False
+            stored_points = user.__dict__.get('_points_before_lift', user.points)
+            ledger = []
+            if user.points != stored_points:
+                ledger.append(PointsLedger(user=user, delta=user.points - stored_points, reason='suspension_lifted'))
+
+            points = user.points
+            suspension_count = user.suspension_count
+            if(reverse == False):
+                points -= point_deduction
+            elif(reverse == True):
+                points += point_deduction
+
+            # Check for suspension
+            if points <= 0 and not reverse:
+                user.is_suspended = True
+                suspension_count += 1
+                points = 0
+
+                # Set suspension duration (e.g., 15 days)
+                user.suspension_until = timezone.now() + timezone.timedelta(days=15)
+
+                # check if player abused the system, 5 suspensions = permanent disable
+                if suspension_count >= 5:
+                    user.is_disabled = True
+                    user.is_suspended = False
+                    user.suspension_until = None
+
+            if(reverse):
+                if user.is_suspended and points > 0:
+                    user.is_suspended = False
+                    user.suspension_until = None
+
+            if points > 15:
+                points = 15  # max points is 15
+
+            if points != user.points:
+                ledger.append(PointsLedger(
+                    user=user, participation=participation, delta=points - user.points,
+                    reason='no_show_removed' if reverse else 'no_show',
+                ))
+
+            User.objects.filter(pk=self.pk).update(
+                points=F('points') + (points - stored_points),
+                suspension_count=F('suspension_count') + (suspension_count - user.suspension_count),
+                is_suspended=user.is_suspended,
+                suspension_until=user.suspension_until,
+                is_disabled=user.is_disabled,
+            )
+            PointsLedger.objects.bulk_create(ledger)
+
+        self.points = points
+        self.suspension_count = suspension_count
+        self.is_suspended = user.is_suspended
+        self.suspension_until = user.suspension_until
+        self.is_disabled = user.is_disabled
+
+
+    # check if suppension is over, in memory only: the next save() of the user stores it,
+    # the lift_expired_suspensions command stores it for everyone in one UPDATE
+    def lift_expired_suspension(self):
         if self.is_suspended and self.suspension_until and self.suspension_until <= timezone.now():
+            self.__dict__.setdefault('_points_before_lift', self.points)
+            self._suspension_lifted = True
             self.is_suspended = False
             self.suspension_until = None
             self.points = 15  # reset points to full
-            self.save()
             return True
-        return False
\ No newline at end of file
+        return False
+
+
+class PointsLedger(models.Model):
+    """
+    Append-only history of points changes, the points of a user are
+    15 plus the sum of its deltas (see the recompute_points command).
+    """
+    REASON_CHOICES = [
+        ('no_show', 'No-show'),
+        ('no_show_removed', 'No-show removed'),
+        ('suspension_lifted', 'Suspension lifted'),
+        ('adjustment', 'Adjustment'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='points_ledger')
+    # Kept when the participation is deleted, the history stays
+    participation = models.ForeignKey(
+        'participation.Participation', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+    )
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} {self.delta:+d} ({self.reason})"
@@ -1,3 +1,337 @@
+import re
+from datetime import date, time, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from matches.models import Match, Stadium
+from participation.models import Participation
+from .models import PointsLedger, User
 
-# Create your tests here.
+
+class ManageAccountsTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="pass", points=3)
+        self.client.force_login(self.admin)
+
+    def create_users(self, count, prefix="player"):
+        return [
+            User.objects.create(username=f"{prefix}{i:02d}", points=i % 16)
+            for i in range(count)
+        ]
+
+    def get_page(self, params=None):
+        response = self.client.get(reverse("manage_accounts"), params or {})
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def usernames(self, context):
+        return [user.username for user in context["users"]]
+
+    def test_walks_pages_forward_and_back(self):
+        self.create_users(24)
+        expected = sorted(User.objects.values_list("username", flat=True))
+
+        context = self.get_page()
+        self.assertEqual(self.usernames(context), expected[:10])
+        self.assertIsNone(context["page"]["previous_url"])
+
+        seen = self.usernames(context)
+        for _page in range(5):
+            if not context["page"]["next_url"]:
+                break
+            context = self.get_page(QueryDict(context["page"]["next_url"][1:]))
+            seen += self.usernames(context)
+        self.assertEqual(seen, expected)
+
+        context = self.get_page(QueryDict(context["page"]["previous_url"][1:]))
+        self.assertEqual(self.usernames(context), expected[10:20])
+
+    def test_cursor_on_usernames_with_underscores(self):
+        # The cursor is split from the right, only the id follows the username
+        self.create_users(12, prefix="none_")
+        expected = sorted(User.objects.values_list("username", flat=True))
+
+        context = self.get_page()
+        context = self.get_page(QueryDict(context["page"]["next_url"][1:]))
+        self.assertEqual(self.usernames(context), expected[10:])
+
+    def test_search_by_username(self):
+        self.create_users(12)
+        self.create_users(3, prefix="keeper")
+        context = self.get_page({"q": "KEEP"})
+        self.assertEqual(self.usernames(context), ["keeper00", "keeper01", "keeper02"])
+        self.assertIsNone(context["page"]["next_url"])
+
+        context = self.get_page({"q": "nobody"})
+        self.assertEqual(context["users"], [])
+        self.assertContains(self.client.get(reverse("manage_accounts"), {"q": "nobody"}), "No users found.")
+
+    def test_sort_by_points_descending_across_pages(self):
+        self.create_users(15)
+        expected = list(User.objects.order_by("-points", "-id").values_list("username", flat=True))
+
+        context = self.get_page({"sort": "-points"})
+        seen = self.usernames(context)
+        context = self.get_page(QueryDict(context["page"]["next_url"][1:]))
+        seen += self.usernames(context)
+        self.assertEqual(seen, expected)
+
+        # Sort links reverse the current column and keep the search
+        context = self.get_page({"sort": "points", "q": "player"})
+        self.assertEqual(QueryDict(context["sort_urls"]["points"][1:])["sort"], "-points")
+        self.assertEqual(QueryDict(context["sort_urls"]["joined"][1:])["q"], "player")
+
+    def test_expired_suspension_sorted_by_the_points_shown(self):
+        # Stored at 0 points but reads as 15: last row of the first page, descending
+        expired = User.objects.create(
+            username="expired", points=0, is_suspended=True, suspension_until=timezone.now() - timedelta(days=1),
+        )
+        full = [User.objects.create(username=f"full{i}") for i in range(9)]
+        for i in range(5):
+            User.objects.create(username=f"low{i}", points=i + 1)
+
+        context = self.get_page({"sort": "-points"})
+        self.assertEqual(context["users"], full[::-1] + [expired])
+        context = self.get_page(QueryDict(context["page"]["next_url"][1:]))
+        self.assertEqual([user.points for user in context["users"]], [5, 4, 3, 3, 2, 1])
+
+        context = self.get_page({"sort": "points"})
+        self.assertEqual([user.points for user in context["users"]], [1, 2, 3, 3, 4, 5, 15, 15, 15, 15])
+        self.assertEqual(context["users"][6], expired)
+        context = self.get_page(QueryDict(context["page"]["next_url"][1:]))
+        self.assertEqual(context["users"], full[3:])
+
+    def test_sort_by_date_joined(self):
+        users = self.create_users(12)
+        context = self.get_page({"sort": "joined"})
+        context = self.get_page(QueryDict(context["page"]["next_url"][1:]))
+        self.assertEqual(self.usernames(context), [user.username for user in users[9:]])
+
+    def test_unknown_sort_falls_back_to_username(self):
+        self.create_users(3)
+        context = self.get_page({"sort": "password"})
+        self.assertEqual(context["sort"], "username")
+        self.assertEqual(self.usernames(context), ["admin", "player00", "player01", "player02"])
+
+    def test_stats_only_for_the_visible_page(self):
+        stadium = Stadium.objects.create(name="City Park")
+        users = self.create_users(15)
+        match = Match.objects.create(date=date.today() - timedelta(days=3), time=time(20, 0), stadium=stadium)
+        for user in users:
+            Participation.objects.create(user=user, match=match)
+
+        with CaptureQueriesContext(connection) as ctx:
+            context = self.get_page()
+        form_queries = [q["sql"] for q in ctx.captured_queries if "ROW_NUMBER()" in q["sql"]]
+        self.assertEqual(len(form_queries), 1)
+        # Recent form only for the 10 users of the page
+        user_ids = re.search(r'"user_id" IN \(([^)]*)\)', form_queries[0]).group(1)
+        self.assertEqual(len(user_ids.split(",")), 10)
+        self.assertEqual(context["users"][1].last_five_icons, "✅")
+        self.assertEqual(context["users"][1].total_eligible, 1)
+
+
+class SuspensionExpiryTests(TestCase):
+
+    def create_suspended(self, username, ends_in):
+        return User.objects.create(
+            username=username, points=0, is_suspended=True, suspension_count=1,
+            suspension_until=timezone.now() + ends_in,
+        )
+
+    def writes(self, ctx):
+        # Cache entries (database cache backend) don't count
+        return [
+            q["sql"] for q in ctx.captured_queries
+            if q["sql"].startswith(("UPDATE", "INSERT", "DELETE")) and '"footyon_cache"' not in q["sql"]
+        ]
+
+    def test_expired_suspension_reads_as_lifted_without_writing(self):
+        user = self.create_suspended("alex", -timedelta(minutes=1))
+        loaded = User.objects.get(pk=user.pk)
+        self.assertEqual((loaded.is_suspended, loaded.suspension_until, loaded.points), (False, None, 15))
+        self.assertEqual(loaded.can_participate(), [True, "can_participate"])
+        self.assertTrue(User.objects.filter(pk=user.pk, is_suspended=True).exists())
+
+        running = self.create_suspended("sam", timedelta(days=2))
+        self.assertEqual(User.objects.get(pk=running.pk).can_participate(), [False, "suspended"])
+
+    def test_page_views_do_not_write(self):
+        user = self.create_suspended("alex", -timedelta(minutes=1))
+        self.client.force_login(user)
+        self.client.get(reverse("home"))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("home"))
+            self.client.get(reverse("stats:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateNotUsed(response, "accounts/suspended_user.html")
+        self.assertEqual(self.writes(ctx), [])
+
+    def test_running_suspension_still_blocks(self):
+        self.client.force_login(self.create_suspended("alex", timedelta(days=2)))
+        self.assertTemplateUsed(self.client.get(reverse("home")), "accounts/suspended_user.html")
+
+    def test_command_lifts_expired_suspensions_in_one_update(self):
+        expired = [self.create_suspended(f"player{i}", -timedelta(hours=i + 1)) for i in range(3)]
+        running = self.create_suspended("sam", timedelta(days=2))
+
+        out = StringIO()
+        call_command("lift_expired_suspensions", "--dry-run", stdout=out)
+        self.assertIn("Found 3 expired suspensions.", out.getvalue())
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("lift_expired_suspensions", stdout=out)
+        # One UPDATE for the users, one INSERT for their ledger entries
+        self.assertEqual([sql.split()[0] for sql in self.writes(ctx)], ["INSERT", "UPDATE"])
+        self.assertIn("Lifted 3 expired suspensions.", out.getvalue())
+        self.assertEqual(
+            list(User.objects.filter(is_suspended=True).values_list("pk", flat=True)), [running.pk],
+        )
+        self.assertEqual(set(User.objects.filter(pk__in=[u.pk for u in expired]).values_list("points", flat=True)), {15})
+        self.assertEqual(
+            list(PointsLedger.objects.filter(reason="suspension_lifted").values_list("delta", flat=True)), [15] * 3,
+        )
+
+
+class PointsLedgerTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="pass")
+        self.player = User.objects.create(username="alex")
+        stadium = Stadium.objects.create(name="City Park")
+        self.matches = [
+            Match.objects.create(date=date.today() - timedelta(days=days), time=time(20, 0), stadium=stadium)
+            for days in range(1, 6)
+        ]
+        self.participations = [Participation.objects.create(user=self.player, match=match) for match in self.matches]
+        self.client.force_login(self.admin)
+
+    def mark_no_show(self, participation, reason):
+        self.client.post(reverse("mark_no_show", args=[participation.id]), {"no_show_reason": reason})
+
+    def ledger(self):
+        return list(PointsLedger.objects.filter(user=self.player).order_by("id").values_list("reason", "delta"))
+
+    def test_no_show_and_removal_are_recorded(self):
+        participation = self.participations[0]
+        self.mark_no_show(participation, "not_excused")
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.points, 11)
+        participation.refresh_from_db()
+        self.assertEqual((participation.is_no_show, participation.no_show_reason), (True, "not_excused"))
+        entry = PointsLedger.objects.get(user=self.player)
+        self.assertEqual((entry.reason, entry.delta, entry.participation), ("no_show", -4, participation))
+
+        # Marking again with the same reason doesn't charge twice
+        self.mark_no_show(participation, "not_excused")
+        self.client.post(reverse("remove_no_show", args=[participation.id]), {"confirm": "yes"})
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.points, 15)
+        self.assertEqual(self.ledger(), [("no_show", -4), ("no_show_removed", 4)])
+
+    def test_excused_no_show_applies_nothing(self):
+        self.assertIs(self.player.update_suspension_status("excused"), False)
+        self.assertIs(self.player.update_suspension_status("excused", reverse=True), False)
+        self.assertEqual(self.ledger(), [])
+
+    def test_stale_instances_do_not_lose_penalties(self):
+        first, second = Participation.objects.select_related("user").filter(pk__in=[
+            self.participations[0].pk, self.participations[1].pk,
+        ])
+        first.mark_no_show("not_excused")
+        second.mark_no_show("last_minute")
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.points, 9)
+
+    def test_suspension_and_clamped_deltas(self):
+        for participation in self.participations[:4]:
+            self.mark_no_show(participation, "not_excused")
+        self.player.refresh_from_db()
+        self.assertTrue(self.player.is_suspended)
+        self.assertEqual((self.player.points, self.player.suspension_count), (0, 1))
+        # 15 -> 11 -> 7 -> 3 -> 0
+        self.assertEqual(self.ledger(), [("no_show", -4)] * 3 + [("no_show", -3)])
+
+    def test_users_who_cannot_participate_are_not_penalised(self):
+        until = timezone.now() + timedelta(days=10)
+        User.objects.filter(pk=self.player.pk).update(points=0, is_suspended=True, suspension_until=until, suspension_count=1)
+        self.mark_no_show(self.participations[0], "not_excused")
+        self.player.refresh_from_db()
+        self.assertEqual(
+            (self.player.points, self.player.suspension_count, self.player.suspension_until), (0, 1, until),
+        )
+        # Nothing was charged, nothing is given back
+        self.client.post(reverse("remove_no_show", args=[self.participations[0].id]), {"confirm": "yes"})
+        self.player.refresh_from_db()
+        self.assertEqual((self.player.points, self.player.is_suspended), (0, True))
+        self.assertEqual(self.ledger(), [("no_show", 0)])
+
+        User.objects.filter(pk=self.player.pk).update(points=15, is_suspended=False, suspension_until=None, is_disabled=True)
+        self.mark_no_show(self.participations[1], "last_minute")
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.points, 15)
+        self.assertEqual(self.ledger(), [("no_show", 0), ("no_show", 0)])
+
+    def test_reversal_gives_back_points_and_lifts_the_suspension(self):
+        User.objects.filter(pk=self.player.pk).update(points=4)
+        self.mark_no_show(self.participations[0], "not_excused")  # 4 -> 0, suspended
+        self.player.refresh_from_db()
+        self.assertEqual((self.player.points, self.player.is_suspended), (0, True))
+
+        # A mistaken no-show removed while suspended: points back, suspension lifted
+        self.client.post(reverse("remove_no_show", args=[self.participations[0].id]), {"confirm": "yes"})
+        self.player.refresh_from_db()
+        self.assertEqual((self.player.points, self.player.is_suspended, self.player.suspension_until), (4, False, None))
+
+        # Clamped at 0 points: only what was charged comes back
+        User.objects.filter(pk=self.player.pk).update(points=1)
+        self.mark_no_show(self.participations[1], "not_excused")  # 1 -> 0, suspended
+        self.client.post(reverse("remove_no_show", args=[self.participations[1].id]), {"confirm": "yes"})
+        self.player.refresh_from_db()
+        self.assertEqual((self.player.points, self.player.is_suspended), (1, False))
+
+    def test_reversal_of_a_no_show_recorded_before_the_ledger(self):
+        Participation.objects.filter(pk=self.participations[0].pk).update(is_no_show=True, no_show_reason="not_excused")
+        User.objects.filter(pk=self.player.pk).update(points=11)
+        self.client.post(reverse("remove_no_show", args=[self.participations[0].id]), {"confirm": "yes"})
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.points, 15)
+        self.assertEqual(self.ledger(), [("no_show_removed", 4)])
+
+    def test_lifted_suspension_is_recorded_when_stored(self):
+        User.objects.filter(pk=self.player.pk).update(
+            points=0, is_suspended=True, suspension_until=timezone.now() - timedelta(minutes=1),
+        )
+        self.mark_no_show(self.participations[0], "last_minute")
+        self.player.refresh_from_db()
+        self.assertEqual((self.player.points, self.player.is_suspended), (13, False))
+        self.assertEqual(self.ledger(), [("suspension_lifted", 15), ("no_show", -2)])
+
+    def test_direct_edits_are_recorded(self):
+        self.player.points = 12
+        self.player.save()
+        self.player.save(update_fields=["last_login"])
+        self.assertEqual(self.ledger(), [("adjustment", -3)])
+        # Created with full points: nothing to record
+        self.assertFalse(PointsLedger.objects.filter(user=self.admin).exists())
+
+    def test_recompute_command(self):
+        self.mark_no_show(self.participations[0], "last_minute")
+        User.objects.filter(pk=self.player.pk).update(points=1)
+
+        out = StringIO()
+        call_command("recompute_points", "--dry-run", stdout=out)
+        self.assertIn(f"User {self.player.pk}: stored 1, ledger 13 (+12)", out.getvalue())
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.points, 1)
+
+        call_command("recompute_points", stdout=out)
+        self.assertIn("Fixed 1 users with drifted points.", out.getvalue())
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.points, 13)
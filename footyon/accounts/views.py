@@ -3,11 +3,12 @@ from django.shortcuts import render, redirect
 from participation.models import Participation
 from .forms import UserSignupForm
 from django.contrib.auth.decorators import user_passes_test
-from .models import User
+from .models import User, effective_points
 from django.contrib import messages
 from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext as _
-from collections import defaultdict
+from stats.scoring import compute_user_stats, with_user_stats
+from matches.pagination import keyset_page
 
 def signup(request):
     if request.method == "POST":
@@ -23,94 +24,80 @@ def signup(request):
 def is_admin(user):
     return user.is_superuser
 
+# Sortable columns of manage_accounts: query value -> User field (indexed with id) or annotation
+ACCOUNT_SORTS = {
+    "username": "username",
+    "joined": "date_joined",
+    "suspensions": "suspension_count",
+    # Expired suspensions read as 15 points before they are stored (see User.from_db),
+    # sorted and paged on the same value that is shown
+    "points": "effective_points",
+}
+
 @user_passes_test(is_admin)
 def manage_accounts(request):
 
-    # 1️⃣ Fetch all Participation objects in a single query
-    #    - select_related("user", "match") prefetches related user and match objects
-    #      to avoid additional database hits when accessing p.user or p.match later
-    all_participations = Participation.objects.select_related("user", "match").all()
-
-    # 2️⃣ Group participations by user_id
-    #    - defaultdict(list) automatically creates an empty list for a new key
-    #    - Each user's participations will be stored in a list under their user_id
-    user_participations = defaultdict(list)
-    for p in all_participations:
-        user_participations[p.user_id].append(p)
-
-    # 3️⃣ Fetch all users ordered by username
-    users = User.objects.all().order_by("username")
-
-    # 4️⃣ Loop through each user and calculate stats
-    for user in users:
-        # Get all participations for this user; default to empty list if none
-        participations = user_participations.get(user.id, [])
-
-        # 5️⃣ Count attended participations
-        #    - status="joined" means the user signed up and joined
-        #    - not removed ensures we ignore participations that were deleted/removed
-        #    - not is_no_show ensures we ignore no-show participations
-        attended = sum(
-            1 for p in participations if p.status == "joined" and not p.removed and not p.is_no_show
-        )
-
-        # 6️⃣ Determine eligible participations for score calculation
-        #    - Exclude participations with no_show_reason="excused"
-        #    - Exclude participations where the user left early (status="left") but is_no_show is False
-        eligible_participations = [
-            p for p in participations
-            if not (p.no_show_reason == "excused" or (p.is_no_show is False and p.status == "left"))
-        ]
-
-        # 7️⃣ Compute score safely
-        attendance_score = (attended / len(eligible_participations)) if eligible_participations else 0
-        points_ratio = user.points / 15
-
-        if user.is_suspended and user.suspension_until:
-            total_suspension_seconds = (timezone.timedelta(days=15)).total_seconds()
-            remaining_seconds = (user.suspension_until - timezone.now()).total_seconds()
-            suspension_penalty = max(0, min(1, remaining_seconds / total_suspension_seconds))
-        else:
-            suspension_penalty = 0
-
-        past_suspension_penalty = min(0.1, 0.02 * user.suspension_count)  # 2% penalty per past suspension, max 10%
-
-        score = (attendance_score * 0.7 + points_ratio * 0.3) * 100
-        score = score * (1 - suspension_penalty) * (1 - past_suspension_penalty)
-
-
-
-   
-
-
-        # 8️⃣ Dynamically attach the score to the user object
-        #    - This makes it easy to access in templates like {{ user.score }}
-        if(score):
-            user.score = round(score, 2)
-        else:
-            user.score = None
-        user.total_eligible = len(eligible_participations)
-
-
-        # We will add last 7 participations to user object
-        last_n = 7
-        last_participations = sorted([p for p in participations if not p.match.can_edit_attendance], key=lambda p: p.match.date, reverse=True)[:last_n]
-        last_participations = sorted(last_participations, key=lambda p: p.match.date)
-   
-   
-        icons = []
-        for p in last_participations:
-            if p.is_active_participant():
-                icons.append("✅")
-            elif p.no_show_reason == "excused":
-                icons.append("⚪")
-            else :
-                icons.append("❌")
-
-        user.last_five_icons = " ".join(icons)
-
-
-    return render(request, "accounts/manage_accounts.html", {"users": users, "last_n": last_n})
+    # Search, sort and pagination are done by the database, one page of users per request
+    query = request.GET.get("q", "").strip()
+    sort = request.GET.get("sort", "username")
+    descending = sort.startswith("-")
+    if sort.lstrip("-") not in ACCOUNT_SORTS:
+        sort, descending = "username", False
+
+    users = User.objects.annotate(effective_points=effective_points())
+    if query:
+        # Trigram index on UPPER(username) on PostgreSQL (see accounts migration 0003)
+        users = users.filter(username__icontains=query)
+    # Participation counters are joined from the UserStats table (see stats/scoring.py)
+    page = keyset_page(
+        with_user_stats(users),
+        (ACCOUNT_SORTS[sort.lstrip("-")], "id"),
+        descending=descending,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
+    page["next_url"] = _accounts_page_url(request, "after", page["next_cursor"])
+    page["previous_url"] = _accounts_page_url(request, "before", page["previous_cursor"])
+
+    # Score and last matches in vectorized passes, only for the users of the page
+    last_n = 7
+    users = page["rows"]
+    for user, scores in zip(users, compute_user_stats(users, last_n=last_n)):
+        # Attach the results to the user object, e.g. {{ user.score }} in the template
+        user.score = scores["score"]
+        user.total_eligible = scores["eligible_participations"]
+        user.last_five_icons = scores["last_five_icons"]
+
+    return render(request, "accounts/manage_accounts.html", {
+        "users": users,
+        "last_n": last_n,
+        "page": page,
+        "query": query,
+        "sort": sort,
+        "sort_urls": {
+            key: _accounts_sort_url(request, key if sort != key else f"-{key}") for key in ACCOUNT_SORTS
+        },
+    })
+
+
+def _accounts_page_url(request, direction, cursor):
+    """Query string moving the table to `cursor`, keeping search and sort"""
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop("after", None)
+    params.pop("before", None)
+    params[direction] = cursor
+    return f"?{params.urlencode()}"
+
+
+def _accounts_sort_url(request, sort):
+    """Query string sorting by `sort` from the first page, keeping the search"""
+    params = request.GET.copy()
+    params.pop("after", None)
+    params.pop("before", None)
+    params["sort"] = sort
+    return f"?{params.urlencode()}"
 
 @user_passes_test(is_admin)
 def toggle_account_status(request, user_id):
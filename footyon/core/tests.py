@@ -1,3 +1,157 @@
+import re
+from datetime import date, datetime, time, timedelta
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from matches.models import Match, Stadium
+from matches.pagination import keyset_page
+from participation.models import Participation
 
-# Create your tests here.
+
+class HomeFeedQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alex123", password="pass")
+        self.other = User.objects.create_user(username="sam123", password="pass")
+        self.stadium = Stadium.objects.create(name="City Park")
+        self.client.force_login(self.user)
+
+    def create_matches(self, count):
+        for i in range(count):
+            match = Match.objects.create(
+                date=date.today() + timedelta(days=i + 1),
+                time=time(20, 0),
+                stadium=self.stadium,
+                max_players=12,
+            )
+            Participation.objects.create(user=self.user, match=match)
+            Participation.objects.create(user=self.other, match=match)
+
+    def count_home_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_matches(self):
+        self.create_matches(2)
+        few = self.count_home_queries()
+        self.create_matches(20)
+        many = self.count_home_queries()
+        self.assertEqual(few, many)
+
+    def test_feed_exposes_spots_and_user_participation(self):
+        self.create_matches(1)
+        response = self.client.get(reverse("home"))
+        match = response.context["upcoming_matches"][0]
+        self.assertEqual(match.spots_left, 10)
+        self.assertFalse(match.is_full)
+        self.assertEqual(match.user_participation.user, self.user)
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the hot-path queries over a seeded dataset and fail when one of them
+    reads a whole table instead of an index (Seq Scan on PostgreSQL, SCAN on SQLite).
+    """
+
+    MATCHES = 1500
+    USERS = 60
+    PLAYERS_PER_MATCH = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        stadium = Stadium.objects.create(name="City Park")
+        users = User.objects.bulk_create(
+            User(username=f"player{i}", email=f"player{i}@example.com") for i in range(cls.USERS)
+        )
+        # Mostly history, like a real club: a few weeks of upcoming matches
+        first_day = date.today() - timedelta(days=cls.MATCHES - 30)
+        matches = []
+        for i in range(cls.MATCHES):
+            day = first_day + timedelta(days=i)
+            match_time = time(20, 0) if i % 10 else None
+            matches.append(Match(
+                date=day, time=match_time, day_of_week=day.strftime("%A"), stadium=stadium,
+                max_players=cls.PLAYERS_PER_MATCH,
+                starts_at=timezone.make_aware(datetime.combine(day, match_time)) if match_time else None,
+            ))
+        matches = Match.objects.bulk_create(matches)
+
+        participations = []
+        for i, match in enumerate(matches):
+            for j in range(cls.PLAYERS_PER_MATCH + 2):
+                user = users[(i + j) % cls.USERS]
+                if j < cls.PLAYERS_PER_MATCH - 2:
+                    status = 'joined'
+                elif j < cls.PLAYERS_PER_MATCH:
+                    status = 'left'
+                else:
+                    status = 'waitlisted'
+                participations.append(Participation(user=user, match=match, status=status))
+        Participation.objects.bulk_create(participations, batch_size=1000)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.match = matches[-10]
+        cls.user = users[0]
+
+    def assertUsesIndexes(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            full_scans = re.findall(r"Seq Scan on (\w+)", plan)
+        else:
+            # SEARCH seeks an index range, SCAN reads the whole table (or a whole index)
+            full_scans = re.findall(r"\bSCAN (\w+)", plan)
+        self.assertEqual(full_scans, [], f"Full table scan in plan:\n{plan}")
+
+    def explain(self, sql):
+        """Plan of a captured query, for querysets that are not explain()-able (sliced pages)"""
+        with connection.cursor() as cursor:
+            prefix = "EXPLAIN QUERY PLAN " if connection.vendor == 'sqlite' else "EXPLAIN "
+            cursor.execute(prefix + sql)
+            return "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+
+    def test_active_participants_of_match(self):
+        self.assertUsesIndexes(
+            Participation.objects.filter(match=self.match, status='joined', removed=False, is_no_show=False)
+            .order_by('status_time', 'id')
+        )
+
+    def test_participations_of_match(self):
+        self.assertUsesIndexes(Participation.objects.filter(match=self.match).order_by('status_time'))
+
+    def test_user_participation_in_match(self):
+        self.assertUsesIndexes(Participation.objects.filter(user=self.user, match=self.match))
+
+    def test_participations_of_user(self):
+        self.assertUsesIndexes(Participation.objects.filter(user=self.user))
+
+    def test_waitlist_head(self):
+        self.assertUsesIndexes(
+            Participation.objects.filter(match=self.match, status='waitlisted').order_by('status_time', 'id')[:1]
+        )
+
+    def test_upcoming_matches(self):
+        self.assertUsesIndexes(Match.objects.upcoming().order_by('date', 'time'))
+
+    def test_past_matches_page(self):
+        # The past matches table reads one page, latest first (past() alone is most of the table)
+        with CaptureQueriesContext(connection) as ctx:
+            page = keyset_page(Match.objects.past(), descending=True)
+        self.assertEqual(len(page['rows']), 10)
+        plan = self.explain(ctx.captured_queries[0]['sql'])
+        self.assertIsNone(re.search(r"Seq Scan on|\bSCAN \w+", plan), plan)
+
+    def test_manage_matches_keyset_page(self):
+        page = keyset_page(Match.objects.all())
+        self.assertEqual(len(page['rows']), 10)
+
+        with CaptureQueriesContext(connection) as ctx:
+            keyset_page(Match.objects.all(), after=page['next_cursor'])
+        plan = self.explain(ctx.captured_queries[0]['sql'])
+        self.assertIsNone(re.search(r"Seq Scan on|\bSCAN \w+", plan), plan)
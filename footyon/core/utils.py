@@ -0,0 +1,27 @@
+from matches.models import Match
+from participation.models import Participation
+
+
+def get_upcoming_matches_feed(user):
+    """
+    Build the home page feed in a fixed number of queries:
+    - one query for the upcoming matches and their stadium (spots come from Match.active_count)
+    - one query for the current user's participations, keyed by match id
+    """
+    upcoming_matches = list(
+        Match.objects.upcoming()
+        .select_related('stadium')
+        .order_by('date', 'time')
+    )
+
+    if user.is_authenticated and upcoming_matches:
+        participations_by_match = {
+            p.match_id: p
+            for p in Participation.objects.filter(
+                user=user, match__in=[match.id for match in upcoming_matches]
+            )
+        }
+        for match in upcoming_matches:
+            match.user_participation = participations_by_match.get(match.id)
+
+    return upcoming_matches
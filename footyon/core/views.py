@@ -1,8 +1,6 @@
 from django.shortcuts import render
-from datetime import date
-from matches.models import Match
-from participation.models import Participation
 from accounts.decorators import active_user_required
+from .utils import get_upcoming_matches_feed
 
 @active_user_required
 def home(request):
@@ -10,13 +8,8 @@ def home(request):
     Home page view: shows upcoming matches and Join/Leave buttons
     """
 
-    upcoming_matches = Match.objects.filter(date__gte=date.today()).order_by('date', 'time')
+    upcoming_matches = get_upcoming_matches_feed(request.user)
 
-    if request.user.is_authenticated:
-        for match in upcoming_matches:
-            participation = Participation.objects.filter(user=request.user, match=match).first()
-            match.user_participation = participation
-    
     context = {
         'upcoming_matches': upcoming_matches,
     }
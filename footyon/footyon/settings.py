@@ -93,6 +93,20 @@ DATABASES = {
     }
 }
 
+# Shared by all the workers: the stats epoch, the cached leaderboard and its recompute lock
+# (stats/leaderboard.py) only work across processes with a shared cache.
+# The database cache needs no extra service, create its table once with `python manage.py createcachetable`.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'footyon_cache',
+        'OPTIONS': {
+            # Rendered share images (matches/share_image.py) live here too
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
 
 # After a successful login, Django's built-in LoginView will redirect here.
 # Set this to the URL name or path you want users to go to instead of the default '/accounts/profile/'.
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MatchesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'matches'
+
+    def ready(self):
+        # Register signal handlers (share image cache invalidation)
+        from . import signals  # noqa: F401
@@ -28,9 +28,7 @@ class MatchForm(forms.ModelForm):
     def clean_max_players(self):
         max_players = self.cleaned_data.get("max_players")
         if self.instance.pk:  # editing existing match
-            joined_count = self.instance.participation_set.filter(
-                status="joined", removed=False, is_no_show=False
-            ).count()
+            joined_count = self.instance.active_count
             if max_players < joined_count:
                 raise forms.ValidationError(
                     _("Cannot set max players below current joined count (%(count)d).") % {"count": joined_count}
@@ -0,0 +1,120 @@
+import io
+import os
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from django.utils import translation
+from participation.models import Participation
+from .models import Match
+from .share_image import cache_match_image, get_cached_match_image, match_image_etag, match_image_filename
+
+
+def _init_worker():
+    # Workers started with spawn/forkserver do not inherit a configured Django
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def render_image_job(job):
+    """
+    Render one share image in a worker process.
+    The job is plain data (no model instances or DB access in the worker).
+    """
+    from accounts.models import User
+    from .image_renderer import render_match_image
+    from .models import Stadium
+
+    translation.activate(job['lang'])
+    match = Match(
+        id=job['id'], date=job['date'], time=job['time'], day_of_week=job['day_of_week'],
+        stadium=Stadium(name=job['stadium_name']), max_players=job['max_players'],
+    )
+    participants = [Participation(user=User(username=username), match=match) for username in job['usernames']]
+    return render_match_image(match, participants, job['format'], optimize=True)
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only file object whose written bytes are drained after each zip entry"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def get_upcoming_image_jobs(lang, image_format='png'):
+    """One job per upcoming match, participants loaded in a single query"""
+    matches = list(Match.objects.upcoming().select_related('stadium').order_by('date', 'time'))
+
+    usernames = defaultdict(list)
+    for match_id, username in (
+        Participation.objects.filter(match__in=matches, status='joined', removed=False, is_no_show=False)
+        .order_by('status_time', 'id')
+        .values_list('match_id', 'user__username')
+    ):
+        usernames[match_id].append(username)
+
+    return [
+        (match, {
+            'id': match.id, 'date': match.date, 'time': match.time, 'day_of_week': match.day_of_week,
+            'stadium_name': match.stadium.name, 'max_players': match.max_players,
+            'usernames': usernames[match.id], 'lang': lang, 'format': image_format,
+        })
+        for match in matches
+    ]
+
+
+def iter_share_images(jobs, max_workers=None):
+    """
+    Yield (filename, image_bytes) in job order.
+    Cached images are reused, the others are rendered on a process pool with at most
+    `max_workers` images in flight, so memory stays bounded whatever the number of matches.
+    """
+    max_workers = max_workers or min(4, os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        pending = []
+        for match, job in jobs:
+            etag = match_image_etag(match, job['usernames'], job['lang'], job['format'])
+            cached = get_cached_match_image(etag)
+            future = None if cached else executor.submit(render_image_job, job)
+            pending.append((match, job, etag, cached, future))
+
+            while len(pending) > max_workers:
+                yield _collect(*pending.pop(0))
+        while pending:
+            yield _collect(*pending.pop(0))
+
+
+def _collect(match, job, etag, cached, future):
+    if cached:
+        image_bytes = cached[0]
+    else:
+        image_bytes = future.result()
+        cache_match_image(match.id, etag, image_bytes, int(time.time()))
+    with translation.override(job['lang']):
+        filename = match_image_filename(match, job['format'])
+    return f"{match.id}_{filename}", image_bytes
+
+
+def stream_share_images_zip(jobs, max_workers=None):
+    """Yield a ZIP archive chunk by chunk, one chunk per image"""
+    stream = _ZipStream()
+    # PNG and WebP are already compressed, store them as is
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for filename, image_bytes in iter_share_images(jobs, max_workers):
+            archive.writestr(filename, image_bytes)
+            yield stream.drain()
+    yield stream.drain()
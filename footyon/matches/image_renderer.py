@@ -0,0 +1,144 @@
+import io
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+from django.utils.translation import gettext as _
+from django.utils.translation import get_language
+
+WIDTH = 800
+HEADER_HEIGHT = 80
+INFO_HEIGHT = 200
+ROW_HEIGHT = 35
+INFO_WIDTH = WIDTH - 100
+
+# Supported output formats: query value -> (Pillow format, content type, extension)
+IMAGE_FORMATS = {
+    'png': ('PNG', 'image/png', 'png'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+}
+
+
+@lru_cache(maxsize=None)
+def load_fonts():
+    """Load the fonts once per process instead of once per image"""
+    try:
+        return {
+            'title': ImageFont.truetype('arialbd.ttf', 28),  # bold title
+            'header': ImageFont.truetype('arialbd.ttf', 22),  # bold header
+            'text': ImageFont.truetype('arial.ttf', 18),
+            'small': ImageFont.truetype('arial.ttf', 16),
+        }
+    except IOError:
+        default_font = ImageFont.load_default()
+        return {'title': default_font, 'header': default_font, 'text': default_font, 'small': default_font}
+
+
+def image_height(rows):
+    return 50 + rows * ROW_HEIGHT + 400  # dynamic height
+
+
+@lru_cache(maxsize=64)
+def base_layer(rows, lang):
+    """
+    Static part of the image for a number of rows (height bucket) and a language:
+    gradient, header, cards, section titles, row stripes and footer.
+    `lang` is part of the cache key, the titles use the active translation.
+    """
+    fonts = load_fonts()
+    width, height = WIDTH, image_height(rows)
+
+    # --- Background gradient effect: one pixel column stretched to the full width ---
+    column = Image.new('RGB', (1, height))
+    column.putdata([
+        (intensity, intensity + 1, intensity + 2)
+        for intensity in (int(248 + (i / height) * 7) for i in range(height))  # subtle gradient
+    ])
+    image = column.resize((width, height), Image.NEAREST)
+    draw = ImageDraw.Draw(image)
+
+    # --- Header section with background ---
+    draw.rectangle([0, 0, width, HEADER_HEIGHT], fill='#28a745')
+    draw.rectangle([0, HEADER_HEIGHT, width, HEADER_HEIGHT + 2], fill='#1e7e34')  # border
+    draw.text((width//2 - 150, 25), _("FOOTBALL MATCH"), font=fonts['title'], fill="#ffffff")
+
+    # --- Match info card ---
+    y = HEADER_HEIGHT + 30
+    draw.rectangle([50, y, 50 + INFO_WIDTH, y + INFO_HEIGHT], fill="#ffffff", outline="#dee2e6", width=2)
+    draw.rectangle([50, y, 50 + INFO_WIDTH, y + 40], fill="#e9ecef")
+    draw.text((70, y + 10), _("MATCH DETAILS"), font=fonts['header'], fill="#495057")
+
+    # --- Participants section with alternating row background ---
+    y = HEADER_HEIGHT + INFO_HEIGHT + 50
+    draw.rectangle([50, y, 50 + INFO_WIDTH, y + 40], fill="#e9ecef")
+    draw.text((70, y + 10), _("PARTICIPANTS"), font=fonts['header'], fill="#495057")
+    y += 50
+    for idx in range(1, rows + 1):
+        if idx % 2 == 0:
+            draw.rectangle([50, y - 5, 50 + INFO_WIDTH, y + 30], fill="#f8f9fa")
+        y += ROW_HEIGHT
+
+    # --- Footer ---
+    footer_y = height - 40
+    draw.rectangle([0, footer_y, width, height], fill="#343a40")
+    draw.text((width//2 - 100, footer_y + 10), _("Join this match on FootyOn!"), font=fonts['small'], fill="#ffffff")
+
+    return image
+
+
+def clear_layer_cache():
+    """Forget fonts and base layers (used by the benchmark to measure a cold render)"""
+    load_fonts.cache_clear()
+    base_layer.cache_clear()
+
+
+def draw_match_image(match, participants):
+    """Paste the match details and participants on a copy of the cached base layer"""
+    fonts = load_fonts()
+    max_players = match.max_players
+    spots_left = max(0, max_players - len(participants))
+    rows = max(max_players, len(participants))
+
+    image = base_layer(rows, get_language()).copy()
+    draw = ImageDraw.Draw(image)
+
+    # Theses variables were created to translate words inside an f-string
+    time_str = _("Time")
+    location_str = _("Location")
+    players_str = _("Players")
+    intotal_str = _("in total")
+    spots_left_str = _("spots left")
+
+    info_y = HEADER_HEIGHT + 30 + 60
+    draw.text((70, info_y), f"Date: {match.day_of_week}, {match.date}", font=fonts['text'], fill="#212529")
+    info_y += 35
+    draw.text((70, info_y), f"{time_str}: {match.time or 'TBD'}", font=fonts['text'], fill="#212529")
+    info_y += 35
+    draw.text((70, info_y), f"{location_str}: {match.stadium.name}", font=fonts['text'], fill="#212529")
+    info_y += 35
+    draw.text((70, info_y), f"{players_str}: {max_players} {intotal_str} • {spots_left} {spots_left_str}", font=fonts['text'], fill="#28a745" if spots_left > 0 else "#dc3545")
+
+    # Participants, then empty slots with different styling
+    y = HEADER_HEIGHT + INFO_HEIGHT + 100
+    for idx, p in enumerate(participants, start=1):
+        draw.text((70, y), f"{idx:2d}. {p.user.username}", font=fonts['text'], fill="#212529")
+        y += ROW_HEIGHT
+    for idx in range(len(participants)+1, max_players+1):
+        draw.text((70, y), f"{idx:2d}. ---", font=fonts['small'], fill="#6c757d")
+        y += ROW_HEIGHT
+
+    return image
+
+
+def encode_image(image, image_format='png', optimize=False):
+    """Encode as PNG (optionally optimized) or WebP"""
+    pillow_format = IMAGE_FORMATS[image_format][0]
+    buffer = io.BytesIO()
+    if pillow_format == 'WEBP':
+        image.save(buffer, format='WEBP', quality=90)
+    else:
+        image.save(buffer, format='PNG', optimize=optimize)
+    return buffer.getvalue()
+
+
+def render_match_image(match, participants, image_format='png', optimize=False):
+    """Draw the share image of a match and return the encoded bytes"""
+    return encode_image(draw_match_image(match, participants), image_format, optimize)
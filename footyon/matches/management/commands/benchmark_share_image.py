@@ -0,0 +1,139 @@
+import time
+from datetime import date, time as match_time
+from PIL import Image, ImageDraw, ImageFont
+from django.core.management.base import BaseCommand
+from django.utils import translation
+from django.utils.translation import gettext as _
+from accounts.models import User
+from matches.image_renderer import clear_layer_cache, draw_match_image, encode_image
+from matches.models import Match, Stadium
+from participation.models import Participation
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark of the share image renderer, before (per-row gradient) vs after (cached layers)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, nargs='+', default=[10, 20, 30],
+                            help="Match sizes to render")
+        parser.add_argument('--runs', type=int, default=20, help="Images rendered per measure")
+        parser.add_argument('--format', default='png', choices=['png', 'webp'])
+        parser.add_argument('--lang', default='en')
+
+    def handle(self, *args, **options):
+        translation.activate(options['lang'])
+        stadium = Stadium(name="Stade Municipal")
+
+        self.stdout.write(
+            f"{'players':>8} {'before ms':>10} {'miss ms':>8} {'hit ms':>8} {'speedup':>8} {'encode ms':>10}"
+        )
+        for players in options['players']:
+            # Unsaved objects: the benchmark only measures drawing and encoding
+            match = Match(date=date.today(), time=match_time(20, 0), day_of_week="Friday",
+                          stadium=stadium, max_players=players)
+            participants = [
+                Participation(user=User(username=f"player{i:03d}"), match=match)
+                for i in range(players)
+            ]
+
+            # Before: fonts loaded and the gradient drawn line by line for every image
+            before = self.measure(options['runs'], lambda: baseline_draw(match, participants))
+            # After, layer cache miss: fonts and base layers rebuilt for every image
+            miss = self.measure(options['runs'], lambda: (
+                clear_layer_cache(), draw_match_image(match, participants)
+            ))
+            # After, layer cache hit: base layers are reused, only the text is drawn
+            hit = self.measure(options['runs'], lambda: draw_match_image(match, participants))
+
+            image = draw_match_image(match, participants)
+            encode = self.measure(options['runs'], lambda: encode_image(image, options['format']))
+
+            self.stdout.write(
+                f"{players:>8} {before:>10.2f} {miss:>8.2f} {hit:>8.2f} {before / hit:>7.1f}x {encode:>10.2f}"
+            )
+
+    def measure(self, runs, render):
+        render()  # warm up imports
+        start = time.perf_counter()
+        for _ in range(runs):
+            render()
+        return (time.perf_counter() - start) / runs * 1000
+
+
+def baseline_draw(match, participants):
+    """The drawing of the share image before matches.image_renderer, kept as the baseline"""
+    max_players = match.max_players
+    spots_left = max(0, max_players - len(participants))
+
+    # --- Image dimensions ---
+    width, height = 800, 50 + max(max_players, len(participants)) * 35 + 400  # dynamic height
+    image = Image.new('RGB', (width, height), color='#f8f9fa')
+    draw = ImageDraw.Draw(image)
+
+    # --- Fonts ---
+    try:
+        title_font = ImageFont.truetype('arialbd.ttf', 28)  # bold title
+        header_font = ImageFont.truetype('arialbd.ttf', 22)  # bold header
+        text_font = ImageFont.truetype('arial.ttf', 18)
+        small_font = ImageFont.truetype('arial.ttf', 16)
+    except IOError:
+        title_font = ImageFont.load_default()
+        header_font = ImageFont.load_default()
+        text_font = ImageFont.load_default()
+        small_font = ImageFont.load_default()
+
+    # --- Background gradient effect ---
+    for i in range(height):
+        color_intensity = int(248 + (i / height) * 7)  # subtle gradient
+        draw.line([(0, i), (width, i)], fill=(color_intensity, color_intensity + 1, color_intensity + 2))
+
+    # --- Header section with background ---
+    header_height = 80
+    draw.rectangle([0, 0, width, header_height], fill='#28a745')
+    draw.rectangle([0, header_height, width, header_height + 2], fill='#1e7e34')  # border
+    draw.text((width//2 - 150, 25), _("FOOTBALL MATCH"), font=title_font, fill="#ffffff")
+
+    # --- Match info section with card-like background ---
+    y = header_height + 30
+    info_width = width - 100
+    info_height = 200
+    draw.rectangle([50, y, 50 + info_width, y + info_height], fill="#ffffff", outline="#dee2e6", width=2)
+    draw.rectangle([50, y, 50 + info_width, y + 40], fill="#e9ecef")
+    draw.text((70, y + 10), _("MATCH DETAILS"), font=header_font, fill="#495057")
+
+    info_y = y + 60
+    draw.text((70, info_y), f"Date: {match.day_of_week}, {match.date}", font=text_font, fill="#212529")
+    info_y += 35
+    draw.text((70, info_y), f"{_('Time')}: {match.time or 'TBD'}", font=text_font, fill="#212529")
+    info_y += 35
+    draw.text((70, info_y), f"{_('Location')}: {match.stadium.name}", font=text_font, fill="#212529")
+    info_y += 35
+    draw.text(
+        (70, info_y), f"{_('Players')}: {max_players} {_('in total')} • {spots_left} {_('spots left')}",
+        font=text_font, fill="#28a745" if spots_left > 0 else "#dc3545",
+    )
+
+    # --- Participants section ---
+    y = header_height + info_height + 50
+    draw.rectangle([50, y, 50 + info_width, y + 40], fill="#e9ecef")
+    draw.text((70, y + 10), _("PARTICIPANTS"), font=header_font, fill="#495057")
+
+    # Participants list with alternating background, then empty slots
+    y += 50
+    for idx, p in enumerate(participants, start=1):
+        if idx % 2 == 0:
+            draw.rectangle([50, y - 5, 50 + info_width, y + 30], fill="#f8f9fa")
+        draw.text((70, y), f"{idx:2d}. {p.user.username}", font=text_font, fill="#212529")
+        y += 35
+    for idx in range(len(participants)+1, max_players+1):
+        if idx % 2 == 0:
+            draw.rectangle([50, y - 5, 50 + info_width, y + 30], fill="#f8f9fa")
+        draw.text((70, y), f"{idx:2d}. ---", font=small_font, fill="#6c757d")
+        y += 35
+
+    # --- Footer ---
+    footer_y = height - 40
+    draw.rectangle([0, footer_y, width, height], fill="#343a40")
+    draw.text((width//2 - 100, footer_y + 10), _("Join this match on FootyOn!"), font=small_font, fill="#ffffff")
+
+    return image
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import translation
+from matches.image_export import get_upcoming_image_jobs, stream_share_images_zip
+
+
+class Command(BaseCommand):
+    help = "Write a ZIP with the share image of every upcoming match"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Path of the ZIP file to write")
+        parser.add_argument('--workers', type=int, default=None, help="Number of rendering processes")
+        parser.add_argument('--lang', default='en')
+        parser.add_argument('--format', default='png', choices=['png', 'webp'])
+
+    def handle(self, *args, **options):
+        translation.activate(options['lang'])
+        jobs = get_upcoming_image_jobs(options['lang'], options['format'])
+
+        with open(options['output'], 'wb') as f:
+            for chunk in stream_share_images_zip(jobs, options['workers']):
+                f.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {len(jobs)} images to {options['output']}."))
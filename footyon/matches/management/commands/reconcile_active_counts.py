@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from matches.models import Match, active_count_subquery
+
+
+class Command(BaseCommand):
+    help = "Recompute Match.active_count from participations and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, do not fix it")
+
+    def handle(self, *args, **options):
+        drifted = list(
+            Match.objects.annotate(actual_count=active_count_subquery())
+            .exclude(active_count=F('actual_count'))
+            .values_list('id', 'active_count', 'actual_count')
+        )
+
+        for match_id, stored, actual in drifted:
+            self.stdout.write(f"Match {match_id}: stored {stored}, actual {actual} ({actual - stored:+d})")
+
+        if drifted and not options['dry_run']:
+            # Recomputed in SQL row by row, so concurrent F() updates are not overwritten by stale values
+            Match.objects.filter(id__in=[row[0] for row in drifted]).update(active_count=active_count_subquery())
+
+        verb = "Found" if options['dry_run'] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drifted)} matches with a drifted active count."))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from matches.map_resolver import CircuitOpenError, MapResolver
+from matches.models import Stadium
+
+MAP_FIELDS = ['google_maps_embed_url', 'google_maps_place_id', 'latitude', 'longitude']
+
+
+class Command(BaseCommand):
+    help = "Resolve Google Maps embed URLs for stadiums concurrently"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Re-resolve every stadium, not only the unresolved ones")
+        parser.add_argument('--workers', type=int, default=8, help="Number of concurrent requests")
+        parser.add_argument('--retries', type=int, default=3, help="Retries per link after a failure")
+        parser.add_argument('--backoff', type=float, default=0.5,
+                            help="Initial backoff in seconds, doubled after each retry")
+        parser.add_argument('--rate', type=float, default=5.0, help="Max requests per second per host")
+        parser.add_argument('--failure-threshold', type=int, default=10,
+                            help="Stop after this many consecutive failures")
+        parser.add_argument('--timeout', type=float, default=10, help="Timeout per request in seconds")
+
+    def handle(self, *args, **options):
+        stadiums = Stadium.objects.exclude(google_maps_short_url__isnull=True).exclude(google_maps_short_url='')
+        if not options['all']:
+            stadiums = stadiums.filter(google_maps_embed_url__isnull=True)
+        stadiums = list(stadiums)
+
+        resolver = MapResolver(
+            max_workers=options['workers'],
+            retries=options['retries'],
+            backoff=options['backoff'],
+            rate_limit=options['rate'],
+            failure_threshold=options['failure_threshold'],
+            timeout=options['timeout'],
+        )
+
+        resolved, not_found, failed, skipped = [], 0, 0, 0
+        try:
+            for stadium, details, error in resolver.resolve_stadiums(stadiums):
+                if isinstance(error, CircuitOpenError):
+                    skipped += 1
+                elif error:
+                    failed += 1
+                    self.stderr.write(f"{stadium.name}: {error}")
+                else:
+                    if details is None:
+                        not_found += 1
+                    stadium.apply_map_details(details)
+                    resolved.append(stadium)
+        finally:
+            resolver.close()
+
+        # bulk_update does not call Stadium.save(), so links are not resolved a second time
+        Stadium.objects.bulk_update(resolved, MAP_FIELDS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Resolved {len(resolved) - not_found}/{len(stadiums)} stadiums "
+            f"({not_found} without a place, {failed} failed, {skipped} skipped)."
+        ))
+        if resolver.breaker.is_open:
+            self.stderr.write(self.style.ERROR("Stopped early: too many consecutive failures."))
@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from .utils import resolve_map_details
+
+
+class CircuitOpenError(Exception):
+    """Raised when too many consecutive failures stopped the resolver"""
+
+
+class HostRateLimiter:
+    """
+    Spread requests to the same host at least `min_interval` seconds apart.
+    Each caller reserves the next free slot for its host, then sleeps until it.
+    """
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """Open after `failure_threshold` consecutive failures, and stay open"""
+
+    def __init__(self, failure_threshold):
+        self.failure_threshold = failure_threshold
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.failures >= self.failure_threshold
+
+    def record_success(self):
+        with self._lock:
+            if not self.is_open:
+                self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+
+class MapResolver:
+    """
+    Resolve many Google Maps short URLs concurrently:
+    - one pooled requests.Session shared by a bounded thread pool
+    - per-host rate limiting
+    - retries with exponential backoff
+    - a circuit breaker that stops trying after repeated failures
+    """
+
+    def __init__(self, max_workers=8, retries=3, backoff=0.5, rate_limit=5.0,
+                 failure_threshold=10, timeout=10):
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(1.0 / rate_limit if rate_limit else 0)
+        self.breaker = CircuitBreaker(failure_threshold)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def resolve(self, short_url):
+        """Resolve one short URL, retrying with exponential backoff"""
+        for attempt in range(self.retries + 1):
+            if self.breaker.is_open:
+                raise CircuitOpenError(short_url)
+            self.limiter.wait(short_url)
+            try:
+                details = resolve_map_details(short_url, session=self.session, timeout=self.timeout)
+            except requests.RequestException:
+                self.breaker.record_failure()
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt))
+            else:
+                self.breaker.record_success()
+                return details
+
+    def resolve_stadiums(self, stadiums):
+        """
+        Yield (stadium, details, error) as each stadium's short URL is resolved.
+        error is None on success, details is None when nothing could be extracted.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.resolve, stadium.google_maps_short_url): stadium
+                for stadium in stadiums
+            }
+            for future in as_completed(futures):
+                stadium = futures[future]
+                try:
+                    yield stadium, future.result(), None
+                except Exception as e:
+                    yield stadium, None, e
+
+    def close(self):
+        self.session.close()
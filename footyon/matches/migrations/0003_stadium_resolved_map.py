@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0002_remove_stadium_google_maps_embed_url_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stadium',
+            name='google_maps_embed_url',
+            field=models.URLField(blank=True, max_length=1000, null=True, verbose_name='Google Maps Embed URL'),
+        ),
+        migrations.AddField(
+            model_name='stadium',
+            name='google_maps_place_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='stadium',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stadium',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:05
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_active_count(apps, schema_editor):
+    Match = apps.get_model('matches', 'Match')
+    Participation = apps.get_model('participation', 'Participation')
+    active_count = (
+        Participation.objects.filter(
+            match=models.OuterRef('pk'), status='joined', removed=False, is_no_show=False
+        )
+        .order_by()
+        .values('match')
+        .annotate(count=models.Count('id'))
+        .values('count')
+    )
+    Match.objects.update(active_count=Coalesce(models.Subquery(active_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0003_stadium_resolved_map'),
+        ('participation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='active_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Active Players'),
+        ),
+        migrations.RunPython(fill_active_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:49
+
+from datetime import datetime
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_starts_at(apps, schema_editor):
+    Match = apps.get_model('matches', 'Match')
+    matches = list(Match.objects.filter(time__isnull=False).only('date', 'time'))
+    for match in matches:
+        match.starts_at = timezone.make_aware(
+            datetime.combine(match.date, match.time), timezone.get_default_timezone()
+        )
+    Match.objects.bulk_update(matches, ['starts_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0004_match_active_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='starts_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Starts At'),
+        ),
+        migrations.RunPython(fill_starts_at, migrations.RunPython.noop),
+    ]
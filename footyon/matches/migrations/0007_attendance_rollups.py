@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='attendance_rolled_up',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(condition=models.Q(('attendance_rolled_up', False)), fields=['date'], name='match_rollup_pending_idx'),
+        ),
+    ]
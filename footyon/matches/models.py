@@ -5,17 +5,103 @@ from django.utils import timezone
 from datetime import timedelta
 from datetime import datetime
 from django.utils.translation import gettext_lazy as _
+from django.db.models.functions import Coalesce
+from .utils import resolve_map_details
+
+# How long after the start attendance (no-shows, presence) and match details can be edited
+ATTENDANCE_EDIT_HOURS = 24
+MATCH_EDIT_MINUTES = 60
 
 class Stadium(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name=_("Stadium Name"))
     google_maps_short_url = models.URLField(blank=True, null=True) 
+
+    # Resolved once from the short URL so match pages never follow the redirect themselves
+    google_maps_embed_url = models.URLField(max_length=1000, blank=True, null=True, verbose_name=_("Google Maps Embed URL"))
+    google_maps_place_id = models.CharField(max_length=100, blank=True, null=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated At"))
 
     def __str__(self):
         return self.name
 
-  
+    def save(self, *args, **kwargs):
+        # Resolve the embed when the short URL changed (or was never resolved)
+        if kwargs.get('update_fields') is None and self.map_needs_refresh():
+            self.refresh_map_embed()
+        super().save(*args, **kwargs)
+
+    def map_needs_refresh(self):
+        if not self.google_maps_short_url:
+            return bool(self.google_maps_embed_url)
+        if not self.google_maps_embed_url or not self.pk:
+            return True
+        stored_url = Stadium.objects.filter(pk=self.pk).values_list('google_maps_short_url', flat=True).first()
+        return stored_url != self.google_maps_short_url
+
+    def apply_map_details(self, details):
+        """Copy the resolved map details on the stadium (None clears them)"""
+        details = details or {}
+        self.google_maps_embed_url = details.get('embed_url')
+        self.google_maps_place_id = details.get('place_id')
+        self.latitude = details.get('latitude')
+        self.longitude = details.get('longitude')
+
+    def refresh_map_embed(self, session=None):
+        """Follow the short URL and store the embed URL, place id and coordinates"""
+        details = None
+        if self.google_maps_short_url:
+            try:
+                details = resolve_map_details(self.google_maps_short_url, session=session)
+            except Exception as e:
+                print(f"Error converting Google Maps URL: {e}")
+        self.apply_map_details(details)
+        return details is not None
+
+
+def active_count_subquery():
+    """SQL count of a match's active participants, to compare with or reset Match.active_count"""
+    active = (
+        Participation.objects.filter(
+            match=models.OuterRef('pk'), status='joined', removed=False, is_no_show=False
+        )
+        .order_by()
+        .values('match')
+        .annotate(count=models.Count('id'))
+        .values('count')
+    )
+    return Coalesce(models.Subquery(active), 0)
+
+
+class MatchQuerySet(models.QuerySet):
+    """Time rules of Match (is_past, can_edit_attendance) as SQL filters on starts_at"""
+
+    def upcoming(self):
+        """Matches not started yet (untimed matches until the end of their day)"""
+        # starts_at is in the local day of `date`, so the date bound holds for every row
+        # and lets match_date_time_idx seek instead of reading the whole table
+        return self.filter(date__gte=timezone.localdate()).filter(
+            models.Q(starts_at__gte=timezone.now()) | models.Q(starts_at__isnull=True)
+        )
+
+    def past(self):
+        """Matches already started, the complement of upcoming()"""
+        return self.filter(date__lte=timezone.localdate()).filter(
+            models.Q(starts_at__lt=timezone.now())
+            | models.Q(starts_at__isnull=True, date__lt=timezone.localdate())
+        )
+
+    def attendance_locked(self):
+        """Matches whose attendance can no longer be edited (see can_edit_attendance)"""
+        return self.filter(
+            models.Q(starts_at__isnull=True)
+            | models.Q(starts_at__lt=timezone.now() - timedelta(hours=ATTENDANCE_EDIT_HOURS))
+        )
+
+
 class Match(models.Model):
     date = models.DateField(verbose_name=_("Date"))
     time = models.TimeField(null=True, blank=True, verbose_name=_("Time"))
@@ -31,6 +117,27 @@ class Match(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated At"))
     max_players = models.PositiveIntegerField(default=12, verbose_name=_("Max Players"))
+
+    # date + time as an aware datetime, kept in sync by save() (None when there is no time)
+    starts_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True, verbose_name=_("Starts At"))
+
+    # Number of active participants (joined, not removed, not no-show)
+    # Maintained with F() updates by Participation.save() and the participation post_delete signal,
+    # recomputed by the reconcile_active_counts command
+    active_count = models.IntegerField(default=0, editable=False, verbose_name=_("Active Players"))
+
+    # Set once the locked attendance of the match is added to the stats monthly rollups
+    attendance_rolled_up = models.BooleanField(default=False, editable=False)
+
+    objects = MatchQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Home / manage_matches ordering and keyset pagination over (date, time, id)
+            models.Index(fields=['date', 'time', 'id'], name='match_date_time_idx'),
+            # Matches whose attendance is not in the rollups yet, a handful at any time
+            models.Index(fields=['date'], condition=models.Q(attendance_rolled_up=False), name='match_rollup_pending_idx'),
+        ]
     
     def __str__(self):
         return f"{self.stadium.name} on {self.date}"
@@ -39,48 +146,60 @@ class Match(models.Model):
         # Automatically set the day of the week from the date
         if self.date:
             self.day_of_week = calendar.day_name[self.date.weekday()]
+        self.starts_at = self.compute_starts_at()
+
+        # Never write back a possibly stale active_count or rollup flag, they are only changed with updates
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('active_count', 'attendance_rolled_up')
+            ]
         super().save(*args, **kwargs)
 
+    @classmethod
+    def take_spot(cls, match_id):
+        """Atomically take one spot if any is left, returns False when the match is full"""
+        return cls.objects.filter(pk=match_id, active_count__lt=models.F('max_players')).update(
+            active_count=models.F('active_count') + 1
+        ) == 1
+
+    @classmethod
+    def adjust_active_count(cls, match_id, delta):
+        """Atomically add delta to a match's active_count"""
+        if delta:
+            cls.objects.filter(pk=match_id).update(active_count=models.F('active_count') + delta)
+
     @property
     def spots_left(self):
-        """Calculate remaining spots based on current participation"""
-        current_count = Participation.objects.filter(
-            match=self, status='joined', removed=False, is_no_show=False
-        ).count()
-        return max(0, self.max_players - current_count)
+        """Calculate remaining spots from the stored active participants count"""
+        return max(0, self.max_players - self.active_count)
     
     @property
     def is_full(self):
         return self.spots_left <= 0
     
+    def compute_starts_at(self):
+        if not (self.date and self.time):
+            return None
+        return timezone.make_aware(datetime.combine(self.date, self.time), timezone.get_default_timezone())
+
     @property
     def is_past(self):
         """Check if the match date and time is in the past."""
-        now = timezone.now()
-        if self.date < now.date():
-            return True
-        elif self.date == now.date() and self.time:
-            match_datetime = datetime.combine(self.date, self.time)
-            match_datetime = timezone.make_aware(match_datetime, timezone.get_current_timezone())
-            return match_datetime < now
-        return False
+        if self.starts_at:
+            return self.starts_at < timezone.now()
+        return self.date < timezone.localdate()
 
     @property
     def can_edit_attendance(self):
         """Check if attendance can still be edited (within 24 hours after match time)"""
-        if not self.time:
+        if not self.starts_at:
             return False
-        match_datetime = datetime.combine(self.date, self.time)
-        match_datetime = timezone.make_aware(match_datetime)
-        return timezone.now() <= match_datetime + timedelta(hours=24)
+        return timezone.now() <= self.starts_at + timedelta(hours=ATTENDANCE_EDIT_HOURS)
     
     @property
     def can_edit_match(self):
         """Check if match details can still be edited (up to 1 hour after match time)"""
-        if not self.time:
+        if not self.starts_at:
             return False
-        match_datetime = datetime.combine(self.date, self.time)
-        match_datetime = timezone.make_aware(match_datetime)
-        return timezone.now() <= match_datetime + timedelta(minutes=60)
-
-
+        return timezone.now() <= self.starts_at + timedelta(minutes=MATCH_EDIT_MINUTES)
@@ -0,0 +1,107 @@
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+PAGE_SIZE = 10
+
+# Home / manage_matches ordering, follows the match_date_time_idx index
+MATCH_KEYS = ('date', 'time', 'id')
+
+
+def _key_fields(queryset, keys):
+    """Model field (or annotation output field) of each sort key"""
+    annotations = queryset.query.annotations
+    return [
+        annotations[key].output_field if key in annotations else queryset.model._meta.get_field(key)
+        for key in keys
+    ]
+
+
+def encode_cursor(obj, keys=MATCH_KEYS):
+    """Position of a row in the keys ordering, e.g. 2025-10-08_20:00:00_42 or alex_42"""
+    parts = []
+    for key in keys:
+        value = getattr(obj, key)
+        parts.append('none' if value is None else value.isoformat() if hasattr(value, 'isoformat') else str(value))
+    return '_'.join(parts)
+
+
+def decode_cursor(queryset, value, keys=MATCH_KEYS):
+    """
+    Return the values of the keys, or None if the cursor is missing or invalid.
+    Only the first key may contain '_' (e.g. a username), the others are split from the right.
+    """
+    try:
+        parts = value.rsplit('_', len(keys) - 1)
+        if len(parts) != len(keys):
+            return None
+        return tuple(
+            None if part == 'none' and field.null else field.to_python(part)
+            for field, part in zip(_key_fields(queryset, keys), parts)
+        )
+    except (AttributeError, ValueError, ValidationError):
+        return None
+
+
+def _seek(keys, fields, cursor, reverse_order):
+    """
+    Rows after the cursor in the keys ordering (before it when reverse_order),
+    NULLs sort last in ascending order like the PostgreSQL indexes.
+    """
+    condition = Q(pk__in=[])
+    equal = Q()
+    for key, field, value in zip(keys, fields, cursor):
+        if value is None:
+            # Only the other NULLs come after a NULL, every value comes before it
+            if reverse_order:
+                condition |= equal & Q(**{f'{key}__isnull': False})
+            equal &= Q(**{f'{key}__isnull': True})
+        else:
+            beyond = Q(**{f"{key}__{'lt' if reverse_order else 'gt'}": value})
+            if field.null and not reverse_order:
+                beyond |= Q(**{f'{key}__isnull': True})
+            condition |= equal & beyond
+            equal &= Q(**{key: value})
+    return condition
+
+
+def keyset_page(queryset, keys=MATCH_KEYS, after=None, before=None, descending=False, page_size=PAGE_SIZE):
+    """
+    One page of rows ordered by keys, seeking from a cursor instead of using
+    OFFSET, so every page costs the same whatever its depth.
+    - keys: sort key, columns or annotations, ending with a unique tie-breaker (e.g. id)
+    - after: cursor of the last row of the previous page (next page)
+    - before: cursor of the first row of the following page (previous page)
+    """
+    fields = _key_fields(queryset, keys)
+    after, before = decode_cursor(queryset, after, keys), decode_cursor(queryset, before, keys)
+    cursor = before or after
+    backwards = before is not None
+
+    # Going backwards reads the ordering in reverse, then flips the rows back
+    reverse_order = descending != backwards
+
+    if cursor:
+        queryset = queryset.filter(_seek(keys, fields, cursor, reverse_order))
+
+    ordering = []
+    for key, field in zip(keys, fields):
+        if not field.null:
+            ordering.append(f'-{key}' if reverse_order else key)
+        elif reverse_order:
+            ordering.append(F(key).desc(nulls_first=True))
+        else:
+            ordering.append(F(key).asc(nulls_last=True))
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    has_next = cursor is not None if backwards else has_more
+    has_previous = has_more if backwards else cursor is not None
+
+    return {
+        'rows': rows,
+        'next_cursor': encode_cursor(rows[-1], keys) if rows and has_next else None,
+        'previous_cursor': encode_cursor(rows[0], keys) if rows and has_previous else None,
+    }
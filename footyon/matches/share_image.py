@@ -0,0 +1,83 @@
+import hashlib
+import json
+from django.core.cache import cache
+from django.utils.translation import gettext as _
+
+# Bump when the drawing code changes so old cached images are not served
+RENDER_VERSION = 2
+
+# Rendered images are content-addressed, a stale entry is never served, it only expires
+IMAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Fields drawn on the image (or deciding who is drawn, in which order): saves limited
+# to other fields (update_fields) keep the cached images
+MATCH_IMAGE_FIELDS = {'date', 'time', 'day_of_week', 'stadium', 'stadium_id', 'max_players'}
+PARTICIPATION_IMAGE_FIELDS = {'user', 'user_id', 'match', 'match_id', 'status', 'status_time', 'removed', 'is_no_show'}
+
+
+def get_active_participants(match):
+    """Active participants in join order, with their user"""
+    return list(
+        match.participation_set.filter(status='joined', removed=False, is_no_show=False)
+        .select_related('user')
+        .order_by('status_time', 'id')
+    )
+
+
+def match_image_etag(match, usernames, lang, image_format='png'):
+    """Hash of everything drawn on the image: match fields, participants, language and format"""
+    content = {
+        'version': RENDER_VERSION,
+        'match': [match.id, str(match.date), str(match.time), match.day_of_week,
+                  match.stadium.name, match.max_players],
+        'participants': list(usernames),
+        'lang': lang,
+        'format': image_format,
+    }
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+
+def _image_cache_key(etag):
+    return f"match_image:{etag}"
+
+
+def _match_keys_cache_key(match_id):
+    return f"match_image_keys:{match_id}"
+
+
+def get_cached_match_image(etag):
+    """Return (image_bytes, rendered_at_timestamp) or None"""
+    return cache.get(_image_cache_key(etag))
+
+
+def cache_match_image(match_id, etag, image_bytes, rendered_at):
+    cache.set(_image_cache_key(etag), (image_bytes, rendered_at), IMAGE_CACHE_TIMEOUT)
+
+    # Remember which entries belong to the match so they can be dropped on change
+    keys_key = _match_keys_cache_key(match_id)
+    keys = cache.get(keys_key, set())
+    keys.add(_image_cache_key(etag))
+    cache.set(keys_key, keys, IMAGE_CACHE_TIMEOUT)
+
+
+def invalidate_match_image(match_id):
+    """Drop every cached image of a match (all languages and formats)"""
+    keys_key = _match_keys_cache_key(match_id)
+    keys = cache.get(keys_key)
+    if keys:
+        cache.delete_many(list(keys))
+    cache.delete(keys_key)
+
+
+def match_image_filename(match, extension='png'):
+    """ Dynamically generate filename:"""
+    # Format date
+    date_part = match.date.strftime("%d_%m_%Y")  # day_month_year
+    time_part = match.time.strftime("%Hh%M") if match.time else "TBD"
+
+    # Translate weekday
+    weekday_translated = _(match.day_of_week)  # e.g., "Wednesday" → "Mercredi"
+
+    # Build filename
+    return f"match_{date_part}_{weekday_translated}_{time_part}.{extension}"
+
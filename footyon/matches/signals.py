@@ -0,0 +1,33 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from participation.models import Participation, attendance_sheet_saved
+from .models import Match
+from .share_image import MATCH_IMAGE_FIELDS, PARTICIPATION_IMAGE_FIELDS, invalidate_match_image
+
+
+def drop_match_image(match_id):
+    # After the commit: the cache lives in the database, its rows must not stay
+    # locked by the match / participation transaction
+    transaction.on_commit(partial(invalidate_match_image, match_id))
+
+
+@receiver([post_save, post_delete], sender=Match)
+def drop_match_image_on_match_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & MATCH_IMAGE_FIELDS:
+        return
+    drop_match_image(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Participation)
+def drop_match_image_on_participation_change(sender, instance, update_fields=None, **kwargs):
+    # e.g. presence marks: not on the image
+    if update_fields and not set(update_fields) & PARTICIPATION_IMAGE_FIELDS:
+        return
+    drop_match_image(instance.match_id)
+
+
+@receiver(attendance_sheet_saved, sender=Participation)
+def drop_match_image_on_attendance_sheet(sender, match, **kwargs):
+    drop_match_image(match.id)
@@ -1,3 +1,433 @@
+import io
+import tempfile
+import threading
+import zipfile
+from datetime import date, time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from .forms import StadiumForm
+from participation.models import Participation
+from .models import Match, Stadium
+from .image_renderer import base_layer, clear_layer_cache, draw_match_image, render_match_image
+from .management.commands.benchmark_share_image import baseline_draw
+from .map_resolver import CircuitOpenError, MapResolver
+from .utils import extract_map_details
 
-# Create your tests here.
+FULL_MAPS_URL = (
+    "https://www.google.com/maps/place/Stade+Municipal/"
+    "@43.6043,1.4437,17z/data=!4m6!3m5!1s0x12aebb6fec7552ff:0xa8d73d2a2ad6b0e1"
+)
+
+
+def fake_redirect(url=FULL_MAPS_URL):
+    return mock.Mock(url=url)
+
+
+class MapDetailsExtractionTests(TestCase):
+
+    def test_extracts_place_id_and_coordinates(self):
+        details = extract_map_details(FULL_MAPS_URL)
+        self.assertEqual(details["place_id"], "0x12aebb6fec7552ff:0xa8d73d2a2ad6b0e1")
+        self.assertEqual(details["latitude"], 43.6043)
+        self.assertEqual(details["longitude"], 1.4437)
+        self.assertIn("!2sStade Municipal", details["embed_url"])
+
+    def test_returns_none_without_place(self):
+        self.assertIsNone(extract_map_details("https://www.google.com/maps/@43.6,1.4,17z"))
+
+
+class StadiumEmbedPersistenceTests(TestCase):
+
+    @mock.patch("matches.utils.requests.get", return_value=fake_redirect())
+    def test_form_save_resolves_embed_once(self, get):
+        form = StadiumForm(data={"name": "Stade", "google_maps_short_url": "https://maps.app.goo.gl/abc"})
+        self.assertTrue(form.is_valid())
+        stadium = form.save()
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(stadium.google_maps_place_id, "0x12aebb6fec7552ff:0xa8d73d2a2ad6b0e1")
+
+        # Saving again without touching the link does not hit the network
+        stadium.name = "Stade Municipal"
+        stadium.save()
+        self.assertEqual(get.call_count, 1)
+
+    @mock.patch("matches.utils.requests.get", return_value=fake_redirect())
+    def test_changing_short_url_resolves_again(self, get):
+        stadium = Stadium.objects.create(name="Stade", google_maps_short_url="https://maps.app.goo.gl/abc")
+        stadium.google_maps_short_url = "https://maps.app.goo.gl/xyz"
+        stadium.save()
+        self.assertEqual(get.call_count, 2)
+
+        stadium.google_maps_short_url = None
+        stadium.save()
+        stadium.refresh_from_db()
+        self.assertIsNone(stadium.google_maps_embed_url)
+
+    @mock.patch("matches.utils.requests.get", side_effect=OSError("network down"))
+    def test_unresolvable_link_keeps_stadium_saved(self, get):
+        stadium = Stadium.objects.create(name="Stade", google_maps_short_url="https://maps.app.goo.gl/abc")
+        self.assertIsNotNone(stadium.pk)
+        self.assertIsNone(stadium.google_maps_embed_url)
+
+
+class ViewMatchMapTests(TestCase):
+
+    def test_view_match_reads_stored_embed_without_http(self):
+        with mock.patch("matches.utils.requests.get", return_value=fake_redirect()):
+            stadium = Stadium.objects.create(name="Stade", google_maps_short_url="https://maps.app.goo.gl/abc")
+        match = Match.objects.create(
+            date=date.today() + timedelta(days=1), time=time(20, 0), stadium=stadium
+        )
+        user = User.objects.create_user(username="alex123", password="pass")
+        self.client.force_login(user)
+
+        with mock.patch("matches.utils.requests.get", side_effect=AssertionError("outbound HTTP")):
+            response = self.client.get(reverse("matches:view_match", args=[match.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, stadium.google_maps_embed_url)
+
+
+class StubMapsHandler(BaseHTTPRequestHandler):
+    """Redirect /short/<n> to a local full Google Maps style URL, /broken/<n> answers 500"""
+
+    def do_GET(self):
+        self.server.hits += 1
+        if self.path.startswith("/short/"):
+            self.send_response(302)
+            self.send_header("Location", "/maps/place/Stade/@43.6043,1.4437,17z/data=!1s0x12ab:0xcd")
+            self.end_headers()
+        elif self.path.startswith("/maps/"):
+            self.send_response(200)
+            self.end_headers()
+        else:
+            self.send_response(500)
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class ResolveStadiumMapsCommandTests(TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubMapsHandler)
+        self.server.hits = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def create_stadiums(self, prefix, count):
+        # bulk_create skips Stadium.save(), so nothing is resolved yet
+        Stadium.objects.bulk_create(
+            Stadium(name=f"{prefix} {i}", google_maps_short_url=f"{self.base_url}/{prefix}/{i}")
+            for i in range(count)
+        )
+
+    def test_resolves_every_stadium_through_stub_server(self):
+        self.create_stadiums("short", 6)
+        out = StringIO()
+        call_command("resolve_stadium_maps", "--workers=3", "--rate=0", stdout=out)
+
+        self.assertIn("Resolved 6/6", out.getvalue())
+        for stadium in Stadium.objects.all():
+            self.assertEqual(stadium.google_maps_place_id, "0x12ab:0xcd")
+            self.assertEqual(stadium.latitude, 43.6043)
+
+    def test_circuit_breaker_stops_after_repeated_failures(self):
+        self.create_stadiums("broken", 5)
+        out, err = StringIO(), StringIO()
+        call_command(
+            "resolve_stadium_maps", "--workers=1", "--retries=1", "--backoff=0",
+            "--rate=0", "--failure-threshold=2", stdout=out, stderr=err,
+        )
+
+        self.assertEqual(self.server.hits, 2)
+        self.assertIn("4 skipped", out.getvalue())
+        self.assertIn("Stopped early", err.getvalue())
+        self.assertFalse(Stadium.objects.exclude(google_maps_embed_url=None).exists())
+
+    def test_retries_with_exponential_backoff(self):
+        resolver = MapResolver(retries=2, backoff=0.01, rate_limit=0, failure_threshold=10)
+        with mock.patch("matches.map_resolver.time.sleep") as sleep:
+            with self.assertRaises(Exception):
+                resolver.resolve(f"{self.base_url}/broken/1")
+        resolver.close()
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.01, 0.02])
+        with self.assertRaises(CircuitOpenError):
+            MapResolver(failure_threshold=0).resolve(f"{self.base_url}/short/1")
+
+
+class DownloadMatchImageCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alex123", password="pass")
+        self.client.force_login(self.user)
+        stadium = Stadium.objects.create(name="Stade")
+        self.match = Match.objects.create(
+            date=date.today() + timedelta(days=1), time=time(20, 0), stadium=stadium
+        )
+        self.url = reverse("matches:share_image", args=[self.match.id])
+        cache.clear()
+
+    def test_second_download_is_served_from_cache(self):
+        with mock.patch("matches.views.render_match_image", wraps=render_match_image) as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first["Content-Type"], "image/png")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_webp_format_has_its_own_etag(self):
+        png = self.client.get(self.url)
+        webp = self.client.get(self.url, {"format": "webp"})
+        self.assertEqual(webp["Content-Type"], "image/webp")
+        self.assertNotEqual(png["ETag"], webp["ETag"])
+
+    def test_conditional_request_returns_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_conditional_request_is_answered_before_rendering(self):
+        etag = self.client.get(self.url)["ETag"]
+        cache.clear()
+        with mock.patch("matches.views.render_match_image") as render:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        render.assert_not_called()
+
+    def test_presence_marks_keep_the_cached_image(self):
+        participation = Participation.objects.create(user=self.user, match=self.match)
+        self.client.get(self.url)
+        participation.is_present = True
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.save(update_fields=["is_present"])
+        self.assertIsNotNone(cache.get(f"match_image_keys:{self.match.id}"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.status = "left"
+            participation.save(update_fields=["status"])
+        self.assertIsNone(cache.get(f"match_image_keys:{self.match.id}"))
+
+    def test_participation_change_invalidates_image(self):
+        etag = self.client.get(self.url)["ETag"]
+        Participation.objects.create(user=self.user, match=self.match)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_match_change_drops_cached_entries(self):
+        self.client.get(self.url)
+        self.match.max_players = 14
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.save()
+            self.assertIsNotNone(cache.get(f"match_image_keys:{self.match.id}"))
+        self.assertIsNone(cache.get(f"match_image_keys:{self.match.id}"))
+
+
+class LayeredRendererTests(TestCase):
+
+    def setUp(self):
+        clear_layer_cache()
+        self.match = Match(date=date.today(), time=time(20, 0), day_of_week="Friday",
+                           stadium=Stadium(name="Stade"), max_players=12)
+        self.participants = [
+            Participation(user=User(username=f"player{i:03d}"), match=self.match) for i in range(5)
+        ]
+
+    def test_base_layer_is_built_once_per_height_and_language(self):
+        render_match_image(self.match, self.participants)
+        render_match_image(self.match, self.participants[:2])
+        self.assertEqual(base_layer.cache_info().misses, 1)
+
+        self.match.max_players = 20
+        render_match_image(self.match, self.participants)
+        self.assertEqual(base_layer.cache_info().misses, 2)
+
+    def test_cached_layer_is_not_modified_by_dynamic_text(self):
+        first = render_match_image(self.match, self.participants)
+        render_match_image(self.match, [])
+        self.assertEqual(render_match_image(self.match, self.participants), first)
+
+    def test_benchmark_baseline_draws_the_same_image(self):
+        before = baseline_draw(self.match, self.participants)
+        self.assertEqual(before.tobytes(), draw_match_image(self.match, self.participants).tobytes())
+
+        out = StringIO()
+        call_command("benchmark_share_image", "--players", "10", "30", "--runs=1", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn("before ms", lines[0])
+        self.assertEqual([line.split()[0] for line in lines[1:]], ["10", "30"])
+
+    def test_webp_output(self):
+        data = render_match_image(self.match, self.participants, image_format="webp")
+        self.assertEqual(data[8:12], b"WEBP")
+
+
+class ExportShareImagesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin123", password="pass")
+        stadium = Stadium.objects.create(name="Stade")
+        for i in range(3):
+            match = Match.objects.create(
+                date=date.today() + timedelta(days=i + 1), time=time(20, 0), stadium=stadium
+            )
+            Participation.objects.create(user=self.admin, match=match)
+        Match.objects.create(date=date.today() - timedelta(days=3), time=time(20, 0), stadium=stadium)
+
+    def test_admin_downloads_zip_of_upcoming_matches(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("matches:export_share_images"))
+        self.assertEqual(response["Content-Type"], "application/zip")
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 3)
+        for name in archive.namelist():
+            self.assertTrue(archive.read(name).startswith(b"\x89PNG"))
+
+    def test_command_reuses_cached_images(self):
+        output = f"{tempfile.mkdtemp()}/images.zip"
+        call_command("export_share_images", output, "--workers=2", stdout=StringIO())
+        with mock.patch("matches.image_export.render_image_job") as render:
+            call_command("export_share_images", output, stdout=StringIO())
+        render.assert_not_called()
+        self.assertEqual(len(zipfile.ZipFile(output).namelist()), 3)
+
+    def test_requires_admin(self):
+        self.client.force_login(User.objects.create_user(username="alex123", password="pass"))
+        response = self.client.get(reverse("matches:export_share_images"))
+        self.assertEqual(response.status_code, 302)
+
+
+class ManageMatchesPaginationTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin123", password="pass")
+        self.client.force_login(self.admin)
+        self.stadium = Stadium.objects.create(name="Stade")
+
+    def create_matches(self, days, times=(time(18, 0), time(20, 0))):
+        created = []
+        for day in days:
+            for match_time in times:
+                match = Match.objects.create(
+                    date=date.today() + timedelta(days=day), time=match_time, stadium=self.stadium
+                )
+                Participation.objects.create(user=self.admin, match=match)
+                created.append(match)
+        return created
+
+    def get_sections(self, params=None):
+        response = self.client.get(reverse("matches:manage"), params or {})
+        self.assertEqual(response.status_code, 200)
+        upcoming, past = response.context["sections"]
+        return upcoming, past
+
+    def test_walks_upcoming_pages_forward_and_back(self):
+        created = self.create_matches(range(1, 13))  # 24 upcoming matches
+        upcoming, _past = self.get_sections()
+        self.assertEqual(upcoming["rows"], created[:10])
+        self.assertIsNone(upcoming["previous_url"])
+
+        seen = list(upcoming["rows"])
+        for _page in range(5):
+            if not upcoming["next_url"]:
+                break
+            upcoming, _past = self.get_sections(QueryDict(upcoming["next_url"][1:]))
+            seen += upcoming["rows"]
+        self.assertEqual(seen, created)
+
+        upcoming, _past = self.get_sections(QueryDict(upcoming["previous_url"][1:]))
+        self.assertEqual(upcoming["rows"], created[10:20])
+
+    def test_untimed_matches_sort_last_in_their_day(self):
+        created = self.create_matches(range(1, 7), times=(time(18, 0), None))  # 12 matches
+        upcoming, _past = self.get_sections()
+        self.assertEqual(upcoming["rows"], created[:10])
+        self.assertIsNone(upcoming["rows"][-1].time)
+
+        upcoming, _past = self.get_sections(QueryDict(upcoming["next_url"][1:]))
+        self.assertEqual(upcoming["rows"], created[10:])
+
+        upcoming, _past = self.get_sections(QueryDict(upcoming["previous_url"][1:]))
+        self.assertEqual(upcoming["rows"], created[:10])
+
+    def test_past_section_is_latest_first(self):
+        created = self.create_matches(range(-3, 0))
+        _upcoming, past = self.get_sections()
+        self.assertEqual(past["rows"], list(reversed(created)))
+        self.assertEqual(past["rows"][0].spots_left, 11)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_matches([1, -1])
+        with CaptureQueriesContext(connection) as few:
+            self.get_sections()
+        self.create_matches(range(2, 8))
+        self.create_matches(range(-8, -2))
+        with CaptureQueriesContext(connection) as many:
+            self.get_sections()
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+
+class MatchStartsAtTests(TestCase):
+
+    def setUp(self):
+        self.stadium = Stadium.objects.create(name="Stade")
+
+    def create_match(self, starts_in=None, days=0):
+        """Match starting `starts_in` from now (local time), or untimed `days` from today"""
+        if starts_in is None:
+            return Match.objects.create(date=timezone.localdate() + timedelta(days=days), stadium=self.stadium)
+        start = timezone.localtime() + starts_in
+        return Match.objects.create(date=start.date(), time=start.time(), stadium=self.stadium)
+
+    def test_starts_at_follows_date_and_time(self):
+        match = self.create_match(timedelta(days=2))
+        self.assertEqual(match.starts_at.date(), match.date)
+        match.time = None
+        match.save()
+        match.refresh_from_db()
+        self.assertIsNone(match.starts_at)
+
+    def test_same_day_matches_split_on_start_time(self):
+        started = self.create_match(-timedelta(minutes=5))
+        later = self.create_match(timedelta(minutes=5))
+        untimed_today = self.create_match(days=0)
+
+        self.assertEqual(set(Match.objects.upcoming()), {later, untimed_today})
+        self.assertEqual(set(Match.objects.past()), {started})
+        for match in [started, later, untimed_today]:
+            self.assertEqual(match.is_past, match in Match.objects.past())
+
+    def test_attendance_locked_matches_property(self):
+        matches = [
+            self.create_match(-timedelta(hours=25)),
+            self.create_match(-timedelta(hours=23)),
+            self.create_match(timedelta(hours=1)),
+            self.create_match(days=-3),
+        ]
+        locked = set(Match.objects.attendance_locked())
+        for match in matches:
+            self.assertEqual(match in locked, not match.can_edit_attendance)
+
+    def test_can_edit_match_up_to_one_hour_after_start(self):
+        self.assertTrue(self.create_match(-timedelta(minutes=50)).can_edit_match)
+        self.assertFalse(self.create_match(-timedelta(minutes=70)).can_edit_match)
@@ -14,6 +14,7 @@ urlpatterns = [
     path('<int:match_id>/edit/', views.edit_match, name='edit_match'),
     path('<int:match_id>/delete/', views.delete_match, name='delete_match'),
     path('share_image/<int:match_id>/', views.download_match_image, name='share_image'),
+    path('share_images/export/', views.export_share_images, name='export_share_images'),
     path('<int:match_id>/share_whatsapp/', views.share_on_whatsapp, name='share_whatsapp'),
     path('<int:match_id>/share_image_guide/', views.share_with_image_instructions, name='share_image_guide'),
     path('stadiums/', views.manage_stadiums, name='manage_stadiums'),
@@ -2,62 +2,59 @@ import re
 import requests
 from urllib.parse import unquote
 
-def convert_to_embed_url(short_url):
+
+def extract_map_details(full_url):
     """
-    Convert a Google Maps short URL to an embeddable iframe URL.
+    Extract the place_id, coordinates and embed URL from a full Google Maps URL.
+    Returns a dict, or None if the URL does not contain a place.
     """
-    try:
-        # Step 1: Follow the redirect to get the full URL
-        response = requests.get(short_url, allow_redirects=True, timeout=10)
-        full_url = response.url
-        
-        # Step 2: Extract the place_id and coordinates
-        place_id_match = re.search(r'(0x[0-9a-f]+:0x[0-9a-f]+)', full_url)
-        
-        if place_id_match:
-            place_id = place_id_match.group(1)
-            
-            # Extract coordinates
-            coords_match = re.search(r'@(-?\d+\.\d+),(-?\d+\.\d+)', full_url)
-            
-            if coords_match:
-                lat = coords_match.group(1)
-                lon = coords_match.group(2)
-                
-                # Calculate viewport distance (fixed at 6000 for good stadium view)
-                d_value = 6000
-                
-                # Extract place name
-                place_name_match = re.search(r'/place/([^/]+)', full_url)
-                place_name = ""
-                if place_name_match:
-                    place_name = unquote(place_name_match.group(1)).replace('+', ' ')
-                    # URL encode special characters
-                    place_name = place_name.replace('é', '%C3%A9').replace('è', '%C3%A8')
-                    place_name = place_name.replace('à', '%C3%A0').replace('ô', '%C3%B4')
-                    place_name = f"!2s{place_name}"
-                
-                # Build the embed URL
-                embed_url = (
-                    f"https://www.google.com/maps/embed?pb=!1m18!1m12!1m3!1d{d_value}!"
-                    f"2d{lon}!3d{lat}!2m3!1f0!2f0!3f0!3m2!1i1024!2i768!4f13.1!"
-                    f"3m3!1m2!1s{place_id}{place_name}!5e0!3m2!1sen!2sfr"
-                )
-
-                iframe_html = (
-                    f'<iframe src="{embed_url}" '
-                    f'width="600" height="450" '
-                    f'style="border:0;" '
-                    f'allowfullscreen="" '
-                    f'loading="lazy" '
-                    f'referrerpolicy="no-referrer-when-downgrade">'
-                    f'</iframe>'
-                )
-                
-                return iframe_html
-        
+    place_id_match = re.search(r'(0x[0-9a-f]+:0x[0-9a-f]+)', full_url)
+    if not place_id_match:
+        return None
+    place_id = place_id_match.group(1)
+
+    # Extract coordinates
+    coords_match = re.search(r'@(-?\d+\.\d+),(-?\d+\.\d+)', full_url)
+    if not coords_match:
         return None
-        
-    except Exception as e:
-        print(f"Error converting Google Maps URL: {e}")
-        return None
\ No newline at end of file
+    lat = coords_match.group(1)
+    lon = coords_match.group(2)
+
+    # Calculate viewport distance (fixed at 6000 for good stadium view)
+    d_value = 6000
+
+    # Extract place name
+    place_name_match = re.search(r'/place/([^/]+)', full_url)
+    place_name = ""
+    if place_name_match:
+        place_name = unquote(place_name_match.group(1)).replace('+', ' ')
+        # URL encode special characters
+        place_name = place_name.replace('é', '%C3%A9').replace('è', '%C3%A8')
+        place_name = place_name.replace('à', '%C3%A0').replace('ô', '%C3%B4')
+        place_name = f"!2s{place_name}"
+
+    # Build the embed URL
+    embed_url = (
+        f"https://www.google.com/maps/embed?pb=!1m18!1m12!1m3!1d{d_value}!"
+        f"2d{lon}!3d{lat}!2m3!1f0!2f0!3f0!3m2!1i1024!2i768!4f13.1!"
+        f"3m3!1m2!1s{place_id}{place_name}!5e0!3m2!1sen!2sfr"
+    )
+
+    return {
+        'embed_url': embed_url,
+        'place_id': place_id,
+        'latitude': float(lat),
+        'longitude': float(lon),
+    }
+
+
+def resolve_map_details(short_url, session=None, timeout=10):
+    """
+    Follow a Google Maps short URL and extract its map details.
+    Pass a requests.Session to reuse pooled connections across calls.
+    """
+    http = session or requests
+    response = http.get(short_url, allow_redirects=True, timeout=timeout)
+    response.raise_for_status()
+    return extract_map_details(response.url)
+
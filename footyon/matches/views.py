@@ -5,19 +5,30 @@ from .forms import MatchForm
 from django.shortcuts import render, get_object_or_404
 from .models import Match
 from participation.models import Participation
-from PIL import Image, ImageDraw, ImageFont
+from participation.forms import attendance_sheet_form
 from django.shortcuts import get_object_or_404, redirect
-from django.http import HttpResponse
-import io
+from django.http import HttpResponse, StreamingHttpResponse
+import time
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from accounts.decorators import *
 from django.urls import reverse
 from django.utils.translation import gettext as _
 from django.utils import translation
 from django.contrib.auth.decorators import login_required
-from .utils import convert_to_embed_url
 from .decorators import editable_match_required
+from .pagination import keyset_page
 from .forms import StadiumForm
 from django.contrib import messages
+from .image_export import get_upcoming_image_jobs, stream_share_images_zip
+from .image_renderer import IMAGE_FORMATS, render_match_image
+from .share_image import (
+    cache_match_image,
+    get_active_participants,
+    get_cached_match_image,
+    match_image_etag,
+    match_image_filename,
+)
 
 
 def is_admin(user):
@@ -29,10 +40,38 @@ def manage_matches(request):
     Page for admin to manage all matches:
     - Upcoming matches: view / modify / delete
     - Past matches: view only
+    Each section is paginated with its own cursor (?upcoming_after=..., ?past_before=...)
     """
-    matches = Match.objects.all().order_by('-date', '-time')  # latest first
-
-    return render(request, 'matches/manage_matches.html', {'matches': matches})
+    matches = Match.objects.select_related('stadium')
+
+    sections = []
+    for prefix, title, queryset, descending in [
+        ('upcoming', _("Upcoming Matches"), matches.upcoming(), False),  # soonest first
+        ('past', _("Past Matches"), matches.past(), True),  # latest first
+    ]:
+        page = keyset_page(
+            queryset,
+            after=request.GET.get(f'{prefix}_after'),
+            before=request.GET.get(f'{prefix}_before'),
+            descending=descending,
+        )
+        page['title'] = title
+        page['next_url'] = _section_page_url(request, prefix, 'after', page['next_cursor'])
+        page['previous_url'] = _section_page_url(request, prefix, 'before', page['previous_cursor'])
+        sections.append(page)
+
+    return render(request, 'matches/manage_matches.html', {'sections': sections})
+
+
+def _section_page_url(request, prefix, direction, cursor):
+    """Query string moving one section to `cursor` while keeping the other section's page"""
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop(f'{prefix}_after', None)
+    params.pop(f'{prefix}_before', None)
+    params[f'{prefix}_{direction}'] = cursor
+    return f"?{params.urlencode()}"
 
 @user_passes_test(is_admin)
 def create_match(request):
@@ -51,7 +90,7 @@ def create_match(request):
 @active_user_required
 @login_required
 def view_match(request, match_id):
-    match = get_object_or_404(Match, id=match_id)
+    match = get_object_or_404(Match.objects.select_related('stadium'), id=match_id)
     previous_url = request.META.get('HTTP_REFERER', None)
 
     # Active participants for everyone
@@ -64,20 +103,28 @@ def view_match(request, match_id):
     while len(active_participants) < match.max_players:
         active_participants.append(None)
 
+    # Waitlist in queue order for everyone
+    waitlist = Participation.objects.filter(match=match, status='waitlisted').select_related('user').order_by('status_time', 'id')
+
     # Non active participants for admins only
     non_active_participants = Participation.objects.filter(match=match).exclude(
         id__in=active_participants_.values_list('id', flat=True)
-    ).order_by('-status_time') if request.user.is_superuser else []
+    ).exclude(status='waitlisted').order_by('-status_time') if request.user.is_superuser else []
     
-    # Convert short URL to embed URL if available
-    embed_url = None
-    if match.stadium.google_maps_short_url:
-        embed_url = convert_to_embed_url(match.stadium.google_maps_short_url)
+    # Present / no-show of every player in one form for admins, while attendance is editable
+    attendance_form = (
+        attendance_sheet_form(match) if request.user.is_superuser and match.can_edit_attendance else None
+    )
+
+    # Embed URL is resolved when the stadium is saved, no outbound HTTP here
+    embed_url = match.stadium.google_maps_embed_url
 
     context = {
         'match': match,
         'active_participants': active_participants,
         'non_active_participants': non_active_participants,
+        'waitlist': waitlist,
+        'attendance_form': attendance_form,
         'previous_url': previous_url,
         'default_home': reverse('home'),
         'embed_url': embed_url,
@@ -95,6 +142,7 @@ def edit_match(request, match_id=None, match=None):
         form = MatchForm(request.POST, instance=match)
         if form.is_valid():
             form.save()  # No add_error
+            Participation.promote_waitlist(match.id)  # new spots go to the waitlist first
             return redirect('matches:manage')
     else:
         form = MatchForm(instance=match)
@@ -126,115 +174,52 @@ def download_match_image(request, match_id):
     if lang:
         translation.activate(lang)
 
-    match = get_object_or_404(Match, id=match_id)
-    participants = match.participation_set.filter(status='joined', removed=False, is_no_show=False)
-    max_players = match.max_players
-    spots_left = match.spots_left
-
-    # --- Image dimensions ---
-    width, height = 800, 50 + max(max_players, len(participants)) * 35 + 400  # dynamic height
-    image = Image.new('RGB', (width, height), color='#f8f9fa')
-    draw = ImageDraw.Draw(image)
-
-    # --- Fonts ---
-    try:
-        title_font = ImageFont.truetype('arialbd.ttf', 28)  # bold title
-        header_font = ImageFont.truetype('arialbd.ttf', 22)  # bold header
-        text_font = ImageFont.truetype('arial.ttf', 18)
-        small_font = ImageFont.truetype('arial.ttf', 16)
-    except IOError:
-        title_font = ImageFont.load_default()
-        header_font = ImageFont.load_default()
-        text_font = ImageFont.load_default()
-        small_font = ImageFont.load_default()
-
-    # --- Background gradient effect ---
-    for i in range(height):
-        color_intensity = int(248 + (i / height) * 7)  # subtle gradient
-        draw.line([(0, i), (width, i)], fill=(color_intensity, color_intensity + 1, color_intensity + 2))
-
-    # --- Header section with background ---
-    header_height = 80
-    draw.rectangle([0, 0, width, header_height], fill='#28a745')
-    draw.rectangle([0, header_height, width, header_height + 2], fill='#1e7e34')  # border
-    
-    # Title
-    draw.text((width//2 - 150, 25), _("FOOTBALL MATCH"), font=title_font, fill="#ffffff")
-    
-    # --- Match info section with card-like background ---
-    y = header_height + 30
-    info_width = width - 100
-    info_height = 200
-    draw.rectangle([50, y, 50 + info_width, y + info_height], fill="#ffffff", outline="#dee2e6", width=2)
-    draw.rectangle([50, y, 50 + info_width, y + 40], fill="#e9ecef")
-    
-    # Section title
-    draw.text((70, y + 10), _("MATCH DETAILS"), font=header_font, fill="#495057")
-    
-    # Match info with text-based icons and better spacing
-    info_y = y + 60
-    draw.text((70, info_y), f"Date: {match.day_of_week}, {match.date}", font=text_font, fill="#212529")
-    info_y += 35
-
-
-    # Theses variables were created to translate words inside an f-string
-    time_str = _("Time")
-    location_str = _("Location")
-    players_str = _("Players")
-    intotal_str = _("in total")
-    spots_left_str = _("spots left")
-
-    draw.text((70, info_y), f"{time_str}: {match.time or 'TBD'}", font=text_font, fill="#212529")
-    info_y += 35
-    draw.text((70, info_y), f"{location_str}: {match.location_name}", font=text_font, fill="#212529")
-    info_y += 35
-    draw.text((70, info_y), f"{players_str}: {max_players} {intotal_str} • {spots_left} {spots_left_str}", font=text_font, fill="#28a745" if spots_left > 0 else "#dc3545")
-
-    # --- Participants section ---
-    y = header_height + info_height + 50
-    draw.rectangle([50, y, 50 + info_width, y + 40], fill="#e9ecef")
-    draw.text((70, y + 10), _("PARTICIPANTS"), font=header_font, fill="#495057")
-    
-    # Participants list with alternating background
-    y += 50
-    for idx, p in enumerate(participants, start=1):
-        if idx % 2 == 0:
-            draw.rectangle([50, y - 5, 50 + info_width, y + 30], fill="#f8f9fa")
-        draw.text((70, y), f"{idx:2d}. {p.user.username}", font=text_font, fill="#212529")
-        y += 35
-
-    # Empty slots with different styling
-    for idx in range(len(participants)+1, max_players+1):
-        if idx % 2 == 0:
-            draw.rectangle([50, y - 5, 50 + info_width, y + 30], fill="#f8f9fa")
-        draw.text((70, y), f"{idx:2d}. ---", font=small_font, fill="#6c757d")
-        y += 35
-
-    # --- Footer ---
-    footer_y = height - 40
-    draw.rectangle([0, footer_y, width, height], fill="#343a40")
-    draw.text((width//2 - 100, footer_y + 10), _("Join this match on FootyOn!"), font=small_font, fill="#ffffff")
+    match = get_object_or_404(Match.objects.select_related('stadium'), id=match_id)
+    participants = get_active_participants(match)
 
-    # --- Return image as downloadable file ---
-    buffer = io.BytesIO()
-    image.save(buffer, format='PNG')
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='image/png')
+    # ?format=webp for a lighter image, PNG otherwise
+    image_format = request.GET.get('format', 'png')
+    if image_format not in IMAGE_FORMATS:
+        image_format = 'png'
+    _pillow_format, content_type, extension = IMAGE_FORMATS[image_format]
 
+    # Images are cached by a hash of their content, which doubles as the ETag
+    etag = match_image_etag(match, [p.user.username for p in participants], lang, image_format)
+    cached = get_cached_match_image(etag)
 
-    """ Dynamically generate filename:"""
-    # Format date
-    date_part = match.date.strftime("%d_%m_%Y")  # day_month_year
-    time_part = match.time.strftime("%Hh%M") if match.time else "TBD"
+    # Answer 304 to If-None-Match / If-Modified-Since when the image did not change,
+    # before rendering: a client holding the current ETag never pays for a render
+    not_modified = get_conditional_response(
+        request, etag=quote_etag(etag), last_modified=cached[1] if cached else None,
+    )
+    if not_modified is not None:
+        return not_modified
 
-    # Translate weekday
-    weekday_translated = _(match.day_of_week)  # e.g., "Wednesday" → "Mercredi"
+    if cached is None:
+        image_bytes = render_match_image(match, participants, image_format, optimize=True)
+        cached = (image_bytes, int(time.time()))
+        cache_match_image(match.id, etag, *cached)
+    image_bytes, rendered_at = cached
 
-    # Build filename
-    filename = f"match_{date_part}_{weekday_translated}_{time_part}.png"
+    # --- Return image as downloadable file ---
+    response = HttpResponse(image_bytes, content_type=content_type)
+    response['ETag'] = quote_etag(etag)
+    response['Last-Modified'] = http_date(rendered_at)
+    patch_cache_control(response, private=True, no_cache=True)
+    response['Content-Disposition'] = f'attachment; filename="{match_image_filename(match, extension)}"'
+    return response
+
+@user_passes_test(is_admin)
+def export_share_images(request):
+    """
+    Admin download: one ZIP with the share image of every upcoming match.
+    Images are rendered on a process pool and streamed one by one.
+    """
+    lang = getattr(request, "LANGUAGE_CODE", None) or translation.get_language()
+    jobs = get_upcoming_image_jobs(lang)
 
-    # Set Content-Disposition
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response = StreamingHttpResponse(stream_share_images_zip(jobs), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="upcoming_matches.zip"'
     return response
 
 @active_user_required
@@ -247,7 +232,7 @@ def share_on_whatsapp(request, match_id):
 
 📅 *{match.day_of_week}, {match.date}*
 🕐 *Time:* {match.time or 'TBD'}
-🏟️ *Location:* {match.location_name}
+🏟️ *Location:* {match.stadium.name}
 👥 *Players:* {match.max_players} total • {match.spots_left} spots left
 
 Join this match on FootyOn!
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ParticipationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'participation'
+
+    def ready(self):
+        # Register signal handlers (match.active_count maintenance)
+        from . import signals  # noqa: F401
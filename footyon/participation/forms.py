@@ -12,3 +12,45 @@ class NoShowForm(forms.ModelForm):
             (key, label) for key, label in Participation.NO_SHOW_REASON_CHOICES
         ]
         self.fields['no_show_reason'].required = True
+
+
+class AttendanceSheetForm(forms.Form):
+    """Present / no-show (with reason) of every player of a match, submitted at once"""
+
+    def __init__(self, *args, participations, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.participations = participations
+        for p in participations:
+            self.fields[f'present_{p.id}'] = forms.BooleanField(
+                required=False, initial=p.is_present,
+                widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            )
+            self.fields[f'no_show_{p.id}'] = forms.ChoiceField(
+                required=False,
+                choices=[('', '—')] + Participation.NO_SHOW_REASON_CHOICES,
+                initial=p.no_show_reason if p.is_no_show else '',
+                widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+            )
+
+    def rows(self):
+        """(participation, present field, no-show field) per player, for the template"""
+        for p in self.participations:
+            yield p, self[f'present_{p.id}'], self[f'no_show_{p.id}']
+
+    def sheet(self):
+        """{participation_id: (is_present, no_show_reason or None)} for Participation.save_attendance_sheet"""
+        return {
+            p.id: (self.cleaned_data[f'present_{p.id}'], self.cleaned_data[f'no_show_{p.id}'] or None)
+            for p in self.participations
+            # Players who joined after the sheet was loaded are left as they are
+            if f'no_show_{p.id}' in self.data
+        }
+
+
+def attendance_sheet_form(match, data=None):
+    """Attendance sheet of the players who took part in the match (no-shows included), in join order"""
+    participations = (
+        Participation.objects.filter(match=match, status='joined', removed=False)
+        .select_related('user').order_by('status_time', 'id')
+    )
+    return AttendanceSheetForm(data, participations=list(participations))
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_participations(apps, schema_editor):
+    """Keep the first participation of each (user, match), then recount the affected matches"""
+    Match = apps.get_model('matches', 'Match')
+    Participation = apps.get_model('participation', 'Participation')
+
+    duplicates = (
+        Participation.objects.values('user', 'match')
+        .annotate(first_id=models.Min('id'), count=models.Count('id'))
+        .filter(count__gt=1)
+    )
+    match_ids = set()
+    for row in duplicates:
+        Participation.objects.filter(user=row['user'], match=row['match']).exclude(id=row['first_id']).delete()
+        match_ids.add(row['match'])
+
+    if match_ids:
+        active_count = (
+            Participation.objects.filter(
+                match=models.OuterRef('pk'), status='joined', removed=False, is_no_show=False
+            )
+            .order_by()
+            .values('match')
+            .annotate(count=models.Count('id'))
+            .values('count')
+        )
+        Match.objects.filter(id__in=match_ids).update(active_count=Coalesce(models.Subquery(active_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0004_match_active_count'),
+        ('participation', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_participations, migrations.RunPython.noop),
+    ]
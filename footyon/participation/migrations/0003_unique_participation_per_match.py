@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('participation', '0002_remove_duplicate_participations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='participation',
+            constraint=models.UniqueConstraint(fields=('user', 'match'), name='unique_participation_per_match'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0004_match_active_count'),
+        ('participation', '0003_unique_participation_per_match'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='participation',
+            name='status',
+            field=models.CharField(choices=[('joined', 'Joined'), ('left', 'Left'), ('waitlisted', 'Waitlisted')], default='joined', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(condition=models.Q(('status', 'waitlisted')), fields=['match', 'status_time', 'id'], name='participation_waitlist_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0006_hot_path_indexes'),
+        ('participation', '0004_waitlist'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='participation',
+            name='match',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='matches.match'),
+        ),
+        migrations.AlterField(
+            model_name='participation',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['match', 'status_time'], name='participation_match_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(condition=models.Q(('is_no_show', False), ('removed', False), ('status', 'joined')), fields=['match', 'status_time'], name='participation_active_idx'),
+        ),
+    ]
@@ -1,10 +1,22 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.dispatch import Signal
 from accounts.models import User
+from stats.models import UserStats
+from django.utils import timezone
+
+# Sent with the match once an attendance sheet is saved: bulk_update sends no post_save,
+# so receivers of Participation post_save that still need to run listen to this too
+attendance_sheet_saved = Signal()
+
+
+class MatchFullError(Exception):
+    """Raised when taking a spot in a match that has none left"""
 
 class Participation(models.Model):
     STATUS_CHOICES = [
         ('joined', 'Joined'),
         ('left', 'Left'),
+        ('waitlisted', 'Waitlisted'),  # match was full, promoted to joined when a spot frees up
     ]
 
     NO_SHOW_REASON_CHOICES = [
@@ -13,8 +25,9 @@ class Participation(models.Model):
         ('last_minute', 'Last Minute'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    match = models.ForeignKey('matches.Match', on_delete=models.CASCADE)  # string , avoid reference circular import
+    # No single-column indexes: unique (user, match) and the (match, ...) indexes below lead with them
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    match = models.ForeignKey('matches.Match', on_delete=models.CASCADE, db_index=False)  # string , avoid reference circular import
 
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='joined')
     status_time = models.DateTimeField(auto_now_add=True) # time when status was set (joined or left)
@@ -36,12 +49,220 @@ class Participation(models.Model):
     # This makes it easy to determine no-shows without manually checking.
     is_present = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # One participation per player and match, rejoining updates the existing row
+            models.UniqueConstraint(fields=['user', 'match'], name='unique_participation_per_match'),
+        ]
+        indexes = [
+            # Participations of a match in status order (view_match, non-active list)
+            models.Index(fields=['match', 'status_time'], name='participation_match_time_idx'),
+            # Active participants of a match: spots, share image, active list
+            models.Index(
+                fields=['match', 'status_time'],
+                condition=models.Q(status='joined', removed=False, is_no_show=False),
+                name='participation_active_idx',
+            ),
+            # Waitlist queue of a match, the head is one index lookup however long the queue
+            models.Index(
+                fields=['match', 'status_time', 'id'],
+                condition=models.Q(status='waitlisted'),
+                name='participation_waitlist_idx',
+            ),
+        ]
+
 
     def __str__(self):
         return f"{self.user} - {self.match} ({self.status})"
+
+    def save(self, *args, enforce_capacity=False, **kwargs):
+        """
+        Save and keep match.active_count and the user's UserStats in sync in the same transaction.
+        The previous state is read from the locked row, not from this instance,
+        so two concurrent saves cannot both apply the same delta.
+        With enforce_capacity, becoming active takes a spot with a conditional
+        UPDATE and raises MatchFullError (nothing saved) if there is none.
+        A freed spot on a match not yet played goes to the first waitlisted player.
+        """
+        with transaction.atomic():
+            was_active = False
+            previous = None
+            if self.pk:
+                previous = Participation.objects.select_for_update().filter(pk=self.pk).values(
+                    'status', 'removed', 'is_no_show', 'no_show_reason'
+                ).first()
+                was_active = bool(previous) and (
+                    previous['status'] == 'joined' and not previous['removed'] and not previous['is_no_show']
+                )
+            delta = int(self.is_active_participant()) - int(was_active)
+            match_model = self._meta.get_field('match').related_model
+            if delta > 0 and enforce_capacity:
+                if not match_model.take_spot(self.match_id):
+                    raise MatchFullError(self.match_id)
+            else:
+                match_model.adjust_active_count(self.match_id, delta)
+            super().save(*args, **kwargs)
+
+            UserStats.record_change(
+                self.user_id,
+                before=UserStats.counters(**previous) if previous else None,
+                after=self.stats_counters(),
+            )
+
+            if delta < 0 and not self.match.is_past:
+                Participation.promote_waitlist(self.match_id)
+
+    def mark_no_show(self, no_show_reason):
+        """
+        Mark as a no-show and apply the points penalty in the same transaction.
+        Marking again with another reason swaps the penalties, with the same reason does nothing.
+        """
+        with transaction.atomic():
+            previous = Participation.objects.select_for_update().values('is_no_show', 'no_show_reason').get(pk=self.pk)
+            if previous['is_no_show'] and previous['no_show_reason'] == no_show_reason:
+                return
+            self.is_no_show = True
+            self.no_show_reason = no_show_reason
+            self.no_show_time = timezone.now()
+            self.save()
+            if previous['is_no_show']:
+                self.user.update_suspension_status(previous['no_show_reason'], reverse=True, participation=self)
+            self.user.update_suspension_status(no_show_reason, participation=self)
+
+    def remove_no_show(self):
+        """Clear the no-show and give the points back in the same transaction"""
+        with transaction.atomic():
+            previous = Participation.objects.select_for_update().values('is_no_show', 'no_show_reason').get(pk=self.pk)
+            self.is_no_show = False
+            self.no_show_reason = None
+            self.no_show_time = None
+            self.save()
+            # A concurrent removal already gave them back
+            if previous['is_no_show']:
+                self.user.update_suspension_status(previous['no_show_reason'], reverse=True, participation=self)
+
+    @classmethod
+    def save_attendance_sheet(cls, match, sheet):
+        """
+        Apply the attendance of a whole match at once, sheet being
+        {participation_id: (is_present, no_show_reason or None)}.
+        The changed rows are written with one bulk_update, which bypasses save(),
+        so the active count, UserStats and waitlist are kept in sync here, and the
+        points penalties applied, all in the same transaction.
+        Returns the changed participations.
+        """
+        with transaction.atomic():
+            # Only players who took part: joined and not excluded, no-shows included
+            participations = list(
+                cls.objects.select_for_update()
+                .filter(match=match, pk__in=list(sheet), status='joined', removed=False)
+                .select_related('user')
+            )
+            now = timezone.now()
+            changed = []
+            penalties = []  # (participation, no_show_reason, reverse)
+            active_delta = 0
+            for participation in participations:
+                is_present, no_show_reason = sheet[participation.pk]
+                is_no_show = no_show_reason is not None
+                is_present = is_present and not is_no_show
+                if (participation.is_present, participation.is_no_show, participation.no_show_reason) == (
+                    is_present, is_no_show, no_show_reason
+                ):
+                    continue
+
+                was_active = participation.is_active_participant()
+                before = participation.stats_counters()
+                if participation.is_no_show and participation.no_show_reason != no_show_reason:
+                    penalties.append((participation, participation.no_show_reason, True))
+                if is_no_show and participation.no_show_reason != no_show_reason:
+                    penalties.append((participation, no_show_reason, False))
+
+                if is_no_show and not participation.is_no_show:
+                    participation.no_show_time = now
+                elif not is_no_show:
+                    participation.no_show_time = None
+                participation.is_present = is_present
+                participation.is_no_show = is_no_show
+                participation.no_show_reason = no_show_reason
+
+                active_delta += int(participation.is_active_participant()) - int(was_active)
+                UserStats.record_change(participation.user_id, before=before, after=participation.stats_counters())
+                changed.append(participation)
+
+            if not changed:
+                return []
+            cls.objects.bulk_update(changed, ['is_present', 'is_no_show', 'no_show_reason', 'no_show_time'])
+            match.adjust_active_count(match.id, active_delta)
+            for participation, no_show_reason, reverse in penalties:
+                participation.user.update_suspension_status(no_show_reason, reverse=reverse, participation=participation)
+            if active_delta < 0 and not match.is_past:
+                cls.promote_waitlist(match.id)
+            attendance_sheet_saved.send(sender=cls, match=match)
+        return changed
+
+    @classmethod
+    def join(cls, user, match):
+        """
+        Join a match (or rejoin after leaving) without ever going over capacity.
+        When the match is full the player is put on the waitlist instead.
+        Returns the participation, check its status for 'joined' or 'waitlisted'.
+        """
+        try:
+            with transaction.atomic():
+                participation = cls.objects.select_for_update().filter(user=user, match=match).first()
+                if participation is None:
+                    participation = cls(user=user, match=match)
+                elif participation.status == 'left':
+                    participation.status_time = timezone.now()
+                else:
+                    # Already joined (maybe removed / no-show) or waiting: keep the current state
+                    return participation
+
+                participation.status = 'joined'
+                try:
+                    participation.save(enforce_capacity=True)
+                except MatchFullError:
+                    participation.status = 'waitlisted'
+                    participation.save()
+                return participation
+        except IntegrityError:
+            # A concurrent request of the same user created the row first
+            return cls.objects.get(user=user, match=match)
+
+    @classmethod
+    def promote_waitlist(cls, match_id):
+        """
+        Move waitlisted players to joined, first come first served, while spots are left.
+        Reads the head of the queue through the partial waitlist index, and skips rows
+        locked by a concurrent promotion so simultaneous leaves promote different players.
+        """
+        promoted = []
+        with transaction.atomic():
+            while True:
+                candidate = (
+                    cls.objects.select_for_update(skip_locked=True)
+                    .filter(match_id=match_id, status='waitlisted')
+                    .order_by('status_time', 'id')
+                    .first()
+                )
+                if candidate is None:
+                    break
+                candidate.status = 'joined'
+                candidate.status_time = timezone.now()
+                try:
+                    candidate.save(enforce_capacity=True)
+                except MatchFullError:
+                    break
+                promoted.append(candidate)
+        return promoted
     
 
     # Helper method to check if the participant is active (joined and not removed or no-show)
     # better than checking multiple fields in views or serializers
     def is_active_participant(self):
-        return self.status == 'joined' and not self.removed and not self.is_no_show
\ No newline at end of file
+        return self.status == 'joined' and not self.removed and not self.is_no_show
+
+    def stats_counters(self):
+        """What this participation adds to the user's UserStats counters"""
+        return UserStats.counters(self.status, self.removed, self.is_no_show, self.no_show_reason)
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from stats.models import UserStats
+from .models import Participation
+
+
+@receiver(post_delete, sender=Participation)
+def decrement_active_count_on_delete(sender, instance, **kwargs):
+    # Also runs for cascade deletes (e.g. a deleted user), which never call Participation.delete()
+    if instance.is_active_participant():
+        instance._meta.get_field('match').related_model.adjust_active_count(instance.match_id, -1)
+
+        # An erased participant frees the spot for the waitlist (not when the whole match is deleted)
+        if isinstance(kwargs.get('origin'), Participation) and not instance.match.is_past:
+            Participation.promote_waitlist(instance.match_id)
+
+
+@receiver(post_delete, sender=Participation)
+def remove_from_user_stats_on_delete(sender, instance, **kwargs):
+    # No row is created here: on a cascade the user and its stats may be deleted too
+    UserStats.record_change(instance.user_id, before=instance.stats_counters(), create=False)
@@ -1,3 +1,441 @@
-from django.test import TestCase
+import threading
+from datetime import date, time, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import PointsLedger, User
+from matches.models import Match, Stadium
+from stats.leaderboard import stats_epoch
+from stats.models import UserStats
+from .models import Participation
 
-# Create your tests here.
+
+class ActiveCountTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin123", password="pass")
+        self.player = User.objects.create_user(username="alex123", password="pass")
+        self.match = Match.objects.create(
+            date=date.today() + timedelta(days=1), time=time(20, 0),
+            stadium=Stadium.objects.create(name="Stade"), max_players=2,
+        )
+
+    def assertActiveCount(self, expected):
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.active_count, expected)
+        actual = Participation.objects.filter(
+            match=self.match, status="joined", removed=False, is_no_show=False
+        ).count()
+        self.assertEqual(actual, expected)
+
+    def join(self):
+        self.client.force_login(self.player)
+        self.client.post(reverse("join_match", args=[self.match.id]))
+        return Participation.objects.get(user=self.player, match=self.match)
+
+    def test_join_and_leave(self):
+        self.join()
+        self.assertActiveCount(1)
+        self.client.post(reverse("leave_match", args=[self.match.id]))
+        self.assertActiveCount(0)
+        self.join()
+        self.assertActiveCount(1)
+
+    def test_admin_remove_and_restore(self):
+        participation = self.join()
+        self.client.force_login(self.admin)
+        self.client.get(reverse("remove_participant", args=[participation.id]))
+        self.assertActiveCount(0)
+        self.client.post(reverse("restore_participant", args=[participation.id]), {"confirm": "yes"})
+        self.assertActiveCount(1)
+
+    def test_no_show_and_its_removal(self):
+        participation = self.join()
+        self.client.force_login(self.admin)
+        self.client.post(reverse("mark_no_show", args=[participation.id]), {"no_show_reason": "excused"})
+        self.assertActiveCount(0)
+        self.client.post(reverse("remove_no_show", args=[participation.id]), {"confirm": "yes"})
+        self.assertActiveCount(1)
+
+    def test_hard_delete(self):
+        participation = self.join()
+        self.client.force_login(self.admin)
+        self.client.post(reverse("delete_participation", args=[participation.id]), {"confirm": "yes"})
+        self.assertActiveCount(0)
+
+    def test_cascade_delete_of_user(self):
+        self.join()
+        self.player.delete()
+        self.assertActiveCount(0)
+
+    def test_match_save_does_not_overwrite_count(self):
+        stale = Match.objects.get(pk=self.match.pk)
+        self.join()
+        stale.max_players = 14
+        stale.save()
+        self.assertActiveCount(1)
+
+    def test_spots_left_is_a_field_read(self):
+        self.join()
+        self.match.refresh_from_db()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.match.spots_left, 1)
+            self.assertFalse(self.match.is_full)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        self.join()
+        Match.objects.filter(pk=self.match.pk).update(active_count=5)
+
+        out = StringIO()
+        call_command("reconcile_active_counts", "--dry-run", stdout=out)
+        self.assertIn("stored 5, actual 1 (-4)", out.getvalue())
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.active_count, 5)
+
+        call_command("reconcile_active_counts", stdout=StringIO())
+        self.assertActiveCount(1)
+
+
+class ConcurrentJoinTests(TransactionTestCase):
+    """Simultaneous clicks on a shared match link must never oversubscribe it"""
+
+    players = 12
+    spots = 5
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("in-memory SQLite locks whole tables between threads instead of waiting")
+        self.match = Match.objects.create(
+            date=date.today() + timedelta(days=1), time=time(20, 0),
+            stadium=Stadium.objects.create(name="Stade"), max_players=self.spots,
+        )
+        self.users = [User.objects.create_user(username=f"player{i:03d}") for i in range(self.players)]
+
+    def run_concurrently(self, users):
+        barrier = threading.Barrier(len(users))
+        results = []
+
+        def join(user):
+            try:
+                barrier.wait()
+                results.append(Participation.join(user, self.match).status)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=join, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_exactly_k_players_get_a_spot(self):
+        results = self.run_concurrently(self.users)
+
+        self.assertEqual(results.count("joined"), self.spots)
+        self.assertEqual(results.count("waitlisted"), self.players - self.spots)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.active_count, self.spots)
+        self.assertEqual(Participation.objects.filter(match=self.match, status="joined").count(), self.spots)
+
+    def test_simultaneous_leaves_promote_distinct_players(self):
+        for user in self.users:
+            Participation.join(user, self.match)
+        leavers = self.users[:3]
+        barrier = threading.Barrier(len(leavers))
+
+        def leave(user):
+            try:
+                barrier.wait()
+                participation = Participation.objects.get(user=user, match=self.match)
+                participation.status = "left"
+                participation.save()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=leave, args=(user,)) for user in leavers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.active_count, self.spots)
+        joined = Participation.objects.filter(match=self.match, status="joined")
+        self.assertEqual(sorted(p.user_id for p in joined), [u.id for u in self.users[3:self.spots + 3]])
+
+    def test_same_player_clicking_twice_creates_one_row(self):
+        results = self.run_concurrently([self.users[0]] * 4)
+
+        self.assertEqual(results.count("joined"), 4)
+        self.assertEqual(Participation.objects.filter(match=self.match).count(), 1)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.active_count, 1)
+
+
+class JoinMatchViewTests(TestCase):
+
+    def test_full_match_puts_player_on_waitlist(self):
+        match = Match.objects.create(
+            date=date.today() + timedelta(days=1), time=time(20, 0),
+            stadium=Stadium.objects.create(name="Stade"), max_players=1,
+        )
+        Participation.join(User.objects.create_user(username="sam123"), match)
+        self.client.force_login(User.objects.create_user(username="alex123"))
+
+        response = self.client.post(reverse("join_match", args=[match.id]), follow=True)
+
+        self.assertContains(response, "This match is full, you are on the waitlist.")
+        participation = Participation.objects.get(match=match, user__username="alex123")
+        self.assertEqual(participation.status, "waitlisted")
+        match.refresh_from_db()
+        self.assertEqual(match.active_count, 1)
+
+
+class WaitlistTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin123", password="pass")
+        self.match = Match.objects.create(
+            date=date.today() + timedelta(days=1), time=time(20, 0),
+            stadium=Stadium.objects.create(name="Stade"), max_players=2,
+        )
+        self.players = [User.objects.create_user(username=f"player{i:03d}") for i in range(5)]
+        self.participations = [Participation.join(user, self.match) for user in self.players]
+
+    def statuses(self):
+        return [
+            Participation.objects.get(pk=p.pk).status for p in self.participations
+        ]
+
+    def test_full_match_queues_players_in_order(self):
+        self.assertEqual(self.statuses(), ["joined", "joined", "waitlisted", "waitlisted", "waitlisted"])
+
+    def test_leave_promotes_first_waitlisted(self):
+        self.client.force_login(self.players[0])
+        self.client.post(reverse("leave_match", args=[self.match.id]))
+        self.assertEqual(self.statuses(), ["left", "joined", "joined", "waitlisted", "waitlisted"])
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.active_count, 2)
+
+    def test_remove_and_no_show_promote(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("remove_participant", args=[self.participations[0].id]))
+        self.client.post(reverse("mark_no_show", args=[self.participations[1].id]), {"no_show_reason": "excused"})
+        self.assertEqual(self.statuses()[2:], ["joined", "joined", "waitlisted"])
+
+    def test_leaving_the_waitlist_does_not_promote(self):
+        self.client.force_login(self.players[2])
+        self.client.post(reverse("leave_match", args=[self.match.id]))
+        self.assertEqual(self.statuses(), ["joined", "joined", "left", "waitlisted", "waitlisted"])
+
+    def test_rejoining_keeps_waitlist_position(self):
+        before = Participation.objects.get(pk=self.participations[2].pk).status_time
+        Participation.join(self.players[2], self.match)
+        self.assertEqual(Participation.objects.get(pk=self.participations[2].pk).status_time, before)
+
+    def test_capacity_increase_promotes(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse("matches:edit_match", args=[self.match.id]), {
+            "date": self.match.date, "time": "20:00", "stadium": self.match.stadium.id, "max_players": 4,
+        })
+        self.assertEqual(self.statuses(), ["joined", "joined", "joined", "joined", "waitlisted"])
+
+    def test_no_promotion_once_match_is_played(self):
+        self.match.date = date.today() - timedelta(days=1)
+        self.match.save()
+        self.client.force_login(self.admin)
+        self.client.post(reverse("mark_no_show", args=[self.participations[0].id]), {"no_show_reason": "excused"})
+        self.assertEqual(self.statuses()[2:], ["waitlisted", "waitlisted", "waitlisted"])
+
+    def test_promotion_reads_head_of_queue_only(self):
+        with CaptureQueriesContext(connection) as ctx:
+            Participation.objects.filter(pk=self.participations[0].pk).update(status="left")
+            Match.adjust_active_count(self.match.id, -1)
+            promoted = Participation.promote_waitlist(self.match.id)
+        self.assertEqual([p.user for p in promoted], [self.players[2]])
+        self.assertTrue(any("LIMIT 1" in q["sql"] for q in ctx.captured_queries))
+
+
+class AttendanceSheetTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin123", password="pass")
+        self.players = [User.objects.create(username=f"player{i}") for i in range(4)]
+        started = timezone.localtime() - timedelta(hours=2)
+        self.match = Match.objects.create(
+            date=started.date(), time=started.time(), stadium=Stadium.objects.create(name="Stade"), max_players=4,
+        )
+        self.participations = [Participation.join(player, self.match) for player in self.players]
+        self.client.force_login(self.admin)
+
+    def submit(self, rows, match=None):
+        data = {}
+        for participation, (present, no_show) in zip(self.participations, rows):
+            if present:
+                data[f"present_{participation.id}"] = "on"
+            data[f"no_show_{participation.id}"] = no_show
+        return self.client.post(reverse("save_attendance_sheet", args=[(match or self.match).id]), data)
+
+    def states(self):
+        return [
+            Participation.objects.values_list("is_present", "is_no_show", "no_show_reason").get(pk=p.pk)
+            for p in self.participations
+        ]
+
+    def points(self):
+        return list(User.objects.filter(pk__in=[p.pk for p in self.players]).order_by("id").values_list("points", flat=True))
+
+    def test_whole_sheet_in_one_update(self):
+        epoch = stats_epoch()
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+            self.submit([(True, ""), (True, "not_excused"), (False, "excused"), (False, "")])
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "participation_participation"')]
+        self.assertEqual(len(updates), 1)
+
+        self.assertEqual(self.states(), [
+            (True, False, None), (False, True, "not_excused"), (False, True, "excused"), (False, False, None),
+        ])
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.active_count, 2)
+        self.assertEqual(self.points(), [15, 11, 15, 15])
+        self.assertEqual(UserStats.objects.get(user=self.players[1]).total_absent_not_excused, 1)
+        self.assertEqual(UserStats.objects.get(user=self.players[2]).attended, 0)
+        entry = PointsLedger.objects.get(user=self.players[1])
+        self.assertEqual((entry.delta, entry.participation_id), (-4, self.participations[1].id))
+        self.assertNotEqual(stats_epoch(), epoch)
+
+    def test_sheet_is_translated(self):
+        response = self.client.get(reverse("matches:view_match", args=[self.match.id]), HTTP_ACCEPT_LANGUAGE="fr")
+        self.assertContains(response, "Feuille de présence")
+        response = self.client.post(
+            reverse("save_attendance_sheet", args=[self.match.id]), {}, HTTP_ACCEPT_LANGUAGE="fr", follow=True,
+        )
+        self.assertContains(response, "Présences enregistrées (0 modifiées).")
+
+    def test_changing_and_clearing_no_shows(self):
+        self.submit([(True, ""), (False, "not_excused"), (False, ""), (False, "")])
+        self.submit([(True, ""), (False, "last_minute"), (False, ""), (False, "")])
+        self.assertEqual(self.points(), [15, 13, 15, 15])
+        self.submit([(True, ""), (True, ""), (False, ""), (False, "")])
+        self.assertEqual(self.points(), [15, 15, 15, 15])
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.active_count, 4)
+        self.assertEqual(
+            list(PointsLedger.objects.filter(user=self.players[1]).order_by("id").values_list("reason", "delta")),
+            [("no_show", -4), ("no_show_removed", 4), ("no_show", -2), ("no_show_removed", 2)],
+        )
+        self.assertEqual(UserStats.objects.get(user=self.players[1]).total_absent_last_minute, 0)
+
+    def test_unchanged_sheet_writes_nothing(self):
+        self.submit([(True, ""), (False, "excused"), (False, ""), (False, "")])
+        with CaptureQueriesContext(connection) as ctx:
+            self.submit([(True, ""), (False, "excused"), (False, ""), (False, "")])
+        self.assertFalse(any(q["sql"].startswith("UPDATE") for q in ctx.captured_queries))
+
+    def test_locked_attendance_is_refused(self):
+        locked = Match.objects.create(
+            date=date.today() - timedelta(days=3), time=time(20, 0), stadium=self.match.stadium, max_players=4,
+        )
+        self.participations = [Participation.objects.create(user=self.players[0], match=locked)]
+        response = self.submit([(False, "not_excused")], match=locked)
+        self.assertRedirects(response, reverse("matches:view_match", args=[locked.id]), fetch_redirect_response=False)
+        self.assertEqual(self.states(), [(False, False, None)])
+
+    def test_sheet_on_the_match_page(self):
+        response = self.client.get(reverse("matches:view_match", args=[self.match.id]))
+        self.assertContains(response, reverse("save_attendance_sheet", args=[self.match.id]))
+        self.assertContains(response, f'name="no_show_{self.participations[0].id}"')
+        self.client.force_login(self.players[0])
+        response = self.client.get(reverse("matches:view_match", args=[self.match.id]))
+        self.assertNotContains(response, reverse("save_attendance_sheet", args=[self.match.id]))
+
+
+class JoinLeaveRowTests(TestCase):
+
+    def setUp(self):
+        self.player = User.objects.create_user(username="alex123", password="pass")
+        self.stadium = Stadium.objects.create(name="Stade")
+        self.matches = [
+            Match.objects.create(
+                date=date.today() + timedelta(days=days), time=time(20, 0), stadium=self.stadium, max_players=2,
+            )
+            for days in range(1, 6)
+        ]
+        self.match = self.matches[0]
+        self.client.force_login(self.player)
+
+    def post(self, name, match=None):
+        response = self.client.post(
+            reverse(name, args=[(match or self.match).id]), HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_join_returns_the_row_of_the_match(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.post("join_match")
+        self.assertEqual(
+            (data["match_id"], data["status"], data["spots_left"], data["is_full"], data["message"]),
+            (self.match.id, "joined", 1, False, None),
+        )
+        self.assertIn(f'id="match-row-{self.match.id}"', data["row_html"])
+        self.assertIn(reverse("leave_match", args=[self.match.id]), data["row_html"])
+        # Only the affected match is read, not the whole upcoming feed
+        self.assertNotIn(f'"matches_match"."id" = {self.matches[1].id}', " ".join(q["sql"] for q in ctx.captured_queries))
+        self.assertFalse(any("ORDER BY" in q["sql"] and "matches_match" in q["sql"] for q in ctx.captured_queries))
+
+    def test_full_match_and_leave(self):
+        for i in range(2):
+            Participation.join(User.objects.create(username=f"player{i}"), self.match)
+        data = self.post("join_match")
+        self.assertEqual((data["status"], data["spots_left"], data["is_full"]), ("waitlisted", 0, True))
+        self.assertEqual(data["message"], "This match is full, you are on the waitlist.")
+        self.assertIn("Leave Waitlist", data["row_html"])
+
+        data = self.post("leave_match")
+        self.assertEqual((data["status"], data["is_full"]), ("left", True))
+        self.assertIn("Join Waitlist", data["row_html"])
+
+    def test_row_fragment_is_translated(self):
+        response = self.client.post(
+            reverse("join_match", args=[self.match.id]), HTTP_ACCEPT="application/json", HTTP_ACCEPT_LANGUAGE="fr",
+        )
+        self.assertIn(">Quitter</button>", response.json()["row_html"])
+
+    def test_waitlist_is_translated(self):
+        for i in range(2):
+            Participation.join(User.objects.create(username=f"player{i}"), self.match)
+        response = self.client.post(
+            reverse("join_match", args=[self.match.id]), HTTP_ACCEPT="application/json", HTTP_ACCEPT_LANGUAGE="fr",
+        )
+        data = response.json()
+        self.assertEqual(data["message"], "Ce match est complet, vous êtes sur la liste d'attente.")
+        self.assertIn("Quitter la liste d'attente", data["row_html"])
+
+    def test_leave_without_joining(self):
+        data = self.post("leave_match")
+        self.assertEqual((data["status"], data["spots_left"]), (None, 2))
+        self.assertIn(reverse("join_match", args=[self.match.id]), data["row_html"])
+
+    def test_plain_post_still_redirects_home(self):
+        response = self.client.post(reverse("join_match", args=[self.match.id]))
+        self.assertRedirects(response, reverse("home"))
+
+    def test_get_does_not_change_anything(self):
+        for name in ["join_match", "leave_match"]:
+            response = self.client.get(reverse(name, args=[self.match.id]))
+            self.assertEqual(response.status_code, 405)
+        self.assertFalse(Participation.objects.filter(user=self.player).exists())
+
+    def test_home_rows_post_join_and_leave(self):
+        Participation.join(self.player, self.match)
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, f'id="match-row-{self.matches[1].id}"')
+        self.assertContains(response, f'action="{reverse("leave_match", args=[self.match.id])}"')
+        self.assertContains(response, f'action="{reverse("join_match", args=[self.matches[1].id])}"')
@@ -11,4 +11,5 @@ urlpatterns = [
     path('<int:participation_id>/delete/', views.delete_participation, name='delete_participation'), # Permanently delete participation
     path('mark_present/<int:participation_id>/', views.mark_present, name='mark_present'),
     path('remove_present/<int:participation_id>/', views.remove_present, name='remove_present'),
+    path('attendance/<int:match_id>/', views.save_attendance_sheet, name='save_attendance_sheet'),
 ]
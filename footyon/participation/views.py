@@ -1,38 +1,61 @@
 from django.contrib.auth.decorators import login_required
 from matches.models import Match
 from .models import Participation
-from .forms import NoShowForm
+from .forms import NoShowForm, attendance_sheet_form
 from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect, render
+from django.http import JsonResponse
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import user_passes_test
 from accounts.decorators import active_user_required
 from django.utils import timezone
+from django.utils.translation import gettext as _
+from django.views.decorators.http import require_POST
+
+def _wants_json(request):
+    """Join / leave posted by the home page script, answered with the match row only"""
+    return 'application/json' in request.headers.get('Accept', '')
+
+
+def _match_row_response(request, match_id, participation, message=None):
+    """New row of the match for home.html: spots left and the user's status, a few queries instead of the whole feed"""
+    match = Match.objects.select_related('stadium').get(id=match_id)
+    match.user_participation = participation
+    return JsonResponse({
+        'match_id': match.id,
+        'status': participation.status if participation else None,
+        'spots_left': match.spots_left,
+        'is_full': match.is_full,
+        'message': message,
+        'row_html': render_to_string('match_row.html', {'match': match}, request=request),
+    })
+
 
+@require_POST
 @login_required
 @active_user_required
 def join_match(request, match_id):
     match = get_object_or_404(Match, id=match_id)
 
-    # Check if user already joined
-    participation, created = Participation.objects.get_or_create(
-        user=request.user,
-        match=match,
-        defaults={'status': 'joined'}
-    )
-
-    # If participation existed but status was 'left', update it
-    if not created and participation.status != 'joined':
-        participation.status = 'joined'
-        participation.status_time = timezone.now()
-        participation.save()
+    # Capacity is checked atomically, the match can't be oversubscribed by simultaneous joins
+    participation = Participation.join(request.user, match)
+    message = None
+    if participation.status == 'waitlisted':
+        message = _("This match is full, you are on the waitlist.")
 
+    if _wants_json(request):
+        return _match_row_response(request, match.id, participation, message)
+    if message:
+        messages.info(request, message)
     return redirect('home')  # back to home page
 
 
+@require_POST
 @login_required
 @active_user_required
 def leave_match(request, match_id):
     match = get_object_or_404(Match, id=match_id)
+    participation = None
     try:
         participation = Participation.objects.get(user=request.user, match=match)
         participation.status = 'left'
@@ -42,6 +65,8 @@ def leave_match(request, match_id):
         # User never joined, ignore
         pass
 
+    if _wants_json(request):
+        return _match_row_response(request, match.id, participation)
     return redirect('home')
 
 
@@ -54,11 +79,8 @@ def mark_no_show(request, participation_id):
     if request.method == 'POST':
         form = NoShowForm(request.POST, instance=participation)
         if form.is_valid():
-            participation.is_no_show = True
-            participation.no_show_time = timezone.now()
-            # we did not do participation.no_show_reason because it's come from the form
-            participation.user.update_suspension_status(participation.no_show_reason)
-            form.save()
+            # Participation and points penalty updated in one transaction
+            participation.mark_no_show(form.cleaned_data['no_show_reason'])
             return redirect('matches:view_match', match_id=participation.match.id)
     else:
         form = NoShowForm(instance=participation)
@@ -79,13 +101,8 @@ def remove_no_show(request, participation_id):
             
             if match.spots_left > 0:
                 
-                # Admin confirmed → remove no-show
-                no_show_reason = participation.no_show_reason  # store reason before clearing, for getting back points
-                participation.is_no_show = False
-                participation.no_show_reason = None
-                participation.no_show_time = None
-                participation.user.update_suspension_status(no_show_reason, reverse=True)
-                participation.save()
+                # Admin confirmed → remove no-show and give the points back, in one transaction
+                participation.remove_no_show()
                 messages.success(request, f"No-show removed for {participation.user.username}.")
                 return redirect('matches:view_match', match_id=match.id)
             
@@ -93,9 +110,7 @@ def remove_no_show(request, participation_id):
                 new_capacity = int(new_capacity)
                 match.max_players = new_capacity
                 match.save()
-                participation.is_no_show = False
-                participation.no_show_reason = None
-                participation.save()
+                participation.remove_no_show()
                 messages.success(request, f"No-show removed for {participation.user.username} with new capacity {new_capacity}.")
                 return redirect('matches:view_match', match_id=match.id)
 
@@ -174,13 +189,35 @@ def restore_participant(request, participation_id):
 
 
 
+@login_required
+@user_passes_test(lambda u: u.is_superuser)  # Only admin
+def save_attendance_sheet(request, match_id):
+    """Save present / no-show of all the players of a match in one request"""
+    match = get_object_or_404(Match, id=match_id)
+    if request.method != 'POST':
+        return redirect('matches:view_match', match_id=match.id)
+    if not match.can_edit_attendance:
+        messages.error(request, _("Attendance can no longer be edited for this match."))
+        return redirect('matches:view_match', match_id=match.id)
+
+    form = attendance_sheet_form(match, request.POST)
+    if not form.is_valid():
+        messages.error(request, _("The attendance sheet is invalid, nothing was saved."))
+        return redirect('matches:view_match', match_id=match.id)
+
+    # One bulk update and the points changes in one transaction
+    changed = Participation.save_attendance_sheet(match, form.sheet())
+    messages.success(request, _("Attendance saved (%(count)d changed).") % {'count': len(changed)})
+    return redirect('matches:view_match', match_id=match.id)
+
+
 @login_required
 @user_passes_test(lambda u: u.is_superuser)  # Only admin
 def mark_present(request, participation_id):
     """Mark a participant as present."""
     participation = get_object_or_404(Participation, id=participation_id)
     participation.is_present = True
-    participation.save()
+    participation.save(update_fields=['is_present'])
     # Redirect back to match view
     return redirect('matches:view_match', match_id=participation.match.id)
 
@@ -191,7 +228,7 @@ def remove_present(request, participation_id):
     """Remove the present mark if admin made a mistake."""
     participation = get_object_or_404(Participation, id=participation_id)
     participation.is_present = False
-    participation.save()
+    participation.save(update_fields=['is_present'])
     return redirect('matches:view_match', match_id=participation.match.id)
 
 
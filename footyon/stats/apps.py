@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StatsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stats'
+
+    def ready(self):
+        # Register signal handlers (attendance rollups of deleted matches, stats epoch)
+        from . import signals  # noqa: F401
@@ -0,0 +1,143 @@
+import uuid
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import User
+from .scoring import compute_user_stats, with_user_stats
+
+# Global version of everything the leaderboard is computed from, bumped on every
+# participation / user write (see stats/signals.py). Never expires. Lives in the
+# shared cache (CACHES in settings.py), so a bump in one worker reaches all of them.
+STATS_EPOCH_KEY = 'stats:epoch'
+
+LEADERBOARD_TIMEOUT = 60 * 60 * 24
+# Held by the worker recomputing a stale leaderboard, released when done
+# (or after this many seconds if the worker dies)
+LEADERBOARD_LOCK_TIMEOUT = 60
+
+# Suspension penalties shrink as time passes, so while a suspension is running
+# the scores are recomputed at least this often even without any write
+SUSPENDED_REFRESH = timedelta(minutes=15)
+
+
+def _leaderboard_key(last_n):
+    return f"stats:leaderboard:{last_n}"
+
+
+def _leaderboard_lock_key(last_n):
+    return f"stats:leaderboard:{last_n}:lock"
+
+
+def stats_epoch():
+    epoch = cache.get(STATS_EPOCH_KEY)
+    if epoch is None:
+        # A fresh value, so an epoch lost by the cache never matches an old entry again
+        cache.add(STATS_EPOCH_KEY, uuid.uuid4().hex, None)
+        epoch = cache.get(STATS_EPOCH_KEY)
+    return epoch
+
+
+def _new_stats_epoch():
+    # A new unique value in one write, not cache.incr (a read then a write on the
+    # database cache): concurrent bumps can't collapse into one
+    cache.set(STATS_EPOCH_KEY, uuid.uuid4().hex, None)
+
+
+def bump_stats_epoch():
+    """
+    Invalidate the cached leaderboards once the transaction commits (right away
+    outside one). Never written inside the transaction: the epoch row would stay
+    locked until the commit, serializing every participation and user write.
+    A leaderboard computed before the commit is stored under the old epoch.
+    """
+    transaction.on_commit(_new_stats_epoch)
+
+
+def build_leaderboard(last_n, now=None):
+    """
+    Rows of the stats dashboard user table, sorted by score with medals.
+    Returns (user_stats, refresh_at), refresh_at being when the rows go stale
+    on their own (a suspension ending or running), None if they don't.
+    """
+    now = now or timezone.now()
+
+    # One row per user with its counters, read from the UserStats table kept up to date
+    # on each participation change, then percentages and score in vectorized passes (see stats/scoring.py)
+    users = list(with_user_stats(User.objects.all().order_by('username')))
+    user_stats = []
+    for user, scores in zip(users, compute_user_stats(users, last_n=last_n, now=now)):
+        score = scores['score']
+        if score is not None and int(score) == 100:
+            score = 100
+
+        user_stats.append({
+            'username': user.username,
+            **scores,
+            'times_suspended': user.suspension_count,
+            'points': user.points,
+            'score': score,
+            'can_participate': user.can_participate(),
+        })
+
+    # Sort users by score descending
+    user_stats = sorted(
+        user_stats,
+        key=lambda x: (x['score'] is None, -(x['score'] or 0))
+    )
+
+    # Get unique scores only from eligible users
+    eligible_scores = sorted(
+        {u['score'] for u in user_stats if u['score'] is not None and u['can_participate'][0]},
+        reverse=True
+    )
+
+    # Map scores to medals
+    score_to_medal = {}
+    if len(eligible_scores) > 0:
+        score_to_medal[eligible_scores[0]] = 'gold'
+    if len(eligible_scores) > 1:
+        score_to_medal[eligible_scores[1]] = 'silver'
+    if len(eligible_scores) > 2:
+        score_to_medal[eligible_scores[2]] = 'bronze'
+
+    # Assign medals to users based on their score
+    for user in user_stats:
+        can_play, reason = user['can_participate']
+        if can_play:
+            user['medal'] = score_to_medal.get(user['score'], '')
+        else:
+            user['medal'] = ''
+
+    suspension_ends = [user.suspension_until for user in users if user.suspension_until and user.suspension_until > now]
+    refresh_at = min(suspension_ends + [now + SUSPENDED_REFRESH]) if suspension_ends else None
+    return user_stats, refresh_at
+
+
+def cached_leaderboard(last_n):
+    """
+    build_leaderboard() through the cache, recomputed when the stats epoch moved.
+    Only one worker recomputes a stale leaderboard (lock taken with cache.add),
+    the others keep serving the stale one meanwhile instead of all recomputing.
+    """
+    epoch = stats_epoch()
+    key = _leaderboard_key(last_n)
+    entry = cache.get(key)
+    now = timezone.now()
+    if entry and entry['epoch'] == epoch and (entry['refresh_at'] is None or now < entry['refresh_at']):
+        return entry['user_stats']
+
+    lock_key = _leaderboard_lock_key(last_n)
+    locked = cache.add(lock_key, True, LEADERBOARD_LOCK_TIMEOUT)
+    if not locked and entry:
+        return entry['user_stats']
+
+    try:
+        user_stats, refresh_at = build_leaderboard(last_n, now)
+        if locked:
+            # Stored under the epoch read before computing: a write meanwhile leaves it stale
+            cache.set(key, {'epoch': epoch, 'refresh_at': refresh_at, 'user_stats': user_stats}, LEADERBOARD_TIMEOUT)
+        return user_stats
+    finally:
+        if locked:
+            cache.delete(lock_key)
@@ -0,0 +1,128 @@
+import datetime
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts.models import User
+from stats.scoring import COUNT_FIELDS, UserTally, score_counts, user_counts
+
+
+class Command(BaseCommand):
+    help = "Benchmark of the user scoring, per-user Python loops vs the score_counts pass the views use"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--participations', type=int, default=100000)
+        parser.add_argument('--runs', type=int, default=3, help="Scorings per measure")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        users, rows = self.generate(options['users'], options['participations'], options['seed'], now)
+
+        # The counters of the UserStats table for these rows, folded like rebuild_user_stats does,
+        # set on the users like the with_user_stats annotations
+        tallies = {}
+        for user_id, status, removed, is_no_show, no_show_reason, *_match in rows:
+            tallies.setdefault(user_id, UserTally(user_id)).add(status, removed, is_no_show, no_show_reason)
+        for user in users:
+            tally = tallies.get(user.id) or UserTally(user.id)
+            for field in COUNT_FIELDS:
+                setattr(user, field, getattr(tally, field))
+        # The views read the recent form with one window query (recent_form), not measured here
+        expected = loop_scores(users, rows, now)
+        icons = [scores['last_five_icons'] for scores in expected]
+
+        loop = self.measure(options['runs'], lambda: loop_scores(users, rows, now))
+        shipped = self.measure(options['runs'], lambda: score_counts(users, user_counts(users), icons, now))
+
+        actual = score_counts(users, user_counts(users), icons, now)
+        if [scores['score'] for scores in actual] != [scores['score'] for scores in expected]:
+            self.stderr.write("Scores differ between the two implementations")
+
+        self.stdout.write(f"{len(users)} users x {len(rows)} participations")
+        self.stdout.write(f"{'loops ms':>10} {'score_counts ms':>16} {'speedup':>8}")
+        self.stdout.write(f"{loop:>10.1f} {shipped:>16.1f} {loop / shipped:>7.1f}x")
+
+    def generate(self, n_users, n_participations, seed, now):
+        """Unsaved users and participation rows: the benchmark only measures the scoring"""
+        rng = random.Random(seed)
+        users = []
+        for i in range(n_users):
+            suspended = rng.random() < 0.05
+            users.append(User(
+                id=i + 1, username=f"player{i:04d}", points=rng.randint(0, 15),
+                is_suspended=suspended, suspension_count=rng.randint(0, 3),
+                suspension_until=now + datetime.timedelta(days=rng.randint(1, 14)) if suspended else None,
+            ))
+
+        today = datetime.date.today()
+        reasons = ['excused', 'not_excused', 'last_minute']
+        rows = []
+        for i in range(n_participations):
+            is_no_show = rng.random() < 0.1
+            # user_id, status, removed, is_no_show, no_show_reason, match_date, match_id
+            rows.append((
+                rng.randint(1, n_users),
+                'left' if rng.random() < 0.15 else 'joined',
+                rng.random() < 0.02,
+                is_no_show,
+                rng.choice(reasons) if is_no_show else None,
+                today - datetime.timedelta(days=rng.randint(0, 3649)),
+                i // 12 + 1,
+            ))
+        return users, rows
+
+    def measure(self, runs, score):
+        start = time.perf_counter()
+        for _ in range(runs):
+            score()
+        return (time.perf_counter() - start) / runs * 1000
+
+
+def loop_scores(users, rows, now, last_n=5):
+    """The per-user loops the views used before stats.scoring, kept as the baseline"""
+    user_rows = {}
+    for row in rows:
+        user_rows.setdefault(row[0], []).append(row)
+
+    scores = []
+    for user in users:
+        # row: user_id, status, removed, is_no_show, no_show_reason, match_date, match_id
+        participations = user_rows.get(user.id, [])
+        total_enrolled = len(participations)
+        total_left = sum(1 for p in participations if p[1] == 'left')
+        total_absent_excused = sum(1 for p in participations if p[3] and p[4] == 'excused')
+        total_absent_not_excused = sum(1 for p in participations if p[3] and p[4] == 'not_excused')
+        total_absent_last_minute = sum(1 for p in participations if p[3] and p[4] == 'last_minute')
+        attended = sum(1 for p in participations if p[1] == 'joined' and not p[2] and not p[3])
+        percentages = [
+            round(count / total_enrolled * 100, 2) if total_enrolled else 0
+            for count in (attended, total_left, total_absent_excused, total_absent_not_excused, total_absent_last_minute)
+        ]
+        eligible = [p for p in participations if not (p[4] == 'excused' or (not p[3] and p[1] == 'left'))]
+
+        attendance_score = (attended / len(eligible)) if eligible else 0
+        points_ratio = user.points / 15
+        if user.is_suspended and user.suspension_until:
+            total_suspension_seconds = datetime.timedelta(days=15).total_seconds()
+            remaining_seconds = (user.suspension_until - now).total_seconds()
+            suspension_penalty = max(0, min(1, remaining_seconds / total_suspension_seconds))
+        else:
+            suspension_penalty = 0
+        past_suspension_penalty = min(0.1, 0.02 * user.suspension_count)
+
+        score = (attendance_score * 0.7 + points_ratio * 0.3) * 100
+        score = score * (1 - suspension_penalty) * (1 - past_suspension_penalty)
+
+        last_participations = sorted(participations, key=lambda p: (p[5], p[6]), reverse=True)[:last_n]
+        icons = " ".join(
+            "✅" if p[1] == 'joined' and not p[2] and not p[3] else "⚪" if p[4] == 'excused' else "❌"
+            for p in reversed(last_participations)
+        )
+        scores.append({
+            'score': round(score, 2) if score else None,
+            'percentages': percentages,
+            'last_five_icons': icons,
+        })
+    return scores
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import User
+from stats.models import UserStats
+from stats.scoring import COUNT_FIELDS, tally_participations, with_participation_counts, with_user_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the UserStats counters from participations and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, do not fix it")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Participations read per round trip")
+
+    def handle(self, *args, **options):
+        stored = {
+            user_id: counts
+            for user_id, *counts in with_user_stats(User.objects.all()).values_list('id', *COUNT_FIELDS)
+        }
+        zero = [0] * len(COUNT_FIELDS)
+
+        # One streaming pass over the participations, one tally per user at a time
+        drifted = []
+        for tally in tally_participations(options['chunk_size']):
+            self.check(drifted, tally.user_id, stored.pop(tally.user_id, zero), list(tally.counts().values()))
+        # Users left have no participation at all
+        for user_id, counts in stored.items():
+            self.check(drifted, user_id, counts, zero)
+
+        if drifted and not options['dry_run']:
+            for user_id in drifted:
+                # Locked and recounted together, so a concurrent delta is neither lost nor counted twice
+                with transaction.atomic():
+                    UserStats.objects.get_or_create(user_id=user_id)
+                    UserStats.objects.select_for_update().get(user_id=user_id)
+                    actual = with_participation_counts(User.objects.filter(id=user_id)).values(*COUNT_FIELDS).get()
+                    UserStats.objects.filter(user_id=user_id).update(**actual)
+
+        verb = "Found" if options['dry_run'] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drifted)} users with drifted stats."))
+
+    def check(self, drifted, user_id, stored, actual):
+        if stored == actual:
+            return
+        drifted.append(user_id)
+        changes = ", ".join(
+            f"{field} {before} -> {after}"
+            for field, before, after in zip(COUNT_FIELDS, stored, actual)
+            if before != after
+        )
+        self.stdout.write(f"User {user_id}: {changes}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from stats.rollups import BATCH_SIZE, roll_up_locked_matches
+
+
+class Command(BaseCommand):
+    # The stats pages roll up a small batch per view, run this after imports or a long idle period to catch up
+    help = "Add the matches whose attendance got locked to the monthly attendance rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Matches added per transaction")
+
+    def handle(self, *args, **options):
+        added = roll_up_locked_matches(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {added} matches."))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_user_stats(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserStats = apps.get_model('stats', 'UserStats')
+    counted = ~Q(participation__status='waitlisted')
+    no_show = Q(participation__is_no_show=True)
+    users = User.objects.annotate(
+        total_enrolled=Count('participation', filter=counted),
+        attended=Count('participation', filter=Q(
+            participation__status='joined', participation__removed=False, participation__is_no_show=False
+        )),
+        total_left=Count('participation', filter=Q(participation__status='left')),
+        total_absent_excused=Count('participation', filter=no_show & Q(participation__no_show_reason='excused')),
+        total_absent_not_excused=Count('participation', filter=no_show & Q(participation__no_show_reason='not_excused')),
+        total_absent_last_minute=Count('participation', filter=no_show & Q(participation__no_show_reason='last_minute')),
+        eligible_participations=Count('participation', filter=(
+            counted
+            & ~Q(participation__no_show_reason='excused')
+            & ~Q(participation__is_no_show=False, participation__status='left')
+        )),
+    ).filter(total_enrolled__gt=0)
+    UserStats.objects.bulk_create(
+        UserStats(
+            user_id=user.id,
+            total_enrolled=user.total_enrolled,
+            attended=user.attended,
+            total_left=user.total_left,
+            total_absent_excused=user.total_absent_excused,
+            total_absent_not_excused=user.total_absent_not_excused,
+            total_absent_last_minute=user.total_absent_last_minute,
+            eligible_participations=user.eligible_participations,
+        )
+        for user in users.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0002_user_is_suspended_user_points_user_suspension_count_and_more'),
+        ('participation', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_enrolled', models.IntegerField(default=0)),
+                ('attended', models.IntegerField(default=0)),
+                ('total_left', models.IntegerField(default=0)),
+                ('total_absent_excused', models.IntegerField(default=0)),
+                ('total_absent_not_excused', models.IntegerField(default=0)),
+                ('total_absent_last_minute', models.IntegerField(default=0)),
+                ('eligible_participations', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0007_attendance_rollups'),
+        ('stats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('matches_played', models.IntegerField(default=0)),
+                ('capacity', models.IntegerField(default=0)),
+                ('attended', models.IntegerField(default=0)),
+                ('no_show_excused', models.IntegerField(default=0)),
+                ('no_show_not_excused', models.IntegerField(default=0)),
+                ('no_show_last_minute', models.IntegerField(default=0)),
+                ('attendance_ratio_sum', models.FloatField(default=0)),
+                ('stadium', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_attendance', to='matches.stadium')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('month', 'stadium'), name='unique_monthly_attendance')],
+            },
+        ),
+    ]
@@ -1,3 +1,99 @@
 from django.db import models
+from django.db.models import F
+from accounts.models import User
 
-# Create your models here.
+
+class UserStats(models.Model):
+    """
+    Participation counters of a user, as shown on the dashboards.
+    Kept up to date with a delta in the transaction of every participation change
+    (see Participation.save), `rebuild_user_stats` recomputes them from scratch.
+    Points and suspensions stay on the User row, joined when reading.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+
+    total_enrolled = models.IntegerField(default=0)
+    attended = models.IntegerField(default=0)
+    total_left = models.IntegerField(default=0)
+    total_absent_excused = models.IntegerField(default=0)
+    total_absent_not_excused = models.IntegerField(default=0)
+    total_absent_last_minute = models.IntegerField(default=0)
+    eligible_participations = models.IntegerField(default=0)
+
+    COUNTERS = [
+        'total_enrolled', 'attended', 'total_left', 'total_absent_excused',
+        'total_absent_not_excused', 'total_absent_last_minute', 'eligible_participations',
+    ]
+
+    def __str__(self):
+        return f"Stats of {self.user_id}"
+
+    @staticmethod
+    def counters(status, removed, is_no_show, no_show_reason):
+        """What one participation in this state adds to each counter (0 or 1)"""
+        if status == 'waitlisted':
+            return dict.fromkeys(UserStats.COUNTERS, 0)
+        return {
+            'total_enrolled': 1,
+            'attended': int(status == 'joined' and not removed and not is_no_show),
+            'total_left': int(status == 'left'),
+            'total_absent_excused': int(is_no_show and no_show_reason == 'excused'),
+            'total_absent_not_excused': int(is_no_show and no_show_reason == 'not_excused'),
+            'total_absent_last_minute': int(is_no_show and no_show_reason == 'last_minute'),
+            # Excused absences and early leaves without no-show don't count towards the score
+            'eligible_participations': int(not (no_show_reason == 'excused' or (not is_no_show and status == 'left'))),
+        }
+
+    @classmethod
+    def record_change(cls, user_id, before=None, after=None, create=True):
+        """
+        Apply the difference between two participation states (dicts of counters(),
+        None for a participation that doesn't exist) with an F() update.
+        The row is created on the first change of a user, unless `create` is False
+        (deletes, where the user itself may be going away).
+        """
+        zero = dict.fromkeys(cls.COUNTERS, 0)
+        before, after = before or zero, after or zero
+        delta = {field: after[field] - before[field] for field in cls.COUNTERS if after[field] != before[field]}
+        if not delta:
+            return
+        updates = {field: F(field) + value for field, value in delta.items()}
+        if not cls.objects.filter(user_id=user_id).update(**updates) and create:
+            cls.objects.get_or_create(user_id=user_id)
+            cls.objects.filter(user_id=user_id).update(**updates)
+
+
+class MonthlyAttendance(models.Model):
+    """
+    Attendance of the matches played in one month at one stadium.
+    Each match is added once, when its attendance gets locked (see stats.rollups),
+    so charts and averages read a few rows instead of re-aggregating every past match.
+    """
+    month = models.DateField()  # first day of the month
+    stadium = models.ForeignKey('matches.Stadium', on_delete=models.CASCADE, related_name='monthly_attendance')
+
+    matches_played = models.IntegerField(default=0)
+    capacity = models.IntegerField(default=0)  # sum of max_players
+    attended = models.IntegerField(default=0)  # joined and not removed, like the dashboard
+    no_show_excused = models.IntegerField(default=0)
+    no_show_not_excused = models.IntegerField(default=0)
+    no_show_last_minute = models.IntegerField(default=0)
+    # Sum of attended / max_players of each match, the average is this over matches_played
+    attendance_ratio_sum = models.FloatField(default=0)
+
+    TOTALS = [
+        'matches_played', 'capacity', 'attended', 'no_show_excused',
+        'no_show_not_excused', 'no_show_last_minute', 'attendance_ratio_sum',
+    ]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'stadium'], name='unique_monthly_attendance'),
+        ]
+
+    def __str__(self):
+        return f"{self.stadium_id} {self.month:%Y-%m}"
+
+    @property
+    def average_attendance(self):
+        return self.attendance_ratio_sum / self.matches_played if self.matches_played else None
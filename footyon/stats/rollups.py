@@ -0,0 +1,109 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from matches.models import Match
+from participation.models import Participation
+from .leaderboard import bump_stats_epoch
+from .models import MonthlyAttendance
+
+# Matches claimed per transaction when catching up
+BATCH_SIZE = 500
+# Matches a page view rolls up before reading, the rollup_attendance command catches up on bigger backlogs
+LAZY_BATCH_SIZE = 50
+
+
+def match_contributions(matches):
+    """What the matches add to their MonthlyAttendance rows: {(month, stadium_id): totals}"""
+    counts = {
+        row['match_id']: row
+        for row in Participation.objects.filter(match__in=matches).values('match_id').annotate(
+            attended=Count('id', filter=Q(status='joined', removed=False)),
+            no_show_excused=Count('id', filter=Q(is_no_show=True, no_show_reason='excused')),
+            no_show_not_excused=Count('id', filter=Q(is_no_show=True, no_show_reason='not_excused')),
+            no_show_last_minute=Count('id', filter=Q(is_no_show=True, no_show_reason='last_minute')),
+        )
+    }
+
+    rollups = defaultdict(lambda: dict.fromkeys(MonthlyAttendance.TOTALS, 0))
+    for match in matches:
+        row = counts.get(match.id, {})
+        totals = rollups[(match.date.replace(day=1), match.stadium_id)]
+        totals['matches_played'] += 1
+        totals['capacity'] += match.max_players
+        for field in ['attended', 'no_show_excused', 'no_show_not_excused', 'no_show_last_minute']:
+            totals[field] += row.get(field, 0)
+        if match.max_players:
+            totals['attendance_ratio_sum'] += row.get('attended', 0) / match.max_players
+    return rollups
+
+
+def apply_contributions(rollups, sign=1):
+    """Add (or with sign=-1 remove) contributions with F() updates, creating missing rows"""
+    for (month, stadium_id), totals in rollups.items():
+        updates = {field: F(field) + sign * value for field, value in totals.items()}
+        rows = MonthlyAttendance.objects.filter(month=month, stadium_id=stadium_id)
+        if not rows.update(**updates):
+            MonthlyAttendance.objects.get_or_create(month=month, stadium_id=stadium_id)
+            rows.update(**updates)
+
+
+def roll_up_locked_matches(batch_size=BATCH_SIZE, max_batches=None):
+    """
+    Add every past match whose attendance got locked since the last call to the rollups
+    (at most `max_batches` batches) and return how many were added. Each batch is claimed
+    with SELECT ... FOR UPDATE SKIP LOCKED, added and flagged in one transaction, so
+    concurrent callers never add a match twice. Cheap when there is nothing to do
+    (partial index on pending matches).
+    """
+    added = 0
+    batches = 0
+    while True:
+        with transaction.atomic():
+            matches = list(
+                Match.objects.attendance_locked().past()
+                .filter(attendance_rolled_up=False)
+                .select_for_update(skip_locked=True)
+                .order_by('date', 'id')[:batch_size]
+            )
+            if not matches:
+                return added
+            apply_contributions(match_contributions(matches))
+            Match.objects.filter(pk__in=[match.pk for match in matches]).update(attendance_rolled_up=True)
+            # The recent form of the leaderboard only counts matches with locked attendance
+            bump_stats_epoch()
+        added += len(matches)
+        batches += 1
+        if len(matches) < batch_size or batches == max_batches:
+            return added
+
+
+def attendance_totals(rollups):
+    """Sum a MonthlyAttendance queryset, with the average attendance (None without matches)"""
+    totals = rollups.aggregate(**{field: Sum(field) for field in MonthlyAttendance.TOTALS})
+    totals = {field: value or 0 for field, value in totals.items()}
+    played = totals['matches_played']
+    totals['average_attendance'] = totals['attendance_ratio_sum'] / played if played else None
+    return totals
+
+
+def attendance_series(rollups):
+    """One point per month (all stadiums of `rollups` summed), oldest first, for charts"""
+    series = []
+    for row in (
+        rollups.filter(matches_played__gt=0).values('month')
+        .annotate(**{field: Sum(field) for field in MonthlyAttendance.TOTALS})
+        .order_by('month')
+    ):
+        series.append({
+            'month': row['month'].strftime('%Y-%m'),
+            'matches_played': row['matches_played'],
+            'capacity': row['capacity'],
+            'attended': row['attended'],
+            'no_shows': {
+                'excused': row['no_show_excused'],
+                'not_excused': row['no_show_not_excused'],
+                'last_minute': row['no_show_last_minute'],
+            },
+            'average_attendance': round(row['attendance_ratio_sum'] / row['matches_played'], 4),
+        })
+    return series
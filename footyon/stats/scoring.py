@@ -0,0 +1,203 @@
+import datetime
+import numpy as np
+from django.db.models import Case, Count, F, Q, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+from matches.models import ATTENDANCE_EDIT_HOURS
+from participation.models import Participation
+from .models import UserStats
+
+# Counted per user, in this order, by the SQL and streaming paths: the UserStats columns
+COUNT_FIELDS = UserStats.COUNTERS
+
+MAX_POINTS = 15
+SUSPENSION_DAYS = 15
+
+# Recent form outcomes, and their icons: present, excused absence, anything else
+PRESENT, EXCUSED_ABSENCE, MISSED = 0, 1, 2
+FORM_ICONS = np.array(["✅", "⚪", "❌"])
+
+
+def attendance_locked_filter(now=None):
+    """Same rule as Match.can_edit_attendance / MatchQuerySet.attendance_locked, for participations"""
+    now = now or timezone.now()
+    return Q(match__starts_at__isnull=True) | Q(match__starts_at__lt=now - datetime.timedelta(hours=ATTENDANCE_EDIT_HOURS))
+
+
+class UserTally:
+    """Running counters of one user, folded one participation at a time"""
+    __slots__ = ['user_id'] + COUNT_FIELDS
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        for field in COUNT_FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, status, removed, is_no_show, no_show_reason):
+        """Count one (non-waitlisted) participation, same rules as with_participation_counts"""
+        self.total_enrolled += 1
+        if status == 'joined' and not removed and not is_no_show:
+            self.attended += 1
+        if status == 'left':
+            self.total_left += 1
+        if is_no_show:
+            if no_show_reason == 'excused':
+                self.total_absent_excused += 1
+            elif no_show_reason == 'not_excused':
+                self.total_absent_not_excused += 1
+            elif no_show_reason == 'last_minute':
+                self.total_absent_last_minute += 1
+        # Excused absences and early leaves without no-show don't count towards the score
+        if not (no_show_reason == 'excused' or (not is_no_show and status == 'left')):
+            self.eligible_participations += 1
+
+    def counts(self):
+        return {field: getattr(self, field) for field in COUNT_FIELDS}
+
+
+def tally_participations(chunk_size=2000):
+    """
+    Yield a UserTally per user having participations, in user id order, in one streaming pass.
+    Rows are plain tuples read `chunk_size` at a time (a server-side cursor on PostgreSQL)
+    in (user, match) index order, so only the current chunk and the current user's
+    tally are in memory, whatever the size of the table.
+    """
+    rows = (
+        Participation.objects.exclude(status='waitlisted')
+        .order_by('user_id', 'match_id')
+        .values_list('user_id', 'status', 'removed', 'is_no_show', 'no_show_reason')
+        .iterator(chunk_size=chunk_size)
+    )
+    tally = None
+    for user_id, status, removed, is_no_show, no_show_reason in rows:
+        if tally is None or tally.user_id != user_id:
+            if tally is not None:
+                yield tally
+            tally = UserTally(user_id)
+        tally.add(status, removed, is_no_show, no_show_reason)
+    if tally is not None:
+        yield tally
+
+
+def _percent(count, total):
+    return np.divide(count * 100.0, total, out=np.zeros(len(total)), where=total > 0)
+
+
+def recent_form(users, last_n, now=None):
+    """
+    Icons of each user's last `last_n` participations in matches whose attendance
+    is locked, oldest first. ROW_NUMBER() OVER (PARTITION BY user ORDER BY match date DESC)
+    numbers the participations in the database, only the last `last_n` rows of each user
+    come back, in one query.
+    """
+    icons = {user.id: [] for user in users}
+    rows = (
+        Participation.objects.exclude(status='waitlisted')
+        .filter(attendance_locked_filter(now), user_id__in=list(icons))
+        .annotate(
+            recent_rank=Window(
+                RowNumber(),
+                partition_by=F('user_id'),
+                order_by=[F('match__date').desc(), F('match_id').desc()],
+            ),
+            outcome=Case(
+                When(status='joined', removed=False, is_no_show=False, then=Value(PRESENT)),
+                When(no_show_reason='excused', then=Value(EXCUSED_ABSENCE)),
+                default=Value(MISSED),
+            ),
+        )
+        .filter(recent_rank__lte=last_n)
+        .order_by('user_id', '-recent_rank')
+        .values_list('user_id', 'outcome')
+    )
+
+    for user_id, outcome in rows:
+        icons[user_id].append(FORM_ICONS[outcome])
+    return [" ".join(icons[user.id]) for user in users]
+
+
+def with_participation_counts(users):
+    """
+    Annotate a User queryset with its participation counts (COUNT_FIELDS),
+    aggregated by the database: one row per user, whatever the history size.
+    """
+    counted = ~Q(participation__status='waitlisted')
+    no_show = Q(participation__is_no_show=True)
+    return users.annotate(
+        total_enrolled=Count('participation', filter=counted),
+        attended=Count('participation', filter=Q(
+            participation__status='joined', participation__removed=False, participation__is_no_show=False
+        )),
+        total_left=Count('participation', filter=Q(participation__status='left')),
+        total_absent_excused=Count('participation', filter=no_show & Q(participation__no_show_reason='excused')),
+        total_absent_not_excused=Count('participation', filter=no_show & Q(participation__no_show_reason='not_excused')),
+        total_absent_last_minute=Count('participation', filter=no_show & Q(participation__no_show_reason='last_minute')),
+        # Excused absences and early leaves without no-show don't count towards the score
+        eligible_participations=Count('participation', filter=(
+            counted
+            & ~Q(participation__no_show_reason='excused')
+            & ~Q(participation__is_no_show=False, participation__status='left')
+        )),
+    )
+
+
+def with_user_stats(users):
+    """
+    Annotate a User queryset with the same counts read from the UserStats table
+    (one LEFT JOIN, no aggregation). Users without a row have no participation yet.
+    """
+    return users.annotate(**{field: Coalesce(F(f'stats__{field}'), 0) for field in COUNT_FIELDS})
+
+
+def score_counts(users, counts, icons, now=None):
+    """
+    Percentages and score of every user from its counts, in vectorized passes.
+    Returns one dict per user, in the order of `users`.
+    """
+    now = now or timezone.now()
+    enrolled, attended, eligible = counts['total_enrolled'], counts['attended'], counts['eligible_participations']
+
+    attendance_score = np.divide(attended, eligible, out=np.zeros(len(users)), where=eligible > 0)
+    points_ratio = np.array([user.points for user in users], dtype=float) / MAX_POINTS
+
+    # Active suspension: penalty shrinks as the end of the suspension gets closer
+    remaining_seconds = np.array([
+        (user.suspension_until - now).total_seconds() if user.is_suspended and user.suspension_until else 0.0
+        for user in users
+    ])
+    suspension_penalty = np.clip(remaining_seconds / datetime.timedelta(days=SUSPENSION_DAYS).total_seconds(), 0, 1)
+    # 2% penalty per past suspension, max 10%
+    past_suspension_penalty = np.minimum(0.1, 0.02 * np.array([user.suspension_count for user in users]))
+
+    scores = (attendance_score * 0.7 + points_ratio * 0.3) * 100
+    scores = scores * (1 - suspension_penalty) * (1 - past_suspension_penalty)
+
+    columns = {field: counts[field].tolist() for field in COUNT_FIELDS}
+    for field, count in [
+        ('perc_attended', attended),
+        ('perc_left', counts['total_left']),
+        ('perc_absent_excused', counts['total_absent_excused']),
+        ('perc_absent_not_excused', counts['total_absent_not_excused']),
+        ('perc_absent_last_minute', counts['total_absent_last_minute']),
+    ]:
+        columns[field] = _percent(count, enrolled).round(2).tolist()
+    columns['score'] = [round(score, 2) if score else None for score in scores.tolist()]
+    columns['last_five_icons'] = icons
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def user_counts(users):
+    """Counts of users annotated by with_user_stats (or with_participation_counts), one array per field"""
+    return {
+        field: np.array([getattr(user, field) for user in users], dtype=np.int64)
+        for field in COUNT_FIELDS
+    }
+
+
+def compute_user_stats(users, last_n=5, now=None):
+    """
+    Score users annotated by with_user_stats (or with_participation_counts),
+    with their last `last_n` participations from recent_form.
+    """
+    now = now or timezone.now()
+    return score_counts(users, user_counts(users), recent_form(users, last_n, now), now)
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from accounts.models import User
+from matches.models import Match
+from participation.models import Participation, attendance_sheet_saved
+from .leaderboard import bump_stats_epoch
+from .rollups import apply_contributions, match_contributions
+
+
+@receiver(pre_delete, sender=Match)
+def remove_match_from_rollups(sender, instance, **kwargs):
+    # Before the delete, while the participations are still there to count
+    if Match.objects.filter(pk=instance.pk, attendance_rolled_up=True).exists():
+        apply_contributions(match_contributions([instance]), sign=-1)
+
+
+@receiver([post_save, post_delete], sender=Participation)
+def bump_stats_epoch_on_participation_change(sender, instance, **kwargs):
+    bump_stats_epoch()
+
+
+@receiver(attendance_sheet_saved, sender=Participation)
+def bump_stats_epoch_on_attendance_sheet(sender, match, **kwargs):
+    bump_stats_epoch()
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_stats_epoch_on_user_change(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which the leaderboard doesn't show
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_stats_epoch()
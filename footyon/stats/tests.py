@@ -1,3 +1,574 @@
+import tracemalloc
+from unittest import mock
+from datetime import date, time, timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import User
+from matches.models import Match, Stadium
+from participation.models import Participation
+from . import leaderboard
+from .leaderboard import cached_leaderboard, stats_epoch
+from .models import MonthlyAttendance, UserStats
+from .rollups import roll_up_locked_matches
+from .scoring import (
+    COUNT_FIELDS, UserTally, compute_user_stats, recent_form, tally_participations, with_participation_counts,
+    with_user_stats,
+)
 
-# Create your tests here.
+
+class ScoringTests(TestCase):
+
+    def setUp(self):
+        self.stadium = Stadium.objects.create(name="City Park")
+        self.alex = User.objects.create_user(username="alex123", password="pass")
+        self.sam = User.objects.create_user(username="sam123", password="pass")
+        self.idle = User.objects.create_user(username="idle123", password="pass")
+
+    def past_match(self, days_ago):
+        return Match.objects.create(
+            date=date.today() - timedelta(days=days_ago), time=time(20, 0), stadium=self.stadium
+        )
+
+    def participate(self, user, match, **fields):
+        participation = Participation.objects.create(user=user, match=match)
+        if fields:
+            Participation.objects.filter(pk=participation.pk).update(**fields)
+
+    def test_counts_percentages_and_score(self):
+        self.participate(self.alex, self.past_match(10))
+        self.participate(self.alex, self.past_match(9))
+        self.participate(self.alex, self.past_match(8), is_no_show=True, no_show_reason='not_excused')
+        self.participate(self.alex, self.past_match(7), is_no_show=True, no_show_reason='excused')
+        self.participate(self.alex, self.past_match(6), status='left')
+        self.participate(self.sam, self.past_match(5), status='waitlisted')
+
+        users = with_participation_counts(User.objects.order_by('pk'))
+        alex, sam, idle = compute_user_stats(list(users))
+
+        self.assertEqual(alex['total_enrolled'], 5)
+        self.assertEqual(alex['attended'], 2)
+        self.assertEqual(alex['total_left'], 1)
+        self.assertEqual(alex['total_absent_excused'], 1)
+        self.assertEqual(alex['total_absent_not_excused'], 1)
+        # excused absence and leave without no-show are not eligible
+        self.assertEqual(alex['eligible_participations'], 3)
+        self.assertEqual(alex['perc_attended'], 40.0)
+        # (2/3 * 0.7 + 15/15 * 0.3) * 100
+        self.assertEqual(alex['score'], 76.67)
+        self.assertEqual(alex['last_five_icons'], "✅ ✅ ❌ ⚪ ❌")
+
+        # Waitlisted participations don't count
+        self.assertEqual(sam['total_enrolled'], 0)
+        self.assertEqual(sam['score'], 30.0)
+        self.assertEqual(idle['last_five_icons'], "")
+
+    def test_recent_form_keeps_the_last_matches(self):
+        for days_ago in range(10, 2, -1):
+            self.participate(self.alex, self.past_match(days_ago))
+        self.participate(self.alex, self.past_match(2), is_no_show=True, no_show_reason='excused')
+        # Attendance of a match played less than 24 hours ago can still change
+        started = timezone.localtime() - timedelta(hours=1)
+        self.participate(self.alex, Match.objects.create(
+            date=started.date(), time=started.time(), stadium=self.stadium
+        ))
+
+        alex, = compute_user_stats(with_participation_counts(User.objects.filter(pk=self.alex.pk)), last_n=3)
+        self.assertEqual(alex['last_five_icons'], "✅ ✅ ⚪")
+
+    def test_recent_form_is_one_windowed_query(self):
+        for days_ago in range(1, 10):
+            self.participate(self.alex, self.past_match(days_ago))
+            self.participate(self.sam, self.past_match(days_ago + 20), status='left')
+
+        with CaptureQueriesContext(connection) as ctx:
+            alex, sam, idle = recent_form([self.alex, self.sam, self.idle], last_n=4)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn("ROW_NUMBER()", ctx.captured_queries[0]['sql'])
+        self.assertEqual(alex, "✅ ✅ ✅ ✅")
+        self.assertEqual(sam, "❌ ❌ ❌ ❌")
+        self.assertEqual(idle, "")
+
+    def test_last_n_per_dashboard(self):
+        for days_ago in range(1, 10):
+            self.participate(self.alex, self.past_match(days_ago))
+        admin = User.objects.create_superuser(username="admin123", password="pass")
+        self.client.force_login(admin)
+
+        response = self.client.get(reverse("stats:dashboard"))
+        stats = {row['username']: row for row in response.context["user_stats"]}
+        self.assertEqual(len(stats['alex123']['last_five_icons'].split()), 5)
+
+        response = self.client.get(reverse("manage_accounts"))
+        users = {user.username: user for user in response.context["users"]}
+        self.assertEqual(len(users['alex123'].last_five_icons.split()), 7)
+
+    def test_suspension_penalties(self):
+        self.alex.is_suspended = True
+        self.alex.suspension_until = timezone.now() + timedelta(days=7, hours=12)
+        self.alex.suspension_count = 2
+        self.alex.save()
+
+        alex, = compute_user_stats(with_participation_counts(User.objects.filter(pk=self.alex.pk)))
+        # 30 * (1 - 0.5) * (1 - 0.04)
+        self.assertAlmostEqual(alex['score'], 14.4, places=1)
+
+    def test_sql_counts_match_the_streaming_tallies(self):
+        for days_ago, fields in enumerate([
+            {}, {'status': 'left'}, {'status': 'left', 'is_no_show': True, 'no_show_reason': 'last_minute'},
+            {'is_no_show': True, 'no_show_reason': 'excused'}, {'removed': True}, {'status': 'waitlisted'},
+        ], start=1):
+            self.participate(self.alex, self.past_match(days_ago), **fields)
+            self.participate(self.sam, self.past_match(days_ago + 10))
+
+        tallies = {tally.user_id: tally.counts() for tally in tally_participations(chunk_size=4)}
+        self.assertEqual(list(tallies), [self.alex.pk, self.sam.pk])
+        for user in with_participation_counts(User.objects.filter(pk__in=tallies)):
+            self.assertEqual({field: getattr(user, field) for field in COUNT_FIELDS}, tallies[user.pk])
+
+    def test_counts_are_one_query(self):
+        for days_ago in range(1, 6):
+            self.participate(self.alex, self.past_match(days_ago))
+        with self.assertNumQueries(1):
+            users = list(with_participation_counts(User.objects.all()))
+        self.assertEqual(len(users), 3)
+
+    def test_dashboard_and_manage_accounts_use_the_scores(self):
+        self.participate(self.alex, self.past_match(3))
+        admin = User.objects.create_superuser(username="admin123", password="pass")
+        self.client.force_login(admin)
+
+        response = self.client.get(reverse("stats:dashboard"))
+        stats = {row['username']: row for row in response.context["user_stats"]}
+        self.assertEqual(stats['alex123']['score'], 100)
+        self.assertEqual(stats['alex123']['last_five_icons'], "✅")
+
+        response = self.client.get(reverse("manage_accounts"))
+        users = {user.username: user for user in response.context["users"]}
+        self.assertEqual(users['alex123'].score, 100.0)
+        self.assertEqual(users['alex123'].total_eligible, 1)
+
+    def test_benchmark_command(self):
+        out, err = StringIO(), StringIO()
+        call_command("benchmark_scoring", users=20, participations=500, runs=1, stdout=out, stderr=err)
+        self.assertIn("20 users x 500 participations", out.getvalue())
+        # The baseline loops and score_counts agree on every score
+        self.assertEqual(err.getvalue(), "")
+
+
+class UserStatsTests(TestCase):
+
+    def setUp(self):
+        self.stadium = Stadium.objects.create(name="City Park")
+        self.user = User.objects.create_user(username="alex123", password="pass")
+
+    def create_match(self, days=-3):
+        return Match.objects.create(date=date.today() + timedelta(days=days), time=time(20, 0), stadium=self.stadium)
+
+    def stored(self):
+        return with_user_stats(User.objects.filter(pk=self.user.pk)).values(*COUNT_FIELDS).get()
+
+    def recounted(self):
+        return with_participation_counts(User.objects.filter(pk=self.user.pk)).values(*COUNT_FIELDS).get()
+
+    def test_counters_follow_every_state_change(self):
+        participation = Participation.objects.create(user=self.user, match=self.create_match())
+        self.assertEqual(self.stored()['attended'], 1)
+
+        participation.is_no_show = True
+        participation.no_show_reason = 'not_excused'
+        participation.save()
+        self.assertEqual(self.stored(), self.recounted())
+        self.assertEqual(self.stored()['total_absent_not_excused'], 1)
+
+        participation.no_show_reason = 'excused'
+        participation.save()
+        self.assertEqual(self.stored(), self.recounted())
+        self.assertEqual(self.stored()['eligible_participations'], 0)
+
+        participation.is_no_show = False
+        participation.no_show_reason = None
+        participation.removed = True
+        participation.save()
+        self.assertEqual(self.stored(), self.recounted())
+
+        participation.removed = False
+        participation.status = 'left'
+        participation.save()
+        self.assertEqual(self.stored(), self.recounted())
+        self.assertEqual(self.stored()['total_left'], 1)
+
+        participation.delete()
+        self.assertEqual(self.stored(), dict.fromkeys(COUNT_FIELDS, 0))
+
+    def test_waitlist_and_promotion(self):
+        match = self.create_match(days=3)
+        match.max_players = 1
+        match.save()
+        other = User.objects.create_user(username="sam123", password="pass")
+        first = Participation.join(other, match)
+        Participation.join(self.user, match)
+        self.assertEqual(self.stored(), dict.fromkeys(COUNT_FIELDS, 0))
+
+        first.status = 'left'
+        first.save()
+        self.assertEqual(self.stored()['attended'], 1)
+        self.assertEqual(self.stored(), self.recounted())
+
+    def test_deleting_the_user_deletes_its_stats(self):
+        Participation.objects.create(user=self.user, match=self.create_match())
+        self.user.delete()
+        self.assertFalse(UserStats.objects.exists())
+
+    def test_rebuild_fixes_drift(self):
+        participation = Participation.objects.create(user=self.user, match=self.create_match())
+        Participation.objects.create(user=self.user, match=self.create_match(days=-4))
+        # update() bypasses Participation.save, the counters drift
+        Participation.objects.filter(pk=participation.pk).update(status='left')
+
+        out = StringIO()
+        call_command("rebuild_user_stats", dry_run=True, stdout=out)
+        self.assertIn("attended 2 -> 1", out.getvalue())
+        self.assertNotEqual(self.stored(), self.recounted())
+
+        call_command("rebuild_user_stats", stdout=StringIO())
+        self.assertEqual(self.stored(), self.recounted())
+
+        out = StringIO()
+        call_command("rebuild_user_stats", dry_run=True, stdout=out)
+        self.assertIn("Found 0 users", out.getvalue())
+
+    def test_dashboards_read_the_stats_table(self):
+        admin = User.objects.create_superuser(username="admin123", password="pass")
+        self.client.force_login(admin)
+        for days in range(1, 4):
+            Participation.objects.create(user=self.user, match=self.create_match(-days))
+        UserStats.objects.filter(user=self.user).update(attended=2, eligible_participations=4)
+
+        response = self.client.get(reverse("manage_accounts"))
+        users = {user.username: user for user in response.context["users"]}
+        # (2/4 * 0.7 + 0.3) * 100
+        self.assertEqual(users['alex123'].score, 65.0)
+        # No participation yet, so no UserStats row
+        self.assertEqual(users['admin123'].score, 30.0)
+
+
+class DashboardMatchTableTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alex123", password="pass")
+        self.client.force_login(self.user)
+        self.park = Stadium.objects.create(name="City Park")
+        self.arena = Stadium.objects.create(name="Arena")
+
+    def create_match(self, match_date, stadium=None):
+        return Match.objects.create(date=match_date, time=time(20, 0), stadium=stadium or self.park)
+
+    def get_page(self, params=None):
+        response = self.client.get(reverse("stats:dashboard"), params or {})
+        self.assertEqual(response.status_code, 200)
+        return response.context["match_page"]
+
+    def test_ships_one_page_latest_first(self):
+        created = [self.create_match(date.today() - timedelta(days=days)) for days in range(1, 26)]
+        page = self.get_page()
+        self.assertEqual(page["rows"], created[:10])
+        self.assertIsNone(page["previous_url"])
+
+        seen = list(page["rows"])
+        for _page in range(5):
+            if not page["next_url"]:
+                break
+            page = self.get_page(QueryDict(page["next_url"][1:]))
+            seen += page["rows"]
+        self.assertEqual(seen, created)
+
+    def test_month_year_and_stadium_filters(self):
+        march = self.create_match(date(2024, 3, 10))
+        self.create_match(date(2024, 4, 10))
+        self.create_match(date(2023, 3, 10))
+        arena = self.create_match(date(2024, 3, 20), self.arena)
+        december = self.create_match(date(2024, 12, 31))
+
+        self.assertEqual(self.get_page({"month": 3, "year": 2024})["rows"], [arena, march])
+        self.assertEqual(self.get_page({"month": 3, "year": 2024, "stadium": self.park.id})["rows"], [march])
+        self.assertEqual(self.get_page({"month": 12, "year": 2024})["rows"], [december])
+        self.assertEqual(len(self.get_page({"year": 2024})["rows"]), 4)
+        self.assertEqual(len(self.get_page({"month": 3})["rows"]), 3)
+        # Invalid values are ignored
+        self.assertEqual(len(self.get_page({"month": 13, "year": "abc"})["rows"]), 5)
+
+    def test_filters_are_kept_across_pages(self):
+        for day in range(1, 15):
+            self.create_match(date(2024, 5, day))
+            self.create_match(date(2024, 6, day))
+        page = self.get_page({"month": 5, "year": 2024})
+        params = QueryDict(page["next_url"][1:])
+        self.assertEqual(params["month"], "5")
+        page = self.get_page(params)
+        self.assertEqual([m.date for m in page["rows"]], [date(2024, 5, day) for day in range(4, 0, -1)])
+
+    def test_attended_count_of_page_rows(self):
+        match = self.create_match(date.today() - timedelta(days=2))
+        Participation.objects.create(user=self.user, match=match)
+        page = self.get_page()
+        self.assertEqual(page["rows"][0].attended_count, 1)
+
+
+class AttendanceRollupTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alex123", password="pass")
+        self.client.force_login(self.user)
+        self.players = [User.objects.create(username=f"player{i}") for i in range(4)]
+        self.park = Stadium.objects.create(name="City Park")
+        self.arena = Stadium.objects.create(name="Arena")
+
+    def create_match(self, match_date, stadium=None, attended=0, max_players=4):
+        match = Match.objects.create(
+            date=match_date, time=time(20, 0), stadium=stadium or self.park, max_players=max_players,
+        )
+        for player in self.players[:attended]:
+            Participation.objects.create(user=player, match=match)
+        return match
+
+    def rollup(self, month, stadium=None):
+        return MonthlyAttendance.objects.get(month=month, stadium=stadium or self.park)
+
+    def test_locked_matches_are_added_once(self):
+        self.create_match(date(2024, 3, 10), attended=4)
+        self.create_match(date(2024, 3, 20), attended=2)
+        absent = Participation.objects.create(user=self.user, match=self.create_match(date(2024, 3, 25), self.arena))
+        absent.is_no_show, absent.no_show_reason = True, "excused"
+        absent.save()
+        # Played today, attendance still editable
+        self.create_match(date.today(), attended=1)
+
+        self.assertEqual(roll_up_locked_matches(batch_size=2), 3)
+        self.assertEqual(roll_up_locked_matches(), 0)
+
+        march = self.rollup(date(2024, 3, 1))
+        self.assertEqual((march.matches_played, march.capacity, march.attended), (2, 8, 6))
+        self.assertAlmostEqual(march.average_attendance, 0.75)
+        arena = self.rollup(date(2024, 3, 1), self.arena)
+        self.assertEqual((arena.attended, arena.no_show_excused), (1, 1))
+        self.assertEqual(MonthlyAttendance.objects.count(), 2)
+
+    def test_deleting_a_match_removes_its_contribution(self):
+        kept = self.create_match(date(2024, 3, 10), attended=4)
+        deleted = self.create_match(date(2024, 3, 20), attended=1)
+        roll_up_locked_matches()
+        deleted.delete()
+        march = self.rollup(date(2024, 3, 1))
+        self.assertEqual((march.matches_played, march.attended), (1, 4))
+        self.assertAlmostEqual(march.average_attendance, 1.0)
+        # Not rolled up yet: nothing to remove
+        self.create_match(date(2024, 3, 22), attended=2).delete()
+        kept.delete()
+        self.assertEqual(self.rollup(date(2024, 3, 1)).matches_played, 0)
+
+    def test_dashboard_reads_the_rollups(self):
+        self.create_match(date(2024, 3, 10), attended=4)
+        self.create_match(date(2024, 4, 10), attended=1)
+        self.create_match(date(2023, 4, 10), self.arena, attended=2)
+
+        # The first view rolls up the locked matches, the next ones only read the rollups
+        response = self.client.get(reverse("stats:dashboard"))
+        self.assertEqual(response.context["avg_attendance_percent"], 58.33)
+        self.assertIsNone(response.context["period_attendance"])
+        self.assertTrue(all(Match.objects.values_list("attendance_rolled_up", flat=True)))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("stats:dashboard"))
+        self.assertFalse(any(
+            q["sql"].startswith(("UPDATE", "INSERT")) and '"footyon_cache"' not in q["sql"] for q in ctx.captured_queries
+        ))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("stats:dashboard"), {"month": 4})
+        self.assertFalse(any("participation" in q["sql"] and "SUM" in q["sql"] for q in ctx.captured_queries))
+        period = response.context["period_attendance"]
+        self.assertEqual((period["matches_played"], period["attended"]), (2, 3))
+        self.assertEqual(period["average_attendance_percent"], 37.5)
+
+        period = self.client.get(reverse("stats:dashboard"), {"year": 2024, "stadium": self.arena.id}).context["period_attendance"]
+        self.assertEqual(period["matches_played"], 0)
+        self.assertIsNone(period["average_attendance"])
+
+    def test_series_endpoint(self):
+        self.create_match(date(2024, 3, 10), attended=4)
+        self.create_match(date(2024, 3, 12), self.arena, attended=2)
+        self.create_match(date(2024, 1, 5), attended=1, max_players=2)
+        self.create_match(date(2023, 12, 5), attended=1)
+
+        data = self.client.get(reverse("stats:attendance_series"), {"year": 2024}).json()
+        self.assertEqual([point["month"] for point in data["series"]], ["2024-01", "2024-03"])
+        self.assertEqual(data["series"][0]["average_attendance"], 0.5)
+        march = data["series"][1]
+        self.assertEqual((march["matches_played"], march["capacity"], march["attended"]), (2, 8, 6))
+        self.assertEqual(march["average_attendance"], 0.75)
+        self.assertEqual(march["no_shows"], {"excused": 0, "not_excused": 0, "last_minute": 0})
+
+        data = self.client.get(reverse("stats:attendance_series"), {"stadium": self.arena.id}).json()
+        self.assertEqual([point["attended"] for point in data["series"]], [2])
+        self.assertEqual(len(self.client.get(reverse("stats:attendance_series")).json()["series"]), 3)
+
+    def test_period_summary_is_translated(self):
+        self.create_match(date(2024, 3, 10), attended=4)
+        response = self.client.get(reverse("stats:dashboard"), {"year": 2024}, HTTP_ACCEPT_LANGUAGE="fr")
+        self.assertContains(response, "1 matchs avec présences verrouillées, 4 joueurs présents")
+
+    def test_views_roll_up_one_small_batch(self):
+        for day in range(1, 4):
+            self.create_match(date(2024, 3, day), attended=1)
+        with mock.patch("stats.views.LAZY_BATCH_SIZE", 2):
+            self.client.get(reverse("stats:attendance_series"))
+            self.assertEqual(Match.objects.filter(attendance_rolled_up=True).count(), 2)
+            self.client.get(reverse("stats:attendance_series"))
+        self.assertEqual(Match.objects.filter(attendance_rolled_up=True).count(), 3)
+
+    def test_rollup_command(self):
+        self.create_match(date(2024, 3, 10), attended=1)
+        out = StringIO()
+        call_command("rollup_attendance", stdout=out)
+        self.assertIn("Rolled up 1 matches.", out.getvalue())
+
+
+class LeaderboardCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alex123", password="pass")
+        self.client.force_login(self.user)
+        self.stadium = Stadium.objects.create(name="City Park")
+        self.match = Match.objects.create(date=date.today() - timedelta(days=3), time=time(20, 0), stadium=self.stadium)
+
+    def scoring_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            user_stats = cached_leaderboard(5)
+        return user_stats, [q["sql"] for q in ctx.captured_queries if "ROW_NUMBER()" in q["sql"]]
+
+    def test_served_from_cache_until_a_write(self):
+        _user_stats, queries = self.scoring_queries()
+        self.assertEqual(len(queries), 1)
+        user_stats, queries = self.scoring_queries()
+        self.assertEqual(queries, [])
+        self.assertEqual(user_stats[0]["attended"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Participation.objects.create(user=self.user, match=self.match)
+        user_stats, queries = self.scoring_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(user_stats[0]["attended"], 1)
+
+    def test_user_writes_bump_the_epoch_but_not_logins(self):
+        epoch = stats_epoch()
+        self.client.force_login(self.user)
+        self.assertEqual(stats_epoch(), epoch)
+
+        self.user.points = 7
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertNotEqual(stats_epoch(), epoch)
+        self.assertEqual(cached_leaderboard(5)[0]["points"], 7)
+
+    def test_bumped_on_commit_only(self):
+        epoch = stats_epoch()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with CaptureQueriesContext(connection) as ctx:
+                Participation.objects.create(user=self.user, match=self.match)
+            # The epoch row isn't written (and locked) by the participation transaction
+            self.assertFalse(any("footyon_cache" in q["sql"] for q in ctx.captured_queries))
+            self.assertEqual(stats_epoch(), epoch)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(stats_epoch(), epoch)
+
+    def test_stale_leaderboard_served_while_another_worker_recomputes(self):
+        cached_leaderboard(5)
+        with self.captureOnCommitCallbacks(execute=True):
+            Participation.objects.create(user=self.user, match=self.match)
+        cache.add("stats:leaderboard:5:lock", True)
+        user_stats, queries = self.scoring_queries()
+        self.assertEqual(queries, [])
+        self.assertEqual(user_stats[0]["attended"], 0)
+
+        cache.delete("stats:leaderboard:5:lock")
+        self.assertEqual(self.scoring_queries()[0][0]["attended"], 1)
+        self.assertIsNone(cache.get("stats:leaderboard:5:lock"))
+
+    def test_cold_cache_computes_even_when_locked(self):
+        cache.add("stats:leaderboard:5:lock", True)
+        user_stats, queries = self.scoring_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(user_stats[0]["username"], "alex123")
+
+    def test_running_suspension_refreshes_without_writes(self):
+        self.user.is_suspended = True
+        self.user.suspension_until = timezone.now() + timedelta(days=1)
+        self.user.save()
+        cached_leaderboard(5)
+        self.assertEqual(self.scoring_queries()[1], [])
+
+        later = timezone.now() + leaderboard.SUSPENDED_REFRESH + timedelta(seconds=1)
+        with mock.patch.object(leaderboard.timezone, "now", return_value=later):
+            self.assertEqual(len(self.scoring_queries()[1]), 1)
+
+    def test_dashboard_uses_the_cached_leaderboard(self):
+        self.client.get(reverse("stats:dashboard"))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("stats:dashboard"))
+        self.assertFalse(any("ROW_NUMBER()" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(response.context["user_stats"][0]["username"], "alex123")
+
+
+class StreamingTallyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        stadium = Stadium.objects.create(name="City Park")
+        cls.users = User.objects.bulk_create(User(username=f"player{i}") for i in range(5))
+        cls.matches = Match.objects.bulk_create(
+            Match(date=date(2020, 1, 1) + timedelta(days=i), time=time(20, 0), day_of_week="Monday",
+                  stadium=stadium)
+            for i in range(1000)
+        )
+
+    def seed(self, matches):
+        # bulk_create: the test measures the pass, not the UserStats deltas
+        Participation.objects.bulk_create(
+            Participation(user=user, match=match, status='left' if match.pk % 3 else 'joined')
+            for user in self.users for match in matches
+        )
+
+    def peak_memory(self):
+        tracemalloc.start()
+        try:
+            for tally in tally_participations(chunk_size=100):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_peak_memory_stays_flat_as_the_table_grows(self):
+        self.seed(self.matches[:100])
+        small = self.peak_memory()
+        self.seed(self.matches[100:])
+        large = self.peak_memory()
+
+        # 10x more rows, memory bounded by the chunk size and one tally
+        self.assertEqual(Participation.objects.count(), 5000)
+        self.assertLess(large, small * 2)
+
+    def test_one_tally_per_user_in_order(self):
+        self.seed(self.matches[:30])
+        tallies = list(tally_participations(chunk_size=7))
+        self.assertEqual([tally.user_id for tally in tallies], [user.pk for user in self.users])
+        self.assertEqual(tallies[0].total_enrolled, 30)
+        self.assertEqual(tallies[0].attended + tallies[0].total_left, 30)
+        self.assertFalse(hasattr(tallies[0], '__dict__'))
+        self.assertIsInstance(tallies[0], UserTally)
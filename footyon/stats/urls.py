@@ -5,4 +5,5 @@ app_name = "stats"
 
 urlpatterns = [
     path("", views.stats_dashboard, name="dashboard"),
+    path("attendance/series/", views.attendance_series_view, name="attendance_series"),
 ]
@@ -3,207 +3,147 @@ from accounts.models import User
 from matches.models import Match, Participation
 from django.utils.timezone import now
 from django.utils import timezone
-from django.db.models import Count, Q, F, FloatField, ExpressionWrapper, Avg
-from matches.models import Match
-from collections import defaultdict
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from matches.models import Match, Stadium
+from matches.pagination import keyset_page
 import datetime
 from django.contrib.auth.decorators import login_required
+from .models import MonthlyAttendance
+from .leaderboard import cached_leaderboard
+from .rollups import LAZY_BATCH_SIZE, attendance_series, attendance_totals, roll_up_locked_matches
 
 @login_required
 def stats_dashboard(request):
 
-    # annotate each match with attended_count
-    # date_lt : less then
-    matches_with_attendance = Match.objects.filter(date__lt=now().date()).annotate(
+    # Past matches with their attended_count, for the rows of the matches table
+    # past() : matches already started (indexed starts_at)
+    matches_with_attendance = Match.objects.past().annotate(
         attended_count=Count(
             'participation',
             filter=Q(participation__status='joined', participation__removed=False),
             distinct=True
         )
-    ).annotate( # compute attendance ratio per match
-        attendance=ExpressionWrapper(
-            F('attended_count') * 1.0 / F('max_players'),
-            output_field=FloatField()
-        )
     )
-    """ F('attended_count') → refers to the calculated field from Step 1.
-    F('max_players') → refers to the max_players field in the Match model.
-    Multiplying by 1.0 ensures Python/SQL does float division, not integer division.
-    ExpressionWrapper(..., output_field=FloatField()) tells Django:
-    “this calculation produces a float, store it as such.” """
-
-    # now calculate average attendance
-    # .aggregate() is a Django ORM method that calculates a summary across all rows in a queryset.
-    average_attendance = matches_with_attendance.aggregate(avg_attendance=Avg('attendance'))['avg_attendance']
-    avg_attendance_percent = average_attendance * 100
-
-    # 1️⃣ Fetch all participation objects in one query
-    #    - select_related('user', 'match') pulls related objects to avoid extra queries later
-    all_participations = Participation.objects.select_related('user', 'match').all()
-
-    # 2️⃣ Organize participations by user_id in a dictionary
-    #    - key = user_id, value = list of participations for that user+
-    user_participations = defaultdict(list)
-    for p in all_participations:
-        user_participations[p.user_id].append(p)
-    
-    # 3️⃣ Loop through all users to calculate stats
-    user_stats = []
-    for user in User.objects.all().order_by('username'):
-     
-        # get all participations for this user
-        participations = user_participations.get(user.id, [])
-        
-        # total enrolled = all participations
-        total_enrolled = len(participations)
-        
-        # total times user left = count where status='left'
-        total_left = sum(1 for p in participations if p.status == 'left')
-
-
-        # total absent excused = participations marked as no-show with reason='excused'
-        total_absent_excused = sum(
-            1 for p in participations if p.is_no_show and p.no_show_reason == 'excused'
-        )
 
-        # total absent not excused = participations marked as no-show with reason='not_excused'
-        total_absent_not_excused = sum(
-            1 for p in participations if p.is_no_show and p.no_show_reason == 'not_excused'
-        )
+    # Average attendance from the monthly rollups instead of aggregating every past match,
+    # a few rows (see stats/rollups.py). Matches locked since the last rollup are added
+    # first, a small batch at most, nothing but one indexed SELECT when none is pending
+    roll_up_locked_matches(LAZY_BATCH_SIZE, max_batches=1)
+    rollups = MonthlyAttendance.objects.all()
+    average_attendance = attendance_totals(rollups)['average_attendance'] or 0
+    avg_attendance_percent = average_attendance * 100
 
-        # total absent not excused = participations marked as no-show with reason='not_excused'
-        total_absent_last_minute = sum(
-            1 for p in participations if p.is_no_show and p.no_show_reason == 'last_minute'
-        )
+    # Score-sorted users with medals, from the cache until a participation or user write
+    # bumps the stats epoch (see stats/leaderboard.py)
+    last_n = 5
+    user_stats = cached_leaderboard(last_n)
 
-        
-
-
-        # append stats for this user to the final list
-        attended = sum(1 for p in participations if p.status == 'joined' and not p.removed and not p.is_no_show)
-
-
-        perc_attended = (attended / total_enrolled * 100) if total_enrolled else 0
-        perc_left = (total_left / total_enrolled * 100) if total_enrolled else 0
-        perc_absent_excused = (total_absent_excused / total_enrolled * 100) if total_enrolled else 0
-        perc_absent_not_excused = (total_absent_not_excused / total_enrolled * 100) if total_enrolled else 0
-        perc_absent_last_minute = (total_absent_last_minute / total_enrolled * 100) if total_enrolled else 0
-
-
-        # score is attended / eligible_participations
-        # eligible_participations excluded the following: 
-        # no-shows is not set or excused
-        eligible_participations = [
-            p for p in participations 
-            if not (p.no_show_reason == 'excused' or (p.is_no_show == False and p.status == 'left'))
-        ]
-        
-        # 7️⃣ Compute score safely
-        attendance_score = (attended / len(eligible_participations)) if eligible_participations else 0
-        points_ratio = user.points / 15
-
-        if user.is_suspended and user.suspension_until:
-            total_suspension_seconds = datetime.timedelta(days=15).total_seconds()
-            remaining_seconds = (user.suspension_until - timezone.now()).total_seconds()
-            suspension_penalty = max(0, min(1, remaining_seconds / total_suspension_seconds))
-        else:
-            suspension_penalty = 0
-
-        past_suspension_penalty = min(0.1, 0.02 * user.suspension_count)  # 2% penalty per past suspension, max 10%
-
-        score = (attendance_score * 0.7 + points_ratio * 0.3) * 100
-        score = score * (1 - suspension_penalty) * (1 - past_suspension_penalty)
-        
-        if(score):
-            score = round(score, 2)
-            if(int(score) == 100):
-                score = 100 
-        else:
-            score = None
-
-
-        # We will add last 5 participations to user object
-        last_n = 5
-        last_participations = sorted([p for p in participations if not p.match.can_edit_attendance], key=lambda p: p.match.date, reverse=True)[:last_n]
-        last_participations = sorted(last_participations, key=lambda p: p.match.date)
-   
-   
-        icons = []
-        for p in last_participations:
-            if p.is_active_participant():
-                icons.append("✅")
-            elif p.no_show_reason == "excused":
-                icons.append("⚪")
-            else :
-                icons.append("❌")
-
-        last_five_icons = " ".join(icons)
-
-
-        user_stats.append({
-            'username': user.username,
-            'total_enrolled': total_enrolled,
-            'eligible_participations' : len(eligible_participations),
-            'attended': attended,
-            'total_left': total_left,
-            'total_absent_excused': total_absent_excused,
-            'total_absent_not_excused': total_absent_not_excused,
-            'total_absent_last_minute': total_absent_last_minute,
-            'perc_attended': round(perc_attended, 2),
-            'perc_left': round(perc_left, 2),
-            'perc_absent_excused': round(perc_absent_excused, 2),
-            'perc_absent_not_excused': round(perc_absent_not_excused, 2),
-            'perc_absent_last_minute' : round(perc_absent_last_minute, 2), 
-            'times_suspended': user.suspension_count,
-            'points': user.points,
-            'score': score,
-            'last_five_icons': last_five_icons,
-            'can_participate': user.can_participate(),
-        })
-
-    # Sort users by score descending
-    user_stats = sorted(
-        user_stats,
-        key=lambda x: (x['score'] is None, -(x['score'] or 0))
-    )
-    
-    # Get unique scores only from eligible users
-    eligible_scores = sorted(
-        {u['score'] for u in user_stats if u['score'] is not None and u['can_participate'][0]},
-        reverse=True
-    )
-
-    
-    # Map scores to medals
-    score_to_medal = {}
-    if len(eligible_scores) > 0:
-        score_to_medal[eligible_scores[0]] = 'gold'
-    if len(eligible_scores) > 1:
-        score_to_medal[eligible_scores[1]] = 'silver'
-    if len(eligible_scores) > 2:
-        score_to_medal[eligible_scores[2]] = 'bronze'
-
-    # Assign medals to users based on their score
-    for user in user_stats:
-        can_play, reason = user['can_participate']
-        if can_play:
-            user['medal'] = score_to_medal.get(user['score'], '')
-        else:
-            user['medal'] = ''
     months = range(1, 13)  # 1 to 12
 
-    current_year = datetime.date.today().year
-    years = range(current_year-1, current_year+2)
-
+    # Years with past matches, for the filter (DISTINCT on the indexed date column)
+    years = [d.year for d in Match.objects.past().dates('date', 'year', order='DESC')]
 
+    # Past matches table: filtered and paginated by the database, one page of rows per request
+    filters = _match_filters(request.GET)
+    page = keyset_page(
+        matches_with_attendance.filter(filters['q']).select_related('stadium'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        descending=True,
+    )
+    page['next_url'] = _match_page_url(request, 'after', page['next_cursor'])
+    page['previous_url'] = _match_page_url(request, 'before', page['previous_cursor'])
 
     context = {
         "total_matches": matches_with_attendance.count(),
-        "matches_with_attendance": matches_with_attendance,
+        "match_page": page,
+        "match_filters": filters,
+        "stadiums": Stadium.objects.order_by('name'),
         "avg_attendance_percent": round(avg_attendance_percent, 2),
+        "period_attendance": _period_attendance(rollups, filters),
         "user_stats": user_stats,
         "months": months,
         "years": years,
         "last_n": last_n,
     }
     return render(request, "stats/dashboard.html", context)
+
+
+@login_required
+def attendance_series_view(request):
+    """
+    Monthly attendance time series for charts, read from the rollups.
+    Optional `stadium` and `year` query parameters narrow it down.
+    """
+    filters = _match_filters(request.GET)
+    roll_up_locked_matches(LAZY_BATCH_SIZE, max_batches=1)
+    rollups = MonthlyAttendance.objects.all()
+    if filters['year']:
+        rollups = rollups.filter(month__year=filters['year'])
+    if filters['stadium']:
+        rollups = rollups.filter(stadium_id=filters['stadium'])
+    return JsonResponse({
+        'year': filters['year'],
+        'stadium': filters['stadium'],
+        'series': attendance_series(rollups),
+    })
+
+
+def _period_attendance(rollups, filters):
+    """Totals of the rollups for the filtered month / year / stadium, None without filters"""
+    if not (filters['month'] or filters['year'] or filters['stadium']):
+        return None
+    if filters['year']:
+        rollups = rollups.filter(month__year=filters['year'])
+    if filters['month']:
+        rollups = rollups.filter(month__month=filters['month'])
+    if filters['stadium']:
+        rollups = rollups.filter(stadium_id=filters['stadium'])
+    totals = attendance_totals(rollups)
+    if totals['average_attendance'] is not None:
+        totals['average_attendance_percent'] = round(totals['average_attendance'] * 100, 2)
+    return totals
+
+
+def _int_param(params, name, valid):
+    """Integer query parameter, or None if missing or out of `valid`"""
+    try:
+        value = int(params.get(name, ''))
+    except ValueError:
+        return None
+    return value if value in valid else None
+
+
+def _match_filters(params):
+    """
+    Month / year / stadium filters of the past matches table.
+    A month of a year is a date range, so the (date, time, id) index is used
+    instead of extracting the month of every row.
+    """
+    month = _int_param(params, 'month', range(1, 13))
+    year = _int_param(params, 'year', range(datetime.MINYEAR, datetime.MAXYEAR))
+    stadium = _int_param(params, 'stadium', range(1, 2**63))
+
+    q = Q()
+    if year and month:
+        start = datetime.date(year, month, 1)
+        q &= Q(date__gte=start, date__lt=(start + datetime.timedelta(days=31)).replace(day=1))
+    elif year:
+        q &= Q(date__gte=datetime.date(year, 1, 1), date__lt=datetime.date(year + 1, 1, 1))
+    elif month:
+        q &= Q(date__month=month)
+    if stadium:
+        q &= Q(stadium_id=stadium)
+    return {'month': month, 'year': year, 'stadium': stadium, 'q': q}
+
+
+def _match_page_url(request, direction, cursor):
+    """Query string moving the matches table to `cursor`, keeping the filters"""
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params[direction] = cursor
+    return f"?{params.urlencode()}"